@@ -1,3 +1,10 @@
+from pyb4ml.inference.factored.async_inference import AsyncInference
 from pyb4ml.inference.factored.belief_propagation import BP
 from pyb4ml.inference.factored.bucket_elimination import BE
+from pyb4ml.inference.factored.compiled_model import CompiledModel
 from pyb4ml.inference.factored.greedy_ordering import GO
+from pyb4ml.inference.factored.junction_tree import JT
+from pyb4ml.inference.factored.loopy_belief_propagation import LBP
+from pyb4ml.inference.factored.mini_bucket_elimination import MBE
+from pyb4ml.inference.factored.dispatcher import Dispatcher, forget, infer
+from pyb4ml.inference.factored.evidence_mapping import map_evidence
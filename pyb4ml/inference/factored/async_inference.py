@@ -0,0 +1,207 @@
+"""
+The module contains the asynchronous front end batching concurrent inferences.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import asyncio
+import collections
+import concurrent.futures
+
+from pyb4ml.inference.factored.compiled_model import CompiledModel, InferenceState
+from pyb4ml.modeling import FactorGraph
+
+
+class AsyncInference:
+    """
+    Computes the probability distributions of queries given evidences without blocking
+    the event loop, where the eliminations run in an executor, by default in a thread
+    pool of its own.  The model is compiled once, see CompiledModel, so that the
+    eliminations of different batches can run in the threads at the same time.  A given
+    CompiledModel is used as it is, e.g. shared with other front ends, and then the cost
+    criterion is the one of the compiled model.
+
+    The concurrent requests with the same query and the same evidential variables are
+    coalesced into one batch, see CompiledModel.infer_batch.  The first request of a batch
+    opens a time window of window seconds, and the batch is evaluated when the window is
+    over or the batch has max_batch_size requests.  At most max_pending requests are
+    pending at once, and the further requests wait for free places, which is the
+    backpressure on the callers.  A request that is not answered before its deadline
+    raises TimeoutError and is removed from its batch if the batch has not started yet.
+
+    The executor must be a thread pool, since the batches are evaluated on the compiled
+    model of the front end, which cannot be sent to other processes.
+
+    The evidential values are checked when a request is made, so that an illegal value
+    raises ValueError for that request and never fails the other requests of its batch.
+    """
+    def __init__(self, model: FactorGraph | CompiledModel, window=0.002, max_batch_size=256, max_pending=1024, timeout=None,
+                 executor=None, cost='weighted-min-fill'):
+        if window < 0:
+            raise ValueError(f'the window {window} must be non-negative')
+        if max_batch_size < 1:
+            raise ValueError(f'the maximum batch size {max_batch_size} must be positive')
+        if max_pending < 1:
+            raise ValueError(f'the maximum number {max_pending} of pending requests must be positive')
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f'the timeout {timeout} must be positive')
+        if executor is not None and not isinstance(executor, concurrent.futures.ThreadPoolExecutor):
+            raise ValueError(f'the executor {executor} must be a thread pool')
+        self._compiled_model = model if isinstance(model, CompiledModel) else CompiledModel(model, cost)
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._max_pending = max_pending
+        self._timeout = timeout
+        # The own executor is shut down on closing, while a given executor is not
+        self._executor = executor if executor is not None else concurrent.futures.ThreadPoolExecutor()
+        self._owns_executor = executor is None
+        # Places of the pending requests, created in the running event loop
+        self._semaphore = None
+        # Batches being collected under (query, evidential variables) with their window timers
+        self._batches = {}
+        self._timers = {}
+        # Numbers of the evaluated batches of each size
+        self._batch_sizes = collections.Counter()
+        self._pending_number = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    @property
+    def batch_sizes(self):
+        """
+        Returns the numbers of the evaluated batches of each size as a Counter of sizes
+        """
+        return self._batch_sizes
+
+    @property
+    def compiled_model(self):
+        return self._compiled_model
+
+    @property
+    def max_batch_size(self):
+        return self._max_batch_size
+
+    @property
+    def max_pending(self):
+        return self._max_pending
+
+    @property
+    def pending_number(self):
+        """
+        Returns the number of the requests waiting for their distributions
+        """
+        return self._pending_number
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def window(self):
+        return self._window
+
+    async def close(self):
+        """
+        Evaluates the batches being collected and shuts the own executor down after the
+        running evaluations
+        """
+        for key in tuple(self._batches):
+            self._evaluate_batch(key)
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def infer(self, query, evidence=(), timeout=None):
+        """
+        Computes the probability distribution P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k)
+        of the query variables given the evidence, i.e. a tuple of (variable, value) pairs,
+        and returns it as an InferenceState, see CompiledModel.infer.  The timeout in
+        seconds, by default the timeout of the front end, includes waiting for a place and
+        for the batch.  For example,
+        (await front_end.infer((grade, ), ((letter, 'l1'), ))).pd('g0') returns
+        P(Grade = 'g0' | Letter = 'l1').
+        """
+        evidence = tuple(evidence)
+        evidence_variables = tuple(var for var, _ in evidence)
+        query, sorted_evidence = self._compiled_model.check_query_and_evidence(query, evidence_variables)
+        evidence_dict = dict(evidence)
+        values = tuple(evidence_dict[var] for var in sorted_evidence)
+        # Check the values before the request joins a batch
+        self._compiled_model.get_evidence_indices(sorted_evidence, (values, ))
+        timeout = timeout if timeout is not None else self._timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_pending)
+        await asyncio.wait_for(self._semaphore.acquire(), AsyncInference._get_remaining_time(loop, deadline))
+        self._pending_number += 1
+        try:
+            future = loop.create_future()
+            self._add_request((query, sorted_evidence), values, future, loop)
+            distribution = await asyncio.wait_for(future, AsyncInference._get_remaining_time(loop, deadline))
+        finally:
+            self._pending_number -= 1
+            self._semaphore.release()
+        return InferenceState(query, evidence, distribution)
+
+    @staticmethod
+    def _get_remaining_time(loop, deadline):
+        return max(deadline - loop.time(), 0) if deadline is not None else None
+
+    def _add_request(self, key, values, future, loop):
+        batch = self._batches.setdefault(key, [])
+        batch.append((values, future))
+        if len(batch) >= self._max_batch_size:
+            self._evaluate_batch(key)
+        elif len(batch) == 1:
+            # The first request opens the window of the batch
+            self._timers[key] = loop.call_later(self._window, self._evaluate_batch, key)
+
+    def _evaluate_batch(self, key):
+        batch = self._batches.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if batch is None:
+            return
+        # The requests timed out or cancelled in the meantime are removed
+        batch = [(values, future) for values, future in batch if not future.done()]
+        if not batch:
+            return
+        query, evidence_variables = key
+        self._batch_sizes[len(batch)] += 1
+        evaluation = asyncio.get_running_loop().run_in_executor(
+            self._executor,
+            self._compiled_model.infer_batch,
+            query,
+            evidence_variables,
+            [values for values, _ in batch]
+        )
+        evaluation.add_done_callback(lambda done_evaluation: AsyncInference._set_results(batch, done_evaluation))
+
+    @staticmethod
+    def _set_results(batch, evaluation):
+        if evaluation.cancelled():
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            return
+        exception = evaluation.exception()
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(evaluation.result()[index])
@@ -15,7 +15,7 @@ Sie den vom Autor auferlegten Bedingungen zu.
 import math
 
 from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
-from pyb4ml.inference.factored.factor_tree_messages import Message, Messages
+from pyb4ml.inference.factored.factor_tree_messages import Message, MessageCache, Messages
 from pyb4ml.modeling.categorical.variable import Variable
 from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
 
@@ -30,7 +30,14 @@ class BP(FactoredAlgorithm):
     of the factors and variables in the factor graph tree.  This implementation encourages
     reuse of the algorithm by caching already computed messages given an evidence or no 
     evidence.  Thus, they are computed only once, which is dynamic programming, and are used
-    in the next BP runs.  Instead of the messages, the implementation uses the logarithms 
+    in the next BP runs.  The messages are only propagated in the connected component of
+    the query, where the barren variables, e.g. the unobserved variables without
+    children in a Bayesian network, are removed with their factors before, since their
+    messages are constant.  Since a message depends only on the evidence in the subtree 
+    sending it, a message is cached under that evidence and is reused for any evidence
+    that differs only outside the subtree.  The message cache can be bounded in the number 
+    of messages or in their size in bytes, where the least recently used messages are 
+    evicted.  Instead of the messages, the implementation uses the logarithms 
     of messages for computational stability.  See, for example, [B12] for more details.
     
     Computes a marginal probability distribution P(Q) or a conditional probability 
@@ -39,8 +46,10 @@ class BP(FactoredAlgorithm):
     values e_1, ..., e_k of random variables E_1, ..., E_k, respectively.
 
     Restrictions:  Only works with random variables with categorical value domains, only 
-    works on trees (leads to dead lock on loopy graphs).  See the Bucket Elimination (BE)
-    algorithm for the case of loopy graphs or a joint distribution of several query variables.
+    works on trees (an error is raised on loopy graphs).  See the Bucket Elimination (BE)
+    algorithm for the case of loopy graphs or a joint distribution of several query variables
+    and the Loopy Belief Propagation (LBP) algorithm for approximate distributions in large
+    loopy graphs.
     The factors must be strictly positive because of the use of logarithms.
     
     Recommended:  When modeling, reduce the number of random variables in each factor to 
@@ -53,12 +62,16 @@ class BP(FactoredAlgorithm):
     2012
     """
     _name = 'Belief Propagation'
+    # The messages are computed over the reduced domains of the evidential variables
+    _reduces_domains = True
 
-    def __init__(self, model: FactorGraph):
+    def __init__(self, model: FactorGraph, message_cache: MessageCache = None):
         FactoredAlgorithm.__init__(self, model)
-        # To cache the node-to-node messages
-        self._factor_to_variable_messages = {}
-        self._variable_to_factor_messages = {}
+        # To cache the node-to-node messages over the runs
+        self._message_cache = message_cache if message_cache is not None else MessageCache()
+        # The node-to-node messages used in a run
+        self._factor_to_variable_messages = Messages()
+        self._variable_to_factor_messages = Messages()
         # Query variable
         self._query_variable = None
         # Evidence tuple
@@ -70,17 +83,57 @@ class BP(FactoredAlgorithm):
         self._next_factors = []
         self._from_variables = []
         self._next_variables = []
+        # Factors of the run and the factors of each variable among them
+        self._relevant_factors = ()
+        self._variable_factors = {}
+        # Distributions of all the variables and of the variables of all the factors
+        self._variable_distributions = {}
+        self._factor_distributions = {}
+        # Depth-first numbering of the tree nodes to find the nodes in subtrees
+        self._preorder_numbers = None
+        self._last_descendant_numbers = None
+        self._parents = None
+        self._roots = None
+        # Passed nodes and numbers of the incoming messages of the nodes in a run, which are
+        # kept in the algorithm rather than in the nodes shared with other algorithms
+        self._passed_nodes = set()
+        self._incoming_messages_numbers = {}
 
     @staticmethod
-    def _update_passing(from_node, to_node):
-        from_node.passed = True
-        to_node.incoming_messages_number += 1
+    def _normalize(nn_values):
+        # The probability distribution must be normalized
+        norm_const = math.fsum(nn_values.values())
+        return {values: nn_value / norm_const for values, nn_value in nn_values.items()}
+
+    @property
+    def message_cache(self):
+        return self._message_cache
 
     def clear_message_cache(self):
-        del self._factor_to_variable_messages
-        del self._variable_to_factor_messages
-        self._factor_to_variable_messages = {}
-        self._variable_to_factor_messages = {}
+        self._message_cache.clear()
+
+    def clone(self):
+        """
+        Returns a BP algorithm for the same model with a message cache of its own.  Since
+        BP reduces the domains of its inner variables to the evidential values, the clone
+        cannot share the inner model and is initialized as a new algorithm.
+        """
+        return BP(self._outer_model)
+
+    def factor_pd(self, factor):
+        """
+        Returns the joint probability distribution of the variables of a model factor
+        computed by run_all() as a function of their values in the order of the factor
+        variables
+        """
+        try:
+            inner_factor = self._outer_to_inner_factors[factor]
+        except KeyError:
+            raise ValueError(f'no model factor corresponds to factor {factor.name}')
+        try:
+            return self._get_distribution_function(inner_factor.variables, self._factor_distributions[inner_factor])
+        except KeyError:
+            raise AttributeError('distribution not computed')
 
     def run(self, print_info=False):
         # Check whether a query is specified
@@ -89,12 +142,14 @@ class BP(FactoredAlgorithm):
         FactoredAlgorithm.check_one_variable_query(self)
         # Check whether the query and evidence variables are disjoint
         FactoredAlgorithm.check_query_and_evidence_intersection(self)
+        # Check whether the factor graph is a tree
+        self._check_tree()
         # Set the first variable to the query
         self._query_variable = self._query[0]
-        # The message caching is based on evidence
-        self._create_factor_to_variable_messages_cache_if_necessary()
-        # The message caching is based on evidence
-        self._create_variable_to_factor_messages_cache_if_necessary()
+        # The messages are only propagated between the factors relevant to the query
+        self._set_relevant_factors(self._get_relevant_factors(self._query, self._evidence))
+        # The messages are taken from the message cache if necessary
+        self._initialize_messages()
         # Whether to print loop passing and propagating node-to-node messages
         self._print_info = print_info
         # Clear the distribution
@@ -104,7 +159,7 @@ class BP(FactoredAlgorithm):
         # Compute messages from leaves and make other initializations
         self._initialize_main_loop()
         # Run the main loop
-        # Stop condition: self._query_variable.incoming_messages_number == self._query_variable.factors_number
+        # Stop condition: the query variable has the incoming messages from all its relevant factors
         while self._get_running_condition():
             self._loop_passing += 1
             # Print the number of the main-loop passes
@@ -124,10 +179,70 @@ class BP(FactoredAlgorithm):
         # Print info if necessary
         FactoredAlgorithm._print_stop(self)
 
+    def run_all(self, print_info=False):
+        """
+        Computes the marginal or conditional probability distributions of all the variables
+        and the joint distributions of the variables of all the factors.  The messages are
+        propagated with one collect pass from the leaves to a root and one distribute pass
+        from the root to the leaves, so that each message is computed once.  The
+        distributions are then returned by variable_pd() and factor_pd().
+        """
+        # Check whether the factor graph is a tree
+        self._check_tree()
+        # The messages are propagated between all the factors
+        self._set_relevant_factors(self.factors)
+        # The messages are taken from the message cache if necessary
+        self._initialize_messages()
+        # Whether to print propagating node-to-node messages
+        self._print_info = print_info
+        # Clear the distributions
+        self._variable_distributions = {}
+        self._factor_distributions = {}
+        # Print info if necessary
+        FactoredAlgorithm._print_start(self)
+        # Directed edges from the leaves to the roots
+        collect_edges = self._get_collect_edges()
+        # Collect pass
+        for from_node, to_node in collect_edges:
+            self._compute_message(from_node, to_node)
+        # Distribute pass
+        for to_node, from_node in reversed(collect_edges):
+            self._compute_message(from_node, to_node)
+        # Compute the probability distributions
+        self._compute_variable_distributions()
+        self._compute_factor_distributions()
+        # Print info if necessary
+        FactoredAlgorithm._print_stop(self)
+
+    def variable_pd(self, variable):
+        """
+        Returns the marginal or conditional probability distribution of a model variable
+        computed by run_all() as a function of its value
+        """
+        try:
+            inner_variable = self._outer_to_inner_variables[variable]
+        except KeyError:
+            raise ValueError(f'no model variable corresponds to variable {variable.name}')
+        try:
+            return self._get_distribution_function((inner_variable, ), self._variable_distributions[inner_variable])
+        except KeyError:
+            raise AttributeError('distribution not computed')
+
+    def _cache_message(self, messages, message):
+        # Use the message in this run
+        messages.cache(message)
+        # Cache the message for the next runs
+        self._message_cache.cache(self._get_message_key(message.from_node, message.to_node), message)
+
+    def _check_tree(self):
+        # The subtrees are set only once since the factor graph is not changed
+        if self._preorder_numbers is None:
+            self._set_subtrees()
+
     def _compute_distribution(self):
         # Get the incoming messages to the query
-        factor_to_query_messages = self._factor_to_variable_messages[self._evidence_tuples].get_from_nodes_to_node(
-            from_nodes=self._query_variable.factors,
+        factor_to_query_messages = self._factor_to_variable_messages.get_from_nodes_to_node(
+            from_nodes=self._variable_factors[self._query_variable],
             to_node=self._query_variable
         )
         # Compute the function for the distribution
@@ -140,22 +255,39 @@ class BP(FactoredAlgorithm):
         norm_const = math.fsum(nn_values[value] for value in self._query_variable.domain)
         # Compute the probability distribution
         self._distribution = {(value, ): nn_values[value] / norm_const for value in self._query_variable.domain}
-        self._query_variable.passed = True
+        self._passed_nodes.add(self._query_variable)
+
+    def _compute_factor_distributions(self):
+        for factor in self.factors:
+            incoming_messages = self._variable_to_factor_messages.get_from_nodes_to_node(
+                from_nodes=factor.variables,
+                to_node=factor
+            )
+            log_values = {
+                values: math.log(factor(*zip(factor.variables, values)))
+                + math.fsum(message(value) for message, value in zip(incoming_messages, values))
+                for values in Variable.evaluate_variables(factor.variables)
+            }
+            # Use to reduce computational instability
+            max_log_value = max(log_values.values())
+            self._factor_distributions[factor] = BP._normalize(
+                {values: math.exp(log_value - max_log_value) for values, log_value in log_values.items()}
+            )
 
     def _compute_factor_to_variable_message_from_leaf(self, from_factor, to_variable):
         # Compute the message if necessary
-        if not self._factor_to_variable_messages[self._evidence_tuples].contains(from_factor, to_variable):
+        if not self._contains_message(self._factor_to_variable_messages, from_factor, to_variable):
             # Compute the message values
             values = {value: math.log(from_factor((to_variable, value))) for value in to_variable.domain}
             # Cache the message
             message = Message(from_factor, to_variable, values)
-            self._factor_to_variable_messages[self._evidence_tuples].cache(message)
+            self._cache_message(self._factor_to_variable_messages, message)
             # Print the message if necessary
             self._print_message(message)
 
     def _compute_factor_to_variable_message_not_from_leaf(self, from_factor, to_variable):
         # Compute the message if necessary
-        if not self._factor_to_variable_messages[self._evidence_tuples].contains(from_factor, to_variable):
+        if not self._contains_message(self._factor_to_variable_messages, from_factor, to_variable):
             # Split evidential and non-evidential variables
             from_evidential_variables, from_non_evidential_variables = \
                 Variable.split_evidential_and_non_evidential_variables(
@@ -163,12 +295,12 @@ class BP(FactoredAlgorithm):
                     without_variables=(to_variable, )
                 )
             # Get the incoming evidential messages
-            evidential_messages = self._variable_to_factor_messages[self._evidence_tuples].get_from_nodes_to_node(
+            evidential_messages = self._variable_to_factor_messages.get_from_nodes_to_node(
                 from_nodes=from_evidential_variables,
                 to_node=from_factor
             )
             # Get the incoming non-evidential messages
-            non_evidential_messages = self._variable_to_factor_messages[self._evidence_tuples].get_from_nodes_to_node(
+            non_evidential_messages = self._variable_to_factor_messages.get_from_nodes_to_node(
                 from_nodes=from_non_evidential_variables,
                 to_node=from_factor
             )
@@ -201,48 +333,70 @@ class BP(FactoredAlgorithm):
                           ) for value in to_variable.domain}
             # Cache the message
             message = Message(from_factor, to_variable, values)
-            self._factor_to_variable_messages[self._evidence_tuples].cache(message)
+            self._cache_message(self._factor_to_variable_messages, message)
             # Print the message if necessary
             self._print_message(message)
 
     def _compute_variable_to_factor_message_from_leaf(self, from_variable, to_factor):
         # Compute the message if necessary
-        if not self._variable_to_factor_messages[self._evidence_tuples].contains(from_variable, to_factor):
+        if not self._contains_message(self._variable_to_factor_messages, from_variable, to_factor):
             # Compute the message values
             values = {value: 0 for value in from_variable.domain}
             # Cache the message
             message = Message(from_variable, to_factor, values)
-            self._variable_to_factor_messages[self._evidence_tuples].cache(message)
+            self._cache_message(self._variable_to_factor_messages, message)
             # Print the message if necessary
             self._print_message(message)
 
     def _compute_variable_to_factor_message_not_from_leaf(self, from_variable, to_factor):
         # Compute the message if necessary
-        if not self._variable_to_factor_messages[self._evidence_tuples].contains(from_variable, to_factor):
-            from_factors = tuple(factor for factor in from_variable.factors if factor is not to_factor)
+        if not self._contains_message(self._variable_to_factor_messages, from_variable, to_factor):
+            from_factors = tuple(factor for factor in self._variable_factors[from_variable] if factor is not to_factor)
             # Compute the message values
             # Only one non-passed factor
             # from_variable was previously to_variable
             values = {value: math.fsum(message(value) for message in
-                                       self._factor_to_variable_messages[self._evidence_tuples].get_from_nodes_to_node(
+                                       self._factor_to_variable_messages.get_from_nodes_to_node(
                                            from_nodes=from_factors,
                                            to_node=from_variable)
                                        ) for value in from_variable.domain}
             # Cache the message
             message = Message(from_variable, to_factor, values)
-            self._variable_to_factor_messages[self._evidence_tuples].cache(message)
+            self._cache_message(self._variable_to_factor_messages, message)
             # Print the message if necessary
             self._print_message(message)
 
-    def _create_factor_to_variable_messages_cache_if_necessary(self):
-        if self._evidence_tuples not in self._factor_to_variable_messages:
-            # Cache if not cached
-            self._factor_to_variable_messages[self._evidence_tuples] = Messages()
+    def _compute_message(self, from_node, to_node):
+        if isinstance(from_node, Variable):
+            self._compute_variable_to_factor_message_not_from_leaf(from_node, to_node)
+        else:
+            self._compute_factor_to_variable_message_not_from_leaf(from_node, to_node)
+
+    def _compute_variable_distributions(self):
+        for variable in self.variables:
+            incoming_messages = self._factor_to_variable_messages.get_from_nodes_to_node(
+                from_nodes=variable.factors,
+                to_node=variable
+            )
+            log_values = {
+                value: math.fsum(message(value) for message in incoming_messages) for value in variable.domain
+            }
+            # Use to reduce computational instability
+            max_log_value = max(log_values.values())
+            self._variable_distributions[variable] = BP._normalize(
+                {(value, ): math.exp(log_value - max_log_value) for value, log_value in log_values.items()}
+            )
 
-    def _create_variable_to_factor_messages_cache_if_necessary(self):
-        if self._evidence_tuples not in self._variable_to_factor_messages:
-            # Cache if not cached
-            self._variable_to_factor_messages[self._evidence_tuples] = Messages()
+    def _contains_message(self, messages, from_node, to_node):
+        # Whether the message is already used in this run
+        if messages.contains(from_node, to_node):
+            return True
+        # Whether the message is cached in a previous run
+        message = self._message_cache.get(self._get_message_key(from_node, to_node))
+        if message is not None:
+            messages.cache(message)
+            return True
+        return False
 
     def _extend_next_variables(self, variable):
         # If the variable is query, the propagation should be stopped here
@@ -250,24 +404,80 @@ class BP(FactoredAlgorithm):
             # If all messages except one are collected,
             # then a message can be propagated from this variable
             # to the next factor
-            if variable.incoming_messages_number + 1 == variable.factors_number:
+            if self._incoming_messages_numbers[variable] + 1 == len(self._variable_factors[variable]):
                 self._next_variables.append(variable)
 
     def _extend_next_factors(self, factor):
         # If all messages except one are collected,
         # then a message can be propagated from this factor
         # to the next variable
-        if factor.incoming_messages_number + 1 == factor.variables_number:
+        if self._incoming_messages_numbers[factor] + 1 == factor.variables_number:
             self._next_factors.append(factor)
 
+    def _get_collect_edges(self):
+        """
+        Returns the directed edges from the nodes to their parents in the order of a
+        collect pass, where the roots are the first variables of the connected components
+        """
+        collect_edges = []
+        visited = set()
+        for root in self.variables:
+            if root in visited:
+                continue
+            visited.add(root)
+            # Breadth-first search from the root
+            component_edges = []
+            parents = {root: None}
+            nodes = [root]
+            while nodes:
+                next_nodes = []
+                for node in nodes:
+                    neighbors = node.factors if isinstance(node, Variable) else node.variables
+                    for neighbor in neighbors:
+                        if neighbor is parents[node]:
+                            continue
+                        if neighbor in visited:
+                            raise ValueError('the factor graph is not a tree')
+                        visited.add(neighbor)
+                        parents[neighbor] = node
+                        component_edges.append((neighbor, node))
+                        next_nodes.append(neighbor)
+                nodes = next_nodes
+            # The messages from the farthest nodes are computed first
+            collect_edges.extend(reversed(component_edges))
+        return collect_edges
+
+    def _get_message_key(self, from_node, to_node):
+        # The message caching is based on the evidence in the subtree sending the message,
+        # since the message does not depend on the other evidence.  The evidence of the
+        # receiving variable is also needed because it reduces the message domain.
+        return from_node, to_node, tuple(
+            (var, val) for var, val in self._evidence_tuples
+            if var is to_node or self._is_in_sending_subtree(var, from_node, to_node)
+        )
+
     def _get_running_condition(self):
-        return self._query_variable.incoming_messages_number < self._query_variable.factors_number
+        return self._incoming_messages_numbers[self._query_variable] < len(self._variable_factors[self._query_variable])
+
+    def _is_in_sending_subtree(self, node, from_node, to_node):
+        if self._parents[from_node] is to_node:
+            # The sending subtree consists of from_node and its descendants
+            return self._preorder_numbers[from_node] \
+                <= self._preorder_numbers[node] \
+                <= self._last_descendant_numbers[from_node]
+        else:
+            # The sending subtree is the tree without to_node and its descendants
+            return self._roots[node] is self._roots[from_node] and not (
+                self._preorder_numbers[to_node]
+                <= self._preorder_numbers[node]
+                <= self._last_descendant_numbers[to_node]
+            )
 
     def _initialize_factor_passing(self):
         # There are no passed factors
         for factor in self.factors:
-            factor.passed = False
-            factor.incoming_messages_number = 0
+            self._passed_nodes.discard(factor)
+            self._incoming_messages_numbers[factor] = 0
 
     def _initialize_main_loop(self):
         self._loop_passing = 0
@@ -286,16 +496,25 @@ class BP(FactoredAlgorithm):
         # Propagation from variable leaves
         self._propagate_variable_to_factor_messages_from_leaves()
 
+    def _initialize_messages(self):
+        self._factor_to_variable_messages = Messages()
+        self._variable_to_factor_messages = Messages()
+
     def _initialize_variable_passing(self):
         # There are no passed variables
         for variable in self.variables:
-            variable.passed = False
-            variable.incoming_messages_number = 0
+            self._passed_nodes.discard(variable)
+            self._incoming_messages_numbers[variable] = 0
 
     def _propagate_factor_to_variable_messages_from_leaves(self):
-        for from_factor in self._inner_model.factor_leaves:
+        for from_factor in self._relevant_factors:
+            if not from_factor.is_leaf():
+                continue
             # The leaf factor has only one variable
             to_variable = from_factor.variables[0]
+            # The other connected components do not change the distribution of the query
+            if self._roots[to_variable] is not self._roots[self._query_variable]:
+                continue
             self._compute_factor_to_variable_message_from_leaf(from_factor, to_variable)
             # Update passed nodes und incoming messages number
             self._update_passing(from_factor, to_variable)
@@ -306,7 +525,7 @@ class BP(FactoredAlgorithm):
 
     def _propagate_factor_to_variable_message_not_from_leaf(self, from_factor):
         # The factor-to-variable message to the only one variable that is non-passed
-        to_variable, = (variable for variable in from_factor.variables if not variable.passed)
+        to_variable, = (variable for variable in from_factor.variables if variable not in self._passed_nodes)
         self._compute_factor_to_variable_message_not_from_leaf(from_factor, to_variable)
         # Update passed nodes und incoming messages number
         self._update_passing(from_factor, to_variable)
@@ -316,11 +535,14 @@ class BP(FactoredAlgorithm):
         self._extend_next_variables(to_variable)
 
     def _propagate_variable_to_factor_messages_from_leaves(self):
-        for from_variable in self._inner_model.variable_leaves:
-            if from_variable is self._query_variable:
+        for from_variable in self.variables:
+            if from_variable is self._query_variable or len(self._variable_factors[from_variable]) != 1:
+                continue
+            # The other connected components do not change the distribution of the query
+            if self._roots[from_variable] is not self._roots[self._query_variable]:
                 continue
             # The leaf variable has only one factor
-            to_factor = from_variable.factors[0]
+            to_factor = self._variable_factors[from_variable][0]
             self._compute_variable_to_factor_message_from_leaf(from_variable, to_factor)
             # Update passed nodes und incoming messages number
             self._update_passing(from_variable, to_factor)
@@ -331,7 +553,7 @@ class BP(FactoredAlgorithm):
 
     def _propagate_variable_to_factor_message_not_from_leaf(self, from_variable):
         # The variable-to-factor message to the only one factor that is non-passed
-        to_factor, = (factor for factor in from_variable.factors if not factor.passed)
+        to_factor, = (factor for factor in self._variable_factors[from_variable] if factor not in self._passed_nodes)
         self._compute_variable_to_factor_message_not_from_leaf(from_variable, to_factor)
         # Update passed nodes und incoming messages number
         self._update_passing(from_variable, to_factor)
@@ -340,6 +562,54 @@ class BP(FactoredAlgorithm):
         # to the next variable
         self._extend_next_factors(to_factor)
 
+    def _set_relevant_factors(self, factors):
+        self._relevant_factors = tuple(factors)
+        relevant_factors = set(self._relevant_factors)
+        self._variable_factors = {
+            variable: tuple(factor for factor in variable.factors if factor in relevant_factors)
+            for variable in self.variables
+        }
+
+    def _set_subtrees(self):
+        # Number the nodes in the depth-first order, so that the descendants
+        # of a node are numbered from the node number to its last descendant number
+        self._preorder_numbers = {}
+        self._last_descendant_numbers = {}
+        self._parents = {}
+        self._roots = {}
+        number = 0
+        for root in self.variables:
+            if root in self._preorder_numbers:
+                continue
+            self._preorder_numbers[root] = number
+            self._parents[root] = None
+            self._roots[root] = root
+            number += 1
+            stack = [(root, iter(root.factors))]
+            while stack:
+                node, neighbors = stack[-1]
+                for neighbor in neighbors:
+                    if neighbor is self._parents[node]:
+                        continue
+                    if neighbor in self._preorder_numbers:
+                        self._preorder_numbers = None
+                        raise ValueError('the factor graph is not a tree')
+                    self._preorder_numbers[neighbor] = number
+                    self._parents[neighbor] = node
+                    self._roots[neighbor] = root
+                    number += 1
+                    stack.append(
+                        (neighbor, iter(neighbor.factors if isinstance(neighbor, Variable) else neighbor.variables))
+                    )
+                    break
+                else:
+                    stack.pop()
+                    self._last_descendant_numbers[node] = number - 1
+
+    def _update_passing(self, from_node, to_node):
+        self._passed_nodes.add(from_node)
+        self._incoming_messages_numbers[to_node] += 1
+
     def _print_loop(self):
         if self._print_info:
             print()
@@ -1,7 +1,6 @@
-import math
+import numpy as np
 
-from pyb4ml.modeling import Factor
-from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.inference.factored.semiring import LOG_SUM
 
 
 class Bucket:
@@ -10,6 +9,8 @@ class Bucket:
         self._input_log_factors = []
         self._evidential_variables = ()
         self._free_variables = ()
+        self._output_log_factor = None
+        self._alignments = ()
 
     @property
     def free_variables(self):
@@ -19,58 +20,193 @@ class Bucket:
     def input_log_factors(self):
         return self._input_log_factors
 
+    @property
+    def output_log_factor(self):
+        return self._output_log_factor
+
     @property
     def variable(self):
         return self._variable
 
+    @property
+    def variables(self):
+        """
+        Returns the bucket variables, where the summing variable is the last one
+        """
+        return self._free_variables + (self._variable, )
+
+    @staticmethod
+    def align_log_table(log_table, scope, variables, domain_sizes):
+        """
+        Transposes and reshapes a log-table with a leading batch axis and the other axes
+        corresponding to the scope variables so that it is broadcastable over the variables
+        """
+        return np.transpose(log_table, Bucket.get_alignment_axes(scope, variables)).reshape(
+            (log_table.shape[0], ) + Bucket.get_alignment_shape(scope, variables, domain_sizes)
+        )
+
+    @staticmethod
+    def get_alignment_axes(scope, variables):
+        return (0, ) + tuple(1 + scope.index(var) for var in variables if var in scope)
+
+    @staticmethod
+    def get_alignment_shape(scope, variables, domain_sizes):
+        return tuple(domain_sizes[var] if var in scope else 1 for var in variables)
+
+    @staticmethod
+    def combine_k_best_log_tables(k_best_log_tables, alignments):
+        """
+        Sums the aligned k-best log-tables, each having its rank axis behind the batch axis,
+        so that the sum has a rank axis for each log-table in the same order
+        """
+        ranks_number = len(k_best_log_tables)
+        log_table = 0
+        for index, (k_best_log_table, (axes, shape)) in enumerate(zip(k_best_log_tables, alignments)):
+            rank_shape = (1, ) * index + (k_best_log_table.shape[1], ) + (1, ) * (ranks_number - index - 1)
+            log_table = log_table + np.transpose(
+                k_best_log_table, (0, 1) + tuple(axis + 1 for axis in axes[1:])
+            ).reshape((k_best_log_table.shape[0], ) + rank_shape + shape)
+        return log_table
+
+    @staticmethod
+    def select_k_best(log_table, k):
+        """
+        Selects the k largest values along the last axis in descending order and returns
+        them and their positions, both with the rank axis behind the batch axis.  If there
+        are fewer than k values, the remaining values are minus infinity.
+        """
+        selected_number = min(k, log_table.shape[-1])
+        positions = np.argsort(-log_table, axis=-1, kind='stable')[..., :selected_number]
+        values = np.take_along_axis(log_table, positions, axis=-1)
+        if selected_number < k:
+            padding = [(0, 0)] * (log_table.ndim - 1) + [(0, k - selected_number)]
+            values = np.pad(values, padding, constant_values=-np.inf)
+            positions = np.pad(positions, padding, constant_values=0)
+        return np.moveaxis(values, -1, 1), np.moveaxis(positions, -1, 1)
+
+    @staticmethod
+    def _get_block(aligned_log_table, leading_index, start, stop):
+        # The broadcast axes of length one are not indexed
+        index = tuple(
+            position if aligned_log_table.shape[axis] > 1 else 0 for axis, position in enumerate(leading_index)
+        )
+        split_axis = len(leading_index)
+        if aligned_log_table.shape[split_axis] > 1:
+            return aligned_log_table[index + (slice(start, stop), )]
+        else:
+            return aligned_log_table[index]
+
     def add_log_factor(self, log_factor):
         self._input_log_factors.append(log_factor)
 
+    def compute_output_log_table(self, log_tables, storage=None, block_size=None, semiring=LOG_SUM,
+                                 with_arguments=False):
+        """
+        Sums the aligned input log-tables and eliminates the bucket variable in the
+        semiring, by default with a vectorized log-sum-exp.  The log-tables have a leading
+        batch axis.  If with_arguments is True, the positions of the values selected
+        by the semiring, e.g. by the maximum, are also returned as back-pointers.
+
+        If a block size is given, the bucket log-table is computed in blocks of at most
+        block_size cells, unless one value combination of the free variables alone has
+        more cells, so that the peak memory is bounded by the block size rather than by
+        the bucket log-table size.  If a storage is given, see MemmapStorage, the output
+        log-table is allocated by it.
+        """
+        aligned_log_tables = tuple(
+            np.transpose(log_tables[log_factor], axes).reshape((log_tables[log_factor].shape[0], ) + shape)
+            for log_factor, (axes, shape) in zip(self._input_log_factors, self._alignments)
+        )
+        # Batch and free-variable axes of the output log-table and the size of the summed axis
+        output_shape = tuple(
+            max(aligned_log_table.shape[axis] for aligned_log_table in aligned_log_tables)
+            for axis in range(len(self._free_variables) + 1)
+        )
+        variable_size = max(aligned_log_table.shape[-1] for aligned_log_table in aligned_log_tables)
+        table_size = int(np.prod(output_shape, dtype=np.int64)) * variable_size
+        if storage is None and (block_size is None or table_size <= block_size):
+            log_table = sum(aligned_log_tables)
+            if with_arguments:
+                return semiring.eliminate(log_table, axis=-1), semiring.arg_eliminate(log_table, axis=-1)
+            return semiring.eliminate(log_table, axis=-1)
+        output_log_table = storage.allocate(output_shape) if storage is not None else np.empty(output_shape)
+        arguments = np.empty(output_shape, dtype=np.intp) if with_arguments else None
+        block_size = table_size if block_size is None else block_size
+        # Find the first axis to be split into blocks, where the leading axes are iterated over
+        split_axis = 0
+        row_size = table_size // output_shape[0] if output_shape[0] > 0 else 0
+        while split_axis < len(output_shape) - 1 and row_size > block_size:
+            split_axis += 1
+            row_size //= output_shape[split_axis]
+        block_rows = max(1, block_size // max(row_size, 1))
+        for leading_index in np.ndindex(*output_shape[:split_axis]):
+            for start in range(0, output_shape[split_axis], block_rows):
+                stop = min(start + block_rows, output_shape[split_axis])
+                block = sum(
+                    Bucket._get_block(aligned_log_table, leading_index, start, stop)
+                    for aligned_log_table in aligned_log_tables
+                )
+                output_log_table[leading_index + (slice(start, stop), )] = semiring.eliminate(block, axis=-1)
+                if with_arguments:
+                    arguments[leading_index + (slice(start, stop), )] = semiring.arg_eliminate(block, axis=-1)
+        if with_arguments:
+            return output_log_table, arguments
+        return output_log_table
+
+    def compute_output_k_best_log_table(self, log_tables, k):
+        """
+        Computes the k largest values of the sum of the aligned input log-tables over
+        the bucket variable and the ranks of the input values, i.e. the k-best
+        max-product.  The k-best log-tables have a leading batch axis and a rank axis,
+        where the values are in descending order along the rank axis.
+
+        Returns the output k-best log-table and the back-pointers of the same shape,
+        which are the flat positions in the shape of (input ranks, variable values), see
+        Bucket.get_k_best_candidate_shape.
+        """
+        log_table = Bucket.combine_k_best_log_tables(
+            tuple(log_tables[log_factor] for log_factor in self._input_log_factors),
+            self._alignments
+        )
+        # Move the rank axes behind the free variables and join them with the variable axis
+        ranks_number = len(self._input_log_factors)
+        log_table = np.moveaxis(log_table, tuple(range(1, ranks_number + 1)), tuple(range(-ranks_number - 1, -1)))
+        log_table = log_table.reshape(log_table.shape[:-ranks_number - 1] + (-1, ))
+        return Bucket.select_k_best(log_table, k)
+
+    def get_k_best_candidate_shape(self, log_tables):
+        """
+        Returns the shape of (input ranks, variable values) of the k-best back-pointers
+        """
+        return tuple(log_tables[log_factor].shape[1] for log_factor in self._input_log_factors) \
+            + (self._alignments[0][1][-1], )
+
     def has_log_factors(self):
         return len(self._input_log_factors) > 0
 
     def has_free_variables(self):
         return len(self._free_variables) > 0
 
-    def compute_output_log_factor(self):
-        # Evaluate free variables
-        free_variables_values = Variable.evaluate_variables(self._free_variables)
-        # Compute the function for the output factor
-        function_value_dict = {}
-        for free_values in free_variables_values:
-            # Zip the free variables with their values
-            free_variables_with_values = tuple(zip(self._free_variables, free_values))
-            # Save the values of the log-factors depending on the values of the summing variable
-            input_log_factors = {
-                value:
-                    tuple(
-                        log_factor(
-                            *log_factor.filter_values(*free_variables_with_values), (self._variable, value)
-                        ) for log_factor in self._input_log_factors
-                    ) for value in self._variable.domain
-                }
-            # Get the maximum log-factor for computational stability
-            max_log_factor = max(max(input_log_factors[value]) for value in self._variable.domain)
-            # Save the values of the function for the output log-factor
-            function_value_dict[free_values] = max_log_factor + math.log(
-                math.fsum(
-                    math.exp(
-                        math.fsum(input_log_factors[value]) - max_log_factor
-                    ) for value in self._variable.domain
-                )
-            )
-        # Return the log-factor unliked to its variables
-        log_factor = Factor(
-            variables=self._free_variables,
-            function=lambda *values: function_value_dict[values],
-            name='log_f_' + self._variable.name,
-            evidence=self._evidential_variables,
-            variable_linking=False
+    def set_alignments(self, scopes, domain_sizes):
+        """
+        Pre-computes how each input log-table is transposed and reshaped to be
+        broadcastable over the bucket variables
+        """
+        self._alignments = tuple(
+            (
+                Bucket.get_alignment_axes(scopes[log_factor], self.variables),
+                Bucket.get_alignment_shape(scopes[log_factor], self.variables, domain_sizes)
+            ) for log_factor in self._input_log_factors
         )
-        return log_factor
 
-    def set_evidential_and_free_variables(self):
+    def set_evidential_and_free_variables(self, evidence):
         bucket_variables = set(var for log_factor in self._input_log_factors for var in log_factor.variables)
-        self._evidential_variables, self._free_variables = \
-            Variable.split_evidential_and_non_evidential_variables(bucket_variables, (self._variable, ))
-        self._free_variables = tuple(sorted(self._free_variables, key=lambda x: x.name))
+        bucket_variables.discard(self._variable)
+        self._evidential_variables = tuple(var for var in bucket_variables if var in evidence)
+        self._free_variables = tuple(sorted(
+            (var for var in bucket_variables if var not in evidence),
+            key=lambda x: x.name
+        ))
+
+    def set_output_log_factor(self, log_factor):
+        self._output_log_factor = log_factor
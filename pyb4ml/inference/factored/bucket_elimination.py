@@ -12,12 +12,16 @@ Sie den vom Autor auferlegten Bedingungen zu.
 
 © 2021 Alexander Vasiliev
 """
-import math
+import concurrent.futures
 
-from pyb4ml.inference.factored.bucket import Bucket
+import numpy as np
+
+from pyb4ml.inference.factored.elimination_plan import CostEstimate, EliminationPlan
 from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.inference.factored.relevance import get_relevant_components
+from pyb4ml.inference.factored.semiring import LOG_SUM, MAX_SUM
 from pyb4ml.modeling import FactorGraph
-from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
 
 
 class BE(FactoredAlgorithm):
@@ -37,9 +41,30 @@ class BE(FactoredAlgorithm):
     can also be changed and the factors computed in the previous run cannot be reused.  
     Moreover, although the different values of evidential variables do not change the 
     elimination order, they also change the computed factors.  All of this makes
-    the bucket caching impractical to reuse.  Instead of the factors, the implementation 
-    also uses logarithms of them for computational stability.  See, for example, [B12]
-    for more details.
+    the bucket caching impractical to reuse.  Instead, the symbolic part of a run, i.e.
+    the bucket assignment, the free variables, and the alignment of the factor tables in 
+    the buckets, is compiled once into an elimination plan for the query, the evidential 
+    variables, and the elimination order.  The plan is reused in the next runs with other
+    evidential values, which are then only numeric.  Instead of the factors, the
+    implementation also uses logarithms of them tabulated over the variable domains for 
+    computational stability.  See, for example, [B12] for more details.
+
+    The intermediate log-tables can be stored out of core in memory-mapped files, so that
+    exact inference is possible even if they exceed the RAM, see BE.set_out_of_core.
+
+    Before the distributions are computed, the factors irrelevant to the query are
+    pruned.  First, the barren variables, e.g. the unobserved variables without
+    children in a Bayesian network, are removed with their factors, since summing them
+    out gives one.  Then, the evidential variables cut the factor graph into connected
+    components.  A component without query variables only contributes a constant,
+    which is normalized away, so that it is skipped.  The elimination order only needs
+    to contain the relevant variables.  The other components are eliminated
+    independently, and in parallel in a thread pool if there are several, see
+    BE.set_max_workers.
+
+    The same buckets can eliminate the variables in another semiring, e.g. by the
+    max-product with back-pointers for the most probable explanations (MPE), see
+    BE.run_mpe and BE.run_semiring.
 
     Computes a marginal (joint if necessary) probability distribution P(Q_1, ..., Q_s)
     or a conditional (joint if necessary) probability distribution
@@ -60,74 +85,216 @@ class BE(FactoredAlgorithm):
     2012
     """
     _name = 'Bucket Elimination'
+    _default_block_size = 2 ** 22
 
     def __init__(self, model: FactorGraph):
         FactoredAlgorithm.__init__(self, model)
-        self._computed_log_factors = []
-        self._bucket_cache = {}
         self._elimination_order = []
         self._print_info = False
-        # Logarithm all the model factors
-        self._logarithm_factors()
+        self._initialize_elimination()
+
+    @property
+    def block_size(self):
+        return self._block_size
 
     @property
     def elimination_order(self):
         return self._elimination_order
 
-    def check_variable_partition(self):
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    @property
+    def out_of_core_storage(self):
+        return self._out_of_core_storage
+
+    def check_variable_partition(self, evidence=None, variables=None):
+        """
+        Checks whether the query, evidence, and elimination order variables are disjoint
+        and cover the variables, by default all the model variables.  By default, the
+        evidence is the set evidence.
+        """
+        evidence = self._evidence if evidence is None else evidence
+        variables = self.variables if variables is None else variables
         set_q = set(self._query)
-        set_e = set(self._evidence)
+        set_e = set(evidence)
         set_o = set(self._elimination_order)
-        set_m = set(self.variables)
         if not set_q.isdisjoint(set_o):
             raise ValueError(f'query variables {tuple(var.name for var in self._query)} and '
                              f'elimination variables {tuple(var.name for var in self._elimination_order)} '                             
                              f'must be disjoint')
         if not set_q.isdisjoint(set_e):
             raise ValueError(f'query variables {tuple(var.name for var in self._query)} and '
-                             f'evidential variables {tuple(var.name for var in self._evidence)} '                             
+                             f'evidential variables {tuple(var.name for var in evidence)} '                             
                              f'must be disjoint')
         if not set_e.isdisjoint(set_o):
-            raise ValueError(f'evidential variables {tuple(var.name for var in self._evidence)} and '
+            raise ValueError(f'evidential variables {tuple(var.name for var in evidence)} and '
                              f'elimination variables {tuple(var.name for var in self._elimination_order)} '                             
                              f'must be disjoint')
-        if set_q.union(set_e).union(set_o) != set_m:
+        if not set(variables) <= set_q.union(set_e).union(set_o):
             raise ValueError('the query, evidence, and elimination variables do not cover all the model variables')
 
-    def run(self, print_info=False):
+    def clear_plan_cache(self):
+        del self._plan_cache
+        self._plan_cache = {}
+
+    def estimate_cost(self, batch_size=1):
+        """
+        Returns the estimated induced width, largest bucket table size, number of
+        multiply-adds, and peak memory in bytes of a run with the set query, evidence, and
+        elimination order, or of a batch run for batch_size evidences, as a CostEstimate.
+        As in a run, only the components of the relevant factors are estimated, and their
+        multiply-adds and peak memories add up.
+        """
         # Check whether a query is specified
         FactoredAlgorithm.check_non_empty_query(self)
-        # Query, evidence, and elimination order variables must be disjoint and build a whole model
-        self.check_variable_partition()
-        # Print the bucket information
-        self._print_info = print_info
-        # Clear the distribution
-        self._distribution = None
-        # Print info if necessary
-        FactoredAlgorithm._print_start(self)
-        # Initialize the bucket cache
-        self._initialize_main_loop()
-        # Run the main loops
-        for variable in self._elimination_order:
-            # If there are the log-factors in the output cache
-            # containing that variable, they should be added into
-            # the bucket of that variable
-            self._add_computed_log_factors_to_bucket_cache(variable)
-            # Compute the output log-factor
-            # of the bucket of the variable
-            # and link it in its free variables
-            self._compute_output_log_factor(variable)
-        for query_var in self._query:
-            # If there are the log-factors in the output cache
-            # containing the query variable, they should be added into
-            # the bucket of the query variable
-            self._add_computed_log_factors_to_bucket_cache(query_var)
+        # Query, evidence, and elimination order variables must be disjoint and cover the relevant variables
+        self.check_variable_partition(variables=self._get_relevant_variables(self._evidence))
+        return self._estimate_component_cost(self._evidence, batch_size)
+
+    def run(self, print_info=False, memory_budget=None):
+        """
+        Computes the distribution.  If the estimated peak memory in bytes of the
+        intermediate log-tables exceeds memory_budget, then MemoryError is raised before
+        the elimination starts.
+        """
+        # Check whether a query is specified
+        FactoredAlgorithm.check_non_empty_query(self)
+        # Query, evidence, and elimination order variables must be disjoint and cover the relevant variables
+        self.check_variable_partition(variables=self._get_relevant_variables(self._evidence))
+        # Run the elimination for the one evidence
+        log_table = self._run_component_plans(self._evidence, self._get_evidence_indices(), print_info, 1, memory_budget)
         # All the output log-factors are distributed on the buckets
         # that belongs to the query variables
-        self._compute_distribution()
+        self._compute_distribution(log_table[0])
         # Print info if necessary
         FactoredAlgorithm._print_stop(self)
 
+    def run_batch(self, evidence_variables, evidence_values, print_info=False, memory_budget=None):
+        """
+        Computes the distributions P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k) for a batch
+        of N evidences over the same evidential variables in one run and returns them as an
+        array of the shape (N, |Q_1|, ..., |Q_s|).  The values of the query variables are
+        on the axes in the order of their domains.  For example,
+        algorithm.run_batch((letter, sat), [('l0', 's0'), ('l1', 's0'), ('l1', 's1')])
+        returns the array of three distributions.
+
+        The evidence of a batch is a leading array axis, so that neither the domains of the
+        evidential variables nor the evidence set with set_evidence are changed.  The
+        memory budget is checked for the whole batch, see BE.run.
+        """
+        # Check whether a query is specified
+        FactoredAlgorithm.check_non_empty_query(self)
+        evidence = self._get_batch_evidence(evidence_variables)
+        # Query, evidence, and elimination order variables must be disjoint and cover the relevant variables
+        self.check_variable_partition(evidence, self._get_relevant_variables(evidence))
+        log_table = self._run_component_plans(
+            evidence,
+            self._get_batch_evidence_indices(evidence_variables, evidence_values),
+            print_info,
+            len(evidence_values),
+            memory_budget
+        )
+        # Print info if necessary
+        FactoredAlgorithm._print_stop(self)
+        return EliminationPlan.normalize(log_table)
+
+    def run_mpe(self, k=1, print_info=False):
+        """
+        Computes the k most probable explanations (MPE) of the query and elimination
+        variables given the evidence, i.e. their joint assignments of the largest
+        probabilities P(Q_1 = q_1, ..., X_1 = x_1, ... | E_1 = e_1, ..., E_k = e_k), and
+        returns them in descending order as a list of tuples (assignment, probability),
+        where an assignment is a dictionary of the model variables and their values.  For
+        example, algorithm.run_mpe(k=2)[0][0][grade] returns the value of random variable
+        Grade in the most probable explanation.
+
+        The explanation is found by the max-product with back-pointers, and the top k
+        explanations by the k-best max-product with rank back-pointers.  The query can be
+        empty if the elimination order contains all the non-evidential variables.
+        """
+        if k < 1:
+            raise ValueError(f'the number {k} of explanations must be positive')
+        # Query, evidence, and elimination order variables must be disjoint and build a whole model
+        self.check_variable_partition()
+        evidence_indices = self._get_evidence_indices()
+        # The log-partition function given the evidence normalizes the probabilities
+        log_partition = float(log_sum_exp(
+            self._run_plan(self._evidence, evidence_indices, print_info, 1, None).ravel(), axis=0
+        ))
+        plan = self._get_plan(self._evidence)
+        if k == 1:
+            back_pointers = {}
+            log_table = self._run_plan(self._evidence, evidence_indices, False, 1, None, MAX_SUM, back_pointers)[0]
+            query_positions = np.unravel_index(np.argmax(log_table), log_table.shape)
+            values = np.array([[log_table[query_positions]]])
+            positions = plan.decode(
+                back_pointers,
+                {var: np.array([position]) for var, position in zip(self._query, query_positions)},
+                1
+            )
+            # The only explanation has the rank of zero
+            positions = {var: var_positions[:, np.newaxis] for var, var_positions in positions.items()}
+        else:
+            values, positions = plan.run_k_best(self._log_tables, evidence_indices, k)
+        FactoredAlgorithm._print_stop(self)
+        explanations = []
+        for rank in range(values.shape[1]):
+            if values[0, rank] == -np.inf:
+                break
+            assignment = {}
+            for var, var_positions in positions.items():
+                outer_var = self._inner_to_outer_variables[var]
+                assignment[outer_var] = outer_var.domain[int(var_positions[0, rank])]
+            for var, val in self._evidence_tuples:
+                assignment[self._inner_to_outer_variables[var]] = val
+            explanations.append((assignment, float(np.exp(values[0, rank] - log_partition))))
+        return explanations
+
+    def run_semiring(self, semiring, print_info=False):
+        """
+        Eliminates the elimination variables in a semiring, see the semiring module, and
+        returns the non-normalized result as an array with the axes of the query variables.
+        For example, algorithm.run_semiring(COUNTING) returns the numbers of the assignments
+        of positive probability for the query values, and algorithm.run_semiring(MAX_SUM)
+        returns the logarithms of the largest non-normalized joint probabilities.
+        """
+        # Query, evidence, and elimination order variables must be disjoint and build a whole model
+        self.check_variable_partition()
+        log_table = self._run_plan(self._evidence, self._get_evidence_indices(), print_info, 1, None, semiring)
+        FactoredAlgorithm._print_stop(self)
+        return semiring.finalize(np.array(log_table[0]))
+
+    def set_max_workers(self, max_workers):
+        """
+        Sets the maximum number of threads eliminating the connected components with
+        query variables in parallel, where None means the default of the thread pool and
+        1 means no thread pool
+        """
+        if max_workers is not None and max_workers < 1:
+            raise ValueError(f'the maximum number {max_workers} of workers must be positive')
+        self._max_workers = max_workers
+
+    def set_out_of_core(self, storage):
+        """
+        Sets a storage for the large intermediate log-tables, e.g.
+        algorithm.set_out_of_core(MemmapStorage(directory='/scratch')) memory-maps
+        them into temporary files, which are streamed over in chunks during the next bucket
+        contraction.  algorithm.set_out_of_core(None) keeps all the log-tables in memory.
+        """
+        self._out_of_core_storage = storage
+
+    def set_block_size(self, block_size):
+        """
+        Sets the maximum number of cells of a bucket log-table computed at once, which
+        bounds the peak memory of a bucket computation.  If the block size is None,
+        a bucket log-table is computed at once.
+        """
+        if block_size is not None and block_size <= 0:
+            raise ValueError(f'the block size {block_size} must be positive')
+        self._block_size = block_size
+
     def set_elimination(self, order):
         # Check whether the elimination order has duplicates
         if len(order) != len(set(order)):
@@ -144,90 +311,189 @@ class BE(FactoredAlgorithm):
             elm_order.append(inner_var)
         self._elimination_order = tuple(elm_order)
 
-    def _add_computed_log_factors_to_bucket_cache(self, variable):
-        bucket = self._bucket_cache[variable]
-        remaining_log_factors = []
-        for log_factor in self._computed_log_factors:
-            if variable in log_factor.variables:
-                bucket.add_log_factor(log_factor)
-            else:
-                remaining_log_factors.append(log_factor)
-        self._computed_log_factors = remaining_log_factors
-        # Print the bucket variable if necessary
-        self._print_bucket(bucket)
-        # Print the bucket input log-factors if necessary
-        self._print_bucket_inputs(bucket)
-
-    def _compute_distribution(self):
-        # Assemble all the log-factors from the query buckets
-        log_factors = []
-        for query_variable in self._query:
-            # Assemble all the log-factors from the query buckets
-            log_factors.extend(self._bucket_cache[query_variable].input_log_factors)
-        query_variables_values = Variable.evaluate_variables(self._query)
-        # Compute the function for the distribution
-        nn_values = {}
-        for query_values in query_variables_values:
-            query_variables_with_values = tuple(zip(self._query, query_values))
-            nn_values[query_values] = math.exp(
-                math.fsum(
-                    log_factor(
-                        *log_factor.filter_values(*query_variables_with_values)) for log_factor in log_factors
-                    )
-                )
-        # The values of the sum can be non-normalized to be the distribution.
-        # The probability distribution must be normalized.
-        norm_const = math.fsum(nn_values[query_values] for query_values in query_variables_values)
-        # Compute the probability distribution
-        self._distribution = {
-            query_values:
-                nn_values[query_values] / norm_const for query_values in query_variables_values
+    @staticmethod
+    def _check_memory_budget(peak_memory, memory_budget):
+        if memory_budget is not None and peak_memory > memory_budget:
+            raise MemoryError(f'the estimated peak memory of {peak_memory} bytes exceeds '
+                              f'the memory budget of {memory_budget} bytes')
+
+    def _compute_distribution(self, log_table):
+        # The distribution is an array with the axes of the query variables
+        self._distribution = EliminationPlan.normalize(log_table[np.newaxis])[0]
+
+    def _estimate_component_cost(self, evidence, batch_size):
+        # The components run at the same time, so that their peak memories add up
+        costs = [plan.estimate_cost(batch_size) for plan in self._get_component_plans(evidence)]
+        return CostEstimate(
+            induced_width=max(cost.induced_width for cost in costs),
+            max_table_size=max(cost.max_table_size for cost in costs),
+            multiply_adds=sum(cost.multiply_adds for cost in costs),
+            peak_memory=sum(cost.peak_memory for cost in costs)
+        )
+
+    def _estimate_peak_memory(self, evidence, batch_size):
+        return self._estimate_component_cost(evidence, batch_size).peak_memory
+
+    def _get_batch_evidence(self, evidence_variables):
+        if len(evidence_variables) != len(set(evidence_variables)):
+            raise ValueError(f'evidence must not contain duplicates')
+        evidence = []
+        for outer_var in evidence_variables:
+            try:
+                evidence.append(self._outer_to_inner_variables[outer_var])
+            except KeyError:
+                raise ValueError(f'no model variable corresponds to evidential variable {outer_var.name}')
+        return tuple(sorted(evidence, key=lambda x: x.name))
+
+    def _get_batch_evidence_indices(self, evidence_variables, evidence_values):
+        evidence_indices = EliminationPlan.get_evidence_indices(
+            evidence_variables,
+            evidence_values,
+            tuple({value: index for index, value in enumerate(outer_var.domain)} for outer_var in evidence_variables)
+        )
+        return {self._outer_to_inner_variables[outer_var]: indices for outer_var, indices in evidence_indices.items()}
+
+    def _get_evidence_indices(self):
+        return {
+            var: np.array([self._inner_to_outer_variables[var].domain.index(val)])
+            for var, val in self._evidence_tuples
         }
 
-    def _compute_output_log_factor(self, variable):
-        # Get the variable bucket
-        bucket = self._bucket_cache[variable]
-        # Set evidential and free variables
-        bucket.set_evidential_and_free_variables()
-        # Compute the output log-factor of that bucket if necessary
-        if bucket.has_log_factors():
-            # If the bucket has no free variables, then the output log-factor is zero
-            if bucket.has_free_variables():
-                # Compute the output log-factor of the bucket
-                log_factor = self._bucket_cache[variable].compute_output_log_factor()
-                # Save the log-factor in the buffer
-                self._computed_log_factors.append(log_factor)
-                # Print the output log-factor if necessary
-                self._print_bucket_outputs(log_factor)
-        # Print the free variables if necessary
-        self._print_bucket_free_variables(bucket)
-
-    def _initialize_bucket_cache(self, variables):
-        for variable in variables:
-            self._bucket_cache[variable] = Bucket(variable)
-            # Fill the variable bucket with factors
-            for log_factor in variable.factors:
-                if log_factor.not_added:
-                    # Add the log-factor into the bucket
-                    self._bucket_cache[variable].add_log_factor(log_factor)
-                    # The factor is now added
-                    log_factor.not_added = False
-
-    def _initialize_factors(self):
-        for log_factor in self.factors:
-            log_factor.not_added = True
-
-    def _initialize_main_loop(self):
-        self._initialize_factors()
-        self._bucket_cache = {}
-        self._initialize_bucket_cache(self._elimination_order)
-        self._initialize_bucket_cache(self._query)
-        self._computed_log_factors = []
-
-    def _logarithm_factors(self):
-        for factor in self.factors:
-            # Logarithm the factor
-            factor.logarithm()
+    def _get_component_plans(self, evidence):
+        key = ('components', self._query, evidence, tuple(self._elimination_order))
+        try:
+            return self._plan_cache[key]
+        except KeyError:
+            plans = [
+                EliminationPlan(
+                    log_factors=log_factors,
+                    query=tuple(var for var in self._query if var in variables),
+                    evidence=evidence,
+                    elimination_order=tuple(var for var in self._elimination_order if var in variables),
+                    domain_sizes=self._domain_sizes
+                ) for variables, log_factors in self._get_relevant_components(evidence)
+            ]
+            self._plan_cache[key] = plans
+            return plans
+
+    def _get_relevant_components(self, evidence):
+        """
+        Returns the connected components of the relevant factors cut by the evidence, see
+        relevance.get_relevant_components, as tuples of (variables, factors)
+        """
+        key = ('relevant', self._query, evidence)
+        try:
+            return self._plan_cache[key]
+        except KeyError:
+            components = get_relevant_components(self.factors, self._query, evidence, self._get_normalized_variables)
+            self._plan_cache[key] = components
+            return components
+
+    def _get_relevant_variables(self, evidence):
+        return frozenset(var for variables, _ in self._get_relevant_components(evidence) for var in variables)
+
+    def _get_plan(self, evidence):
+        key = (self._query, evidence, tuple(self._elimination_order))
+        try:
+            return self._plan_cache[key]
+        except KeyError:
+            plan = EliminationPlan(
+                log_factors=self.factors,
+                query=self._query,
+                evidence=evidence,
+                elimination_order=self._elimination_order,
+                domain_sizes=self._domain_sizes
+            )
+            self._plan_cache[key] = plan
+            return plan
+
+    def _initialize_elimination(self):
+        """
+        Initializes the plan cache, the elimination settings, and the log-tables, also for
+        the subclasses initialized by another base class, see GBE
+        """
+        # Elimination plans compiled for (query, evidence, elimination order)
+        self._plan_cache = {}
+        # Storage of the large intermediate log-tables out of core
+        self._out_of_core_storage = None
+        # Maximum number of cells of a bucket log-table computed at once
+        self._block_size = BE._default_block_size
+        # Maximum number of threads eliminating the connected components
+        self._max_workers = None
+        # Logarithm all the model factors and tabulate them
+        self._logarithm_factors()
+        self._tabulate_log_factors()
+
+    def _initialize_clone(self):
+        FactoredAlgorithm._initialize_clone(self)
+        # The compiled plans are not changed by the runs and the plan cache is shared with the clones
+        self._elimination_order = ()
+
+    def _run_plan(self, evidence, evidence_indices, print_info, batch_size, memory_budget, semiring=LOG_SUM,
+                  back_pointers=None, variable_semirings=None):
+        # Print the bucket information
+        self._print_info = print_info
+        # Clear the distribution
+        self._distribution = None
+        # Get the compiled elimination plan
+        plan = self._get_plan(evidence)
+        # Refuse to start if the run would exceed the memory budget
+        BE._check_memory_budget(plan.estimate_cost(batch_size).peak_memory, memory_budget)
+        # Print info if necessary
+        FactoredAlgorithm._print_start(self)
+        # Print the buckets if necessary
+        self._print_plan(plan)
+        # Run the numeric part of the plan for the evidential values
+        return self._run_numeric_plan(plan, evidence_indices, semiring, back_pointers, variable_semirings)
+
+    def _run_component_plans(self, evidence, evidence_indices, print_info, batch_size, memory_budget):
+        # Only the distributions are computed, so that the irrelevant factors are skipped
+        self._print_info = print_info
+        self._distribution = None
+        plans = self._get_component_plans(evidence)
+        BE._check_memory_budget(self._estimate_peak_memory(evidence, batch_size), memory_budget)
+        FactoredAlgorithm._print_start(self)
+        for plan in plans:
+            self._print_plan(plan)
+        # The storage is not shared by the threads
+        if len(plans) > 1 and self._max_workers != 1 and self._out_of_core_storage is None:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                log_tables = list(executor.map(
+                    lambda component_plan: self._run_numeric_plan(component_plan, evidence_indices),
+                    plans
+                ))
+        else:
+            log_tables = [self._run_numeric_plan(plan, evidence_indices) for plan in plans]
+        # The log-table of the query variables is the sum of the independent component log-tables
+        return EliminationPlan.combine_log_tables(plans, log_tables, self._query, self._domain_sizes, batch_size)
+
+    def _run_numeric_plan(self, plan, evidence_indices, semiring=LOG_SUM, back_pointers=None,
+                          variable_semirings=None):
+        if self._out_of_core_storage is None:
+            return plan.run(
+                self._log_tables, evidence_indices, block_size=self._block_size, semiring=semiring,
+                back_pointers=back_pointers, variable_semirings=variable_semirings
+            )
+        # The out-of-core log-tables are streamed in chunks
+        block_size = self._out_of_core_storage.chunk_bytes // np.dtype(float).itemsize
+        if self._block_size is not None:
+            block_size = min(block_size, self._block_size)
+        with self._out_of_core_storage as storage:
+            return np.array(plan.run(
+                self._log_tables, evidence_indices, storage, max(block_size, 1), semiring, back_pointers,
+                variable_semirings
+            ))
+
+    def _print_plan(self, plan):
+        if self._print_info:
+            for bucket in plan.buckets:
+                self._print_bucket(bucket)
+                self._print_bucket_inputs(bucket)
+                self._print_bucket_free_variables(bucket)
+                self._print_bucket_outputs(bucket.output_log_factor)
+            for bucket in plan.query_buckets:
+                self._print_bucket(bucket)
+                self._print_bucket_inputs(bucket)
 
     def _print_bucket(self, bucket):
         if self._print_info:
@@ -0,0 +1,236 @@
+"""
+The module contains the class of a compiled model shared by concurrent inferences.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import threading
+
+import numpy as np
+
+from pyb4ml.inference.factored.bucket_elimination import BE
+from pyb4ml.inference.factored.elimination_plan import EliminationPlan
+from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.inference.factored.greedy_ordering import GO
+from pyb4ml.inference.factored.relevance import get_normalized_variables, get_relevant_components
+from pyb4ml.modeling import FactorGraph
+from pyb4ml.modeling.factor_graph.table_factor import TableFactor
+
+
+class InferenceState:
+    """
+    Contains the query, the evidence, and the computed distribution of one inference on
+    a compiled model, see CompiledModel.infer.  The state belongs to the caller, so that
+    concurrent inferences never share it.
+    """
+    __slots__ = ('_query', '_evidence', '_distribution')
+
+    def __init__(self, query, evidence, distribution):
+        self._query = query
+        self._evidence = evidence
+        self._distribution = distribution
+
+    @property
+    def distribution(self):
+        """
+        Returns the probability distribution as an array with the axes of the query
+        variables, the positions on the axes being the positions in their domains
+        """
+        return self._distribution
+
+    @property
+    def evidence(self):
+        return self._evidence
+
+    @property
+    def pd(self):
+        """
+        Returns the probability distribution as a function of the query values, see
+        FactoredAlgorithm.pd
+        """
+        return FactoredAlgorithm._get_distribution_function(self._query, self._distribution)
+
+    @property
+    def query(self):
+        return self._query
+
+
+class CompiledModel:
+    """
+    Contains everything of a model that does not depend on a query or an evidence: the
+    log-tables of the factors over the complete variable domains, the variables over
+    which each factor is normalized, and the domain sizes.  The log-tables are read-only
+    and the model variables and factors are never changed, in particular the variable
+    domains are not reduced to the evidential values.  The elimination orders found by
+    Greedy Ordering (GO) and the elimination plans are compiled once per query and set of
+    evidential variables and cached.
+
+    An inference keeps its query, evidence, and distribution in its own InferenceState,
+    so that any number of threads can run inferences on one compiled model at the same
+    time.  Only the compilation of an order and the caching of a plan are locked; the
+    elimination itself runs without a lock, and NumPy releases the GIL in the large
+    array operations.  The algorithm classes, e.g. BE or GBE, keep the query and
+    evidence in the algorithm and are therefore not reentrant.
+
+    The distributions are computed by Bucket Elimination (BE) over the connected
+    components of the relevant factors, see relevance.get_relevant_components.
+    """
+    def __init__(self, model: FactorGraph, cost='weighted-min-fill'):
+        self._model = model
+        self._cost = cost
+        self._variables = tuple(model.variables)
+        self._factors = tuple(model.factors)
+        self._domain_sizes = {var: len(var.domain) for var in self._variables}
+        # Positions of the values in the variable domains
+        self._positions = {var: {value: index for index, value in enumerate(var.domain)} for var in self._variables}
+        self._log_tables = {}
+        self._normalized_variables = {}
+        for factor in self._factors:
+            table = factor.table if isinstance(factor, TableFactor) else TableFactor.from_factor(factor).table
+            if isinstance(factor, TableFactor) and factor.logarithmic:
+                log_table = np.array(table, dtype=float)
+                table = np.exp(log_table)
+            else:
+                with np.errstate(divide='ignore'):
+                    log_table = np.log(table)
+            log_table.setflags(write=False)
+            self._log_tables[factor] = log_table
+            self._normalized_variables[factor] = get_normalized_variables(factor.variables, table)
+        # Orders and plans compiled for the queries and sets of evidential variables
+        self._orders = {}
+        self._plans = {}
+        # The ordering algorithm is not reentrant and only used under the lock
+        self._ordering = None
+        self._lock = threading.Lock()
+
+    @property
+    def cost(self):
+        return self._cost
+
+    @property
+    def factors(self):
+        return self._factors
+
+    @property
+    def model(self):
+        return self._model
+
+    @property
+    def variables(self):
+        return self._variables
+
+    def check_query_and_evidence(self, query, evidence_variables):
+        """
+        Checks whether the query and evidential variables are model variables without
+        duplicates and disjoint, and returns them sorted by name
+        """
+        query = tuple(query)
+        if not query:
+            raise ValueError('query must not be empty')
+        if len(query) != len(set(query)):
+            raise ValueError('query must not contain duplicates')
+        if len(evidence_variables) != len(set(evidence_variables)):
+            raise ValueError('evidence must not contain duplicates')
+        for var in query:
+            if var not in self._domain_sizes:
+                raise ValueError(f'no model variable corresponds to query variable {var.name}')
+        for var in evidence_variables:
+            if var not in self._domain_sizes:
+                raise ValueError(f'no model variable corresponds to evidential variable {var.name}')
+            if var in query:
+                raise ValueError(f'query and evidential variable {var.name} must be disjoint')
+        return tuple(sorted(query, key=lambda x: x.name)), tuple(sorted(evidence_variables, key=lambda x: x.name))
+
+    def get_evidence_indices(self, evidence_variables, evidence_values):
+        """
+        Returns the positions of the values of the evidential variables in their domains
+        as arrays of the batch length, where evidence_values is a sequence of tuples of
+        the values, and raises ValueError for an illegal value
+        """
+        return EliminationPlan.get_evidence_indices(
+            evidence_variables, evidence_values, tuple(self._positions[var] for var in evidence_variables)
+        )
+
+    def infer(self, query, evidence=(), memory_budget=None):
+        """
+        Computes the probability distribution P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k)
+        of the query variables given the evidence, i.e. a tuple of (variable, value) pairs,
+        and returns it as an InferenceState.  The query variables are sorted by name as in
+        the algorithms.  For example, model.infer((grade, ), ((letter, 'l1'), )).pd('g0')
+        returns P(Grade = 'g0' | Letter = 'l1').  If the estimated peak memory in bytes
+        exceeds memory_budget, then MemoryError is raised before the elimination starts.
+        """
+        evidence = tuple(evidence)
+        evidence_variables = tuple(var for var, _ in evidence)
+        query, sorted_evidence = self.check_query_and_evidence(query, evidence_variables)
+        evidence_indices = self.get_evidence_indices(evidence_variables, (tuple(val for _, val in evidence), ))
+        log_table = self._run(query, sorted_evidence, evidence_indices, 1, memory_budget)
+        return InferenceState(query, evidence, EliminationPlan.normalize(log_table)[0])
+
+    def infer_batch(self, query, evidence_variables, evidence_values, memory_budget=None):
+        """
+        Computes the distributions for a batch of N evidences over the same evidential
+        variables in one run and returns them as an array of the shape (N, |Q_1|, ...,
+        |Q_s|), see BE.run_batch
+        """
+        evidence_variables = tuple(evidence_variables)
+        query, sorted_evidence = self.check_query_and_evidence(query, evidence_variables)
+        evidence_indices = self.get_evidence_indices(evidence_variables, evidence_values)
+        log_table = self._run(query, sorted_evidence, evidence_indices, len(evidence_values), memory_budget)
+        return EliminationPlan.normalize(log_table)
+
+    def _get_component_plans(self, query, evidence):
+        key = (query, evidence)
+        try:
+            return self._plans[key]
+        except KeyError:
+            pass
+        elimination_order = self._get_elimination_order(query, evidence)
+        plans = tuple(
+            EliminationPlan(
+                log_factors=log_factors,
+                query=tuple(var for var in query if var in variables),
+                evidence=evidence,
+                elimination_order=tuple(var for var in elimination_order if var in variables),
+                domain_sizes=self._domain_sizes
+            ) for variables, log_factors in get_relevant_components(
+                self._factors, query, evidence, self._normalized_variables.__getitem__
+            )
+        )
+        # Another thread may have compiled the same plans in the meantime
+        with self._lock:
+            return self._plans.setdefault(key, plans)
+
+    def _get_elimination_order(self, query, evidence):
+        key = (query, evidence)
+        with self._lock:
+            try:
+                return self._orders[key]
+            except KeyError:
+                pass
+            if self._ordering is None:
+                self._ordering = GO(self._model)
+            self._ordering.set_query(*query)
+            self._ordering.run_for(evidence, self._cost)
+            self._orders[key] = self._ordering.order
+            return self._orders[key]
+
+    def _run(self, query, evidence, evidence_indices, batch_size, memory_budget):
+        plans = self._get_component_plans(query, evidence)
+        BE._check_memory_budget(sum(plan.estimate_cost(batch_size).peak_memory for plan in plans), memory_budget)
+        # The log-table of the query variables is the sum of the independent component log-tables
+        return EliminationPlan.combine_log_tables(
+            plans,
+            [plan.run(self._log_tables, evidence_indices) for plan in plans],
+            query,
+            self._domain_sizes,
+            batch_size
+        )
@@ -0,0 +1,209 @@
+"""
+The module contains the front end choosing an inference algorithm for a model.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import collections
+import threading
+import weakref
+
+from pyb4ml.inference.factored.belief_propagation import BP
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.inference.factored.greedy_ordering import GO
+from pyb4ml.inference.factored.loopy_belief_propagation import LBP
+from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+
+# Structure of a model:
+# is_tree is whether the factor graph has no cycles,
+# components are the connected components as tuples of variables,
+# induced_width is the induced width of the order found by GO eliminating all the variables.
+ModelStructure = collections.namedtuple('ModelStructure', ('is_tree', 'components', 'induced_width'))
+
+# Result of an inference:
+# pd is the probability distribution as a function of the query values, see FactoredAlgorithm.pd,
+# engine is the name of the algorithm that computed it,
+# exact is whether the distribution is exact.
+Inference = collections.namedtuple('Inference', ('pd', 'engine', 'exact'))
+
+
+class Dispatcher:
+    """
+    Chooses the cheapest algorithm computing the distribution of a query given an
+    evidence and runs it.  The Belief Propagation (BP) algorithm answers the queries of
+    one variable in trees.  Greedy Bucket Elimination (GBE) answers the other queries,
+    i.e. in loopy graphs or of several variables.  If approximations are allowed, Loopy
+    Belief Propagation (LBP) computes an approximate distribution for a query of one
+    variable instead: up front if the induced width of the model, see
+    Dispatcher.analyze, exceeds max_induced_width, or if a memory budget is given and
+    GBE would exceed it for any of its cost criteria.  Otherwise, MemoryError is raised.
+
+    The structure of a model, see Dispatcher.analyze, and the algorithms for a model are
+    created once and reused for all the inferences on that model, so that their message,
+    plan, and order caches are shared.  The structures only weakly reference the
+    models, while the algorithms keep their models until Dispatcher.forget is called.
+    The chosen engines are recorded, see Dispatcher.last_engine and
+    Dispatcher.engine_counts.
+
+    The algorithms keep the query and evidence and are not reentrant, so that the
+    inferences of a dispatcher are serialized by a lock.  For concurrent inferences on
+    one model, use CompiledModel instead.
+    """
+    def __init__(self, memory_budget=None, allow_approximate=True, cost='weighted-min-fill', max_induced_width=None):
+        if max_induced_width is not None and max_induced_width < 0:
+            raise ValueError(f'the maximum induced width {max_induced_width} must be non-negative')
+        self._memory_budget = memory_budget
+        self._allow_approximate = allow_approximate
+        self._cost = cost
+        self._max_induced_width = max_induced_width
+        # Structures and algorithms of the models
+        self._structures = weakref.WeakKeyDictionary()
+        self._algorithms = {}
+        # The algorithms are run by one thread at a time
+        self._lock = threading.RLock()
+        self._last_engine = None
+        self._engine_counts = collections.Counter()
+
+    @property
+    def allow_approximate(self):
+        return self._allow_approximate
+
+    @property
+    def engine_counts(self):
+        """
+        Returns the numbers of the inferences by each engine as a Counter of engine names
+        """
+        return self._engine_counts
+
+    @property
+    def last_engine(self):
+        return self._last_engine
+
+    @property
+    def max_induced_width(self):
+        return self._max_induced_width
+
+    @property
+    def memory_budget(self):
+        return self._memory_budget
+
+    def analyze(self, model: FactorGraph):
+        """
+        Returns the structure of the model as a ModelStructure, where the cycles and the
+        connected components are found in linear time and the induced width is estimated
+        with the order found by Greedy Ordering (GO) for eliminating all the variables
+        """
+        with self._lock:
+            try:
+                return self._structures[model]
+            except KeyError:
+                pass
+            ordering = GO(model)
+            ordering.run(self._cost)
+            structure = ModelStructure(
+                is_tree=model.is_tree(),
+                components=model.components,
+                induced_width=ordering.estimate_cost().induced_width
+            )
+            self._structures[model] = structure
+            return structure
+
+    def forget(self, model: FactorGraph):
+        """
+        Removes the structure and the algorithms of the model, so that the model and
+        the caches of its algorithms can be freed
+        """
+        with self._lock:
+            self._structures.pop(model, None)
+            self._algorithms.pop(model, None)
+
+    def get_algorithm(self, model: FactorGraph, algorithm_class):
+        """
+        Returns the algorithm of the class, e.g. GBE, used for the inferences on the
+        model, where it is created on the first call.  The algorithm must not be run
+        while the dispatcher infers on the model.
+        """
+        with self._lock:
+            algorithms = self._algorithms.setdefault(model, {})
+            try:
+                return algorithms[algorithm_class]
+            except KeyError:
+                algorithm = algorithm_class(model)
+                algorithms[algorithm_class] = algorithm
+                return algorithm
+
+    def infer(self, model: FactorGraph, query, evidence=(), print_info=False):
+        """
+        Computes the probability distribution of the query variables given the evidence,
+        i.e. a tuple of (variable, value) pairs, with the cheapest algorithm and returns it
+        as an Inference.  For example, infer(model, (grade, ), ((letter, 'l1'), )).pd('g0')
+        returns P(Grade = 'g0' | Letter = 'l1').
+        """
+        query = tuple(query)
+        evidence = tuple(evidence)
+        if not query:
+            raise ValueError('query must not be empty')
+        with self._lock:
+            return self._infer(model, query, evidence, print_info)
+
+    def _infer(self, model, query, evidence, print_info):
+        structure = self.analyze(model)
+        if len(query) == 1 and structure.is_tree:
+            inference = self._run(model, BP, query, evidence, print_info)
+        elif len(query) == 1 and self._allow_approximate and self._max_induced_width is not None \
+                and structure.induced_width > self._max_induced_width:
+            # The exact elimination would be too expensive
+            inference = self._run(model, LBP, query, evidence, print_info)
+        else:
+            try:
+                inference = self._run(model, GBE, query, evidence, print_info)
+            except MemoryError:
+                if len(query) > 1 or not self._allow_approximate:
+                    raise
+                inference = self._run(model, LBP, query, evidence, print_info)
+        self._last_engine = inference.engine
+        self._engine_counts[inference.engine] += 1
+        return inference
+
+    def _run(self, model, algorithm_class, query, evidence, print_info):
+        algorithm = self.get_algorithm(model, algorithm_class)
+        algorithm.set_query(*query)
+        if evidence:
+            algorithm.set_evidence(*evidence)
+        else:
+            algorithm.set_evidence(None)
+        if algorithm_class is GBE:
+            algorithm.run(cost=self._cost, print_info=print_info, memory_budget=self._memory_budget)
+        else:
+            algorithm.run(print_info=print_info)
+        # The distribution function keeps the computed distribution after the next runs
+        return Inference(pd=algorithm.pd, engine=algorithm_class.__name__, exact=algorithm_class is not LBP)
+
+
+_default_dispatcher = Dispatcher()
+
+
+def infer(model: FactorGraph, query, evidence=(), print_info=False):
+    """
+    Computes the probability distribution of the query variables given the evidence with
+    the cheapest algorithm chosen by the default dispatcher, see Dispatcher.infer.  The
+    default dispatcher keeps the algorithms of every model until forget is called for
+    it, and its inferences are serialized, see Dispatcher.
+    """
+    return _default_dispatcher.infer(model, query, evidence, print_info)
+
+
+def forget(model: FactorGraph):
+    """
+    Removes the structure and the algorithms of the model from the default dispatcher,
+    see Dispatcher.forget
+    """
+    _default_dispatcher.forget(model)
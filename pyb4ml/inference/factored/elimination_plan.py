@@ -0,0 +1,359 @@
+import collections
+
+import numpy as np
+
+from pyb4ml.inference.factored.bucket import Bucket
+from pyb4ml.inference.factored.semiring import LOG_SUM
+from pyb4ml.modeling.factor_graph.factor import Factor
+
+# Cost of an elimination plan:
+# induced_width is the largest number of free variables in a bucket,
+# max_table_size is the largest number of cells of a bucket table,
+# multiply_adds is the number of additions of the log-tables and of the summations,
+# peak_memory is the largest number of bytes held by the intermediate log-tables.
+CostEstimate = collections.namedtuple(
+    'CostEstimate',
+    ('induced_width', 'max_table_size', 'multiply_adds', 'peak_memory')
+)
+
+
+class EliminationPlan:
+    """
+    Contains the symbolic part of a Bucket Elimination run compiled once for a query,
+    a set of evidential variables, and an elimination order: the assignment of the
+    log-factors to the buckets, the free variables and the output scope of each bucket,
+    and how each input log-table is aligned in its bucket.  Running the plan is only
+    numeric and can be repeated for any values of the evidential variables.
+
+    The log-tables of the model factors are given over the complete variable domains.
+    They are reduced to the evidential values by indexing, where an array of evidential
+    values gives a leading batch axis.  All the intermediate log-tables carry that batch
+    axis, which has a length of one if they do not depend on the evidence.
+    """
+    def __init__(self, log_factors, query, evidence, elimination_order, domain_sizes):
+        self._log_factors = tuple(log_factors)
+        self._query = tuple(query)
+        self._evidence = frozenset(evidence)
+        self._elimination_order = tuple(elimination_order)
+        self._domain_sizes = domain_sizes
+        # Buckets of the elimination variables
+        self._buckets = []
+        # Buckets of the query variables and their log-factors
+        self._query_buckets = []
+        self._query_log_factors = []
+        # Log-factors without non-evidential variables
+        self._constant_log_factors = []
+        # Non-evidential variables of each log-factor
+        self._scopes = {}
+        # Axes and variables of evidential variables in each model log-factor
+        self._evidence_axes = {}
+        self._compile()
+
+    @property
+    def buckets(self):
+        return self._buckets
+
+    @property
+    def query(self):
+        return self._query
+
+    @property
+    def query_buckets(self):
+        return self._query_buckets
+
+    @staticmethod
+    def combine_log_tables(plans, log_tables, query, domain_sizes, batch_size):
+        """
+        Returns the sum of the log-tables computed by the plans of independent components,
+        see EliminationPlan.run, aligned to the query variables and broadcast to the batch
+        size.  The log-table of a component whose factors carry no evidence has a batch
+        axis of length one, so that the batch size cannot be taken from the log-tables.
+        """
+        log_table = np.zeros((1, ) + (1, ) * len(query))
+        for plan, component_log_table in zip(plans, log_tables):
+            log_table = log_table + Bucket.align_log_table(component_log_table, plan.query, query, domain_sizes)
+        return np.broadcast_to(log_table, (batch_size, ) + tuple(domain_sizes[var] for var in query))
+
+    @staticmethod
+    def get_evidence_indices(evidence_variables, evidence_values, positions):
+        """
+        Returns the positions of the values of the evidential variables in their complete
+        domains as arrays of the batch length, see EliminationPlan.run.  evidence_values
+        is a sequence of tuples of the values, and positions contains a dictionary of the
+        value positions for each evidential variable.
+        """
+        evidence_indices = {}
+        columns = tuple(zip(*evidence_values)) if len(evidence_values) > 0 else ((), ) * len(evidence_variables)
+        if len(columns) != len(evidence_variables):
+            raise ValueError(f'the evidential values do not match '
+                             f'the {len(evidence_variables)} evidential variables')
+        for var, var_positions, column in zip(evidence_variables, positions, columns):
+            try:
+                evidence_indices[var] = np.fromiter(
+                    (var_positions[value] for value in column), dtype=np.intp, count=len(column)
+                )
+            except KeyError as exception:
+                raise ValueError(f'variable {var.name} cannot have the value of {exception.args[0]}')
+        return evidence_indices
+
+    @staticmethod
+    def normalize(log_table):
+        """
+        Returns the probability distributions of a non-normalized log-table with a leading
+        batch axis, see EliminationPlan.run, normalized for each evidence in the batch
+        """
+        # The operations are in place so that only one array of the table size is allocated
+        axes = tuple(range(1, log_table.ndim))
+        values = np.subtract(log_table, np.max(log_table, axis=axes, keepdims=True))
+        np.exp(values, out=values)
+        values /= np.sum(values, axis=axes, keepdims=True)
+        return values
+
+    def estimate_cost(self, batch_size=1, itemsize=8):
+        """
+        Estimates the cost of a run for a batch of evidences from the bucket scopes without
+        computing any log-table.  A bucket log-table is counted twice in the peak memory,
+        since the log-sum-exp holds a temporary array of the same size.
+        """
+        # Numbers of the cells of the log-tables alive during the run
+        live_sizes = {}
+        batched = {}
+        for log_factor in self._log_factors:
+            if log_factor in self._scopes:
+                batched[log_factor] = len(self._evidence_axes[log_factor]) > 0
+                live_sizes[log_factor] = self._get_table_size(self._scopes[log_factor]) \
+                    * (batch_size if batched[log_factor] else 1)
+        live_size = sum(live_sizes.values())
+        peak_size = live_size
+        induced_width = max(len(self._query) - 1, 0)
+        max_table_size = self._get_table_size(self._query)
+        multiply_adds = 0
+        for bucket in self._buckets:
+            bucket_batched = any(batched[log_factor] for log_factor in bucket.input_log_factors)
+            table_size = self._get_table_size(bucket.variables)
+            batched_table_size = table_size * (batch_size if bucket_batched else 1)
+            induced_width = max(induced_width, len(bucket.free_variables))
+            max_table_size = max(max_table_size, table_size)
+            multiply_adds += batched_table_size * len(bucket.input_log_factors)
+            peak_size = max(peak_size, live_size + 2 * batched_table_size)
+            # The input log-tables are released and the output log-table is kept
+            for log_factor in bucket.input_log_factors:
+                live_size -= live_sizes.pop(log_factor)
+            output_log_factor = bucket.output_log_factor
+            batched[output_log_factor] = bucket_batched
+            live_sizes[output_log_factor] = self._get_table_size(bucket.free_variables) \
+                * (batch_size if bucket_batched else 1)
+            live_size += live_sizes[output_log_factor]
+        query_batched = any(batched[log_factor] for log_factor in self._query_log_factors + self._constant_log_factors)
+        query_table_size = self._get_table_size(self._query) * (batch_size if query_batched else 1)
+        multiply_adds += query_table_size * (len(self._query_log_factors) + len(self._constant_log_factors))
+        peak_size = max(peak_size, live_size + query_table_size)
+        return CostEstimate(induced_width, max_table_size, multiply_adds, peak_size * itemsize)
+
+    def decode(self, back_pointers, query_positions, batch_size):
+        """
+        Returns the positions of the values of the query and elimination variables in
+        their complete domains as arrays of the batch length, where the positions of the
+        query values are given and those of the eliminated variables are decoded with the
+        back-pointers from a run, see EliminationPlan.run.  In mixed semirings, the
+        variables selected by the semiring must be eliminated after the summed ones, and
+        only they are decoded.
+        """
+        positions = dict(query_positions)
+        for bucket in reversed(self._buckets):
+            # The buckets without back-pointers are the summed ones eliminated before
+            if bucket.variable not in back_pointers:
+                break
+            arguments = back_pointers[bucket.variable]
+            batch_index = np.arange(batch_size) if arguments.shape[0] > 1 else 0
+            positions[bucket.variable] = np.broadcast_to(
+                arguments[(batch_index, ) + tuple(positions[var] for var in bucket.free_variables)],
+                (batch_size, )
+            )
+        return positions
+
+    def run(self, log_tables, evidence_indices, storage=None, block_size=None, semiring=LOG_SUM, back_pointers=None,
+            variable_semirings=None):
+        """
+        Returns the non-normalized log-table over the query variables with a leading batch
+        axis.  log_tables maps the model log-factors to their complete log-tables, and
+        evidence_indices maps the evidential variables to arrays of the positions of their
+        values in the complete domains, all the arrays having the batch length.  If an
+        entered storage is given, see MemmapStorage, the large bucket log-tables are stored
+        out of core.  If a block size is given, the bucket log-tables are computed in blocks
+        of at most that many cells, see Bucket.compute_output_log_table.
+
+        The variables are eliminated in the semiring, by default by the sum-product.  If
+        back_pointers is a dictionary, the back-pointers of the semiring selecting values,
+        e.g. of the max-product, are put into it for decoding, see EliminationPlan.decode.
+        The buckets of the variables in variable_semirings eliminate them in the given
+        semirings instead, e.g. by the maximum for the marginal MAP.
+        """
+        computed_log_tables = self._get_reduced_log_tables(log_tables, evidence_indices, semiring)
+        for bucket in self._buckets:
+            bucket_semiring = self._get_bucket_semiring(bucket, semiring, variable_semirings)
+            if back_pointers is not None and bucket_semiring.has_arguments:
+                output_log_table, back_pointers[bucket.variable] = bucket.compute_output_log_table(
+                    computed_log_tables, storage, block_size, bucket_semiring, with_arguments=True
+                )
+            else:
+                output_log_table = bucket.compute_output_log_table(
+                    computed_log_tables, storage, block_size, bucket_semiring
+                )
+            # The input log-tables of the bucket are not needed anymore
+            for log_factor in bucket.input_log_factors:
+                log_table = computed_log_tables.pop(log_factor)
+                if storage is not None:
+                    storage.release(log_table)
+            computed_log_tables[bucket.output_log_factor] = output_log_table
+        # Combine the log-tables in the query buckets
+        query_log_table = np.zeros((1, ) + (1, ) * len(self._query))
+        for log_factor in self._query_log_factors:
+            query_log_table = query_log_table + Bucket.align_log_table(
+                computed_log_tables[log_factor], self._scopes[log_factor], self._query, self._domain_sizes
+            )
+        # Add the log-tables independent of the query variables
+        for log_factor in self._constant_log_factors:
+            query_log_table = query_log_table + computed_log_tables[log_factor].reshape(
+                (-1, ) + (1, ) * len(self._query)
+            )
+        return np.broadcast_to(
+            query_log_table,
+            (query_log_table.shape[0], ) + tuple(self._domain_sizes[var] for var in self._query)
+        )
+
+    def run_k_best(self, log_tables, evidence_indices, k):
+        """
+        Returns the k largest values of the non-normalized joint log-table of the query and
+        elimination variables, i.e. the top-k most probable explanations, as an array of
+        the shape (batch length, k) in descending order.  Also returns the positions of the
+        values of the explanations in the complete domains as arrays of the same shape.
+        If there are fewer than k explanations, the remaining values are minus infinity.
+        """
+        # The k-best log-tables have a rank axis behind the batch axis
+        computed_log_tables = {
+            log_factor: log_table[:, np.newaxis]
+            for log_factor, log_table in self._get_reduced_log_tables(log_tables, evidence_indices).items()
+        }
+        back_pointers = {}
+        for bucket in self._buckets:
+            candidate_shape = bucket.get_k_best_candidate_shape(computed_log_tables)
+            output_log_table, arguments = bucket.compute_output_k_best_log_table(computed_log_tables, k)
+            back_pointers[bucket] = (arguments, candidate_shape)
+            for log_factor in bucket.input_log_factors:
+                del computed_log_tables[log_factor]
+            computed_log_tables[bucket.output_log_factor] = output_log_table
+        # Select the k best values of the query variables together with the ranks of their log-tables
+        query_input_log_factors = self._query_log_factors + self._constant_log_factors
+        query_shape = tuple(self._domain_sizes[var] for var in self._query)
+        query_log_table = Bucket.combine_k_best_log_tables(
+            tuple(computed_log_tables[log_factor] for log_factor in query_input_log_factors),
+            tuple(
+                (
+                    Bucket.get_alignment_axes(self._scopes[log_factor], self._query),
+                    Bucket.get_alignment_shape(self._scopes[log_factor], self._query, self._domain_sizes)
+                ) for log_factor in query_input_log_factors
+            )
+        ) + np.zeros((1, ) * (len(query_input_log_factors) + 1) + query_shape)
+        candidate_shape = query_log_table.shape[1:]
+        values, arguments = Bucket.select_k_best(query_log_table.reshape((query_log_table.shape[0], -1)), k)
+        batch_size = values.shape[0]
+        # Decode the explanations
+        unraveled_arguments = np.unravel_index(arguments, candidate_shape)
+        log_factor_ranks = dict(zip(query_input_log_factors, unraveled_arguments[:len(query_input_log_factors)]))
+        positions = dict(zip(self._query, unraveled_arguments[len(query_input_log_factors):]))
+        for bucket in reversed(self._buckets):
+            arguments, candidate_shape = back_pointers[bucket]
+            batch_index = np.arange(batch_size)[:, np.newaxis] if arguments.shape[0] > 1 else 0
+            *ranks, positions[bucket.variable] = np.unravel_index(
+                arguments[
+                    (batch_index, log_factor_ranks[bucket.output_log_factor])
+                    + tuple(positions[var] for var in bucket.free_variables)
+                ],
+                candidate_shape
+            )
+            log_factor_ranks.update(zip(bucket.input_log_factors, ranks))
+        return values, positions
+
+    def _compile(self):
+        self._set_scopes()
+        # Fill the buckets with the model log-factors in the elimination order
+        # and then in the order of the query variables
+        variable_buckets = {var: Bucket(var) for var in self._elimination_order + self._query}
+        not_added = list(self._log_factors)
+        for var in self._elimination_order + self._query:
+            remaining = []
+            for log_factor in not_added:
+                if var in log_factor.variables:
+                    variable_buckets[var].add_log_factor(log_factor)
+                else:
+                    remaining.append(log_factor)
+            not_added = remaining
+        # The log-factors depending only on evidential variables are constants
+        self._constant_log_factors.extend(not_added)
+        # Distribute the output log-factors on the buckets
+        computed_log_factors = []
+        for var in self._elimination_order + self._query:
+            bucket = variable_buckets[var]
+            remaining = []
+            for log_factor in computed_log_factors:
+                if var in log_factor.variables:
+                    bucket.add_log_factor(log_factor)
+                else:
+                    remaining.append(log_factor)
+            computed_log_factors = remaining
+            if var in self._query:
+                self._query_buckets.append(bucket)
+                self._query_log_factors.extend(bucket.input_log_factors)
+                continue
+            bucket.set_evidential_and_free_variables(self._evidence)
+            if bucket.has_log_factors():
+                bucket.set_alignments(self._scopes, self._domain_sizes)
+                # The output log-factor is only a placeholder for its log-table
+                log_factor = Factor(
+                    variables=bucket.free_variables,
+                    name='log_f_' + var.name,
+                    variable_linking=False
+                )
+                self._scopes[log_factor] = bucket.free_variables
+                bucket.set_output_log_factor(log_factor)
+                self._buckets.append(bucket)
+                # If the bucket has no free variables, then the output log-factor is a constant
+                if bucket.has_free_variables():
+                    computed_log_factors.append(log_factor)
+                else:
+                    self._constant_log_factors.append(log_factor)
+
+    def _get_bucket_semiring(self, bucket, semiring, variable_semirings):
+        if variable_semirings is not None:
+            return variable_semirings.get(bucket.variable, semiring)
+        return semiring
+
+    def _get_table_size(self, variables):
+        table_size = 1
+        for var in variables:
+            table_size *= self._domain_sizes[var]
+        return table_size
+
+    def _get_reduced_log_tables(self, log_tables, evidence_indices, semiring=LOG_SUM):
+        return {
+            log_factor: semiring.convert(
+                self._reduce_log_table(log_factor, log_tables[log_factor], evidence_indices)
+            )
+            for log_factor in self._log_factors if log_factor in self._scopes
+        }
+
+    def _reduce_log_table(self, log_factor, log_table, evidence_indices):
+        evidence_axes = self._evidence_axes[log_factor]
+        if evidence_axes:
+            axes, variables = zip(*evidence_axes)
+            return np.moveaxis(log_table, axes, range(len(axes)))[tuple(evidence_indices[var] for var in variables)]
+        else:
+            return log_table[np.newaxis]
+
+    def _set_scopes(self):
+        for log_factor in self._log_factors:
+            self._scopes[log_factor] = tuple(var for var in log_factor.variables if var not in self._evidence)
+            self._evidence_axes[log_factor] = tuple(
+                (axis, var) for axis, var in enumerate(log_factor.variables) if var in self._evidence
+            )
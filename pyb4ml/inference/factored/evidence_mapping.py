@@ -0,0 +1,206 @@
+"""
+The module contains the fan-out of many evidences over processes sharing the log-tables.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import collections
+import concurrent.futures
+import itertools
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pyb4ml.inference.factored.bucket_elimination import BE
+from pyb4ml.inference.factored.elimination_plan import EliminationPlan
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.modeling.factor_graph.factor import Factor
+
+# Evidence mapper of a worker process, set by the pool initializer
+_worker_mapper = None
+
+
+def map_evidence(algorithm: BE, evidence_variables, rows, workers=None, chunk_size=4096, cost='weighted-min-fill'):
+    """
+    Computes the distributions P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k) of the query
+    of a BE or GBE algorithm for many evidences over the same evidential variables and
+    yields them in the order of the rows as arrays of the shape (|Q_1|, ..., |Q_s|), see
+    BE.run_batch.  The rows are tuples of the values of the evidential variables and can
+    be an iterator, e.g. over a file, which is consumed in chunks of chunk_size rows.  For
+    example, map_evidence(algorithm, (letter, sat), rows, workers=8) distributes the rows
+    over eight processes.
+
+    The log-tables of the relevant factors are put into shared memory once, and each
+    worker process compiles its own elimination plans around them, so that neither the
+    model nor the factor functions are pickled.  Only the positions of the evidential
+    values are sent to the workers and only the distributions are sent back.  At most
+    two chunks per worker are in flight.  The elimination order of GBE is found by GO
+    with the cost criterion, while BE uses its set elimination order.  If workers is 1,
+    the chunks are computed in the current process.
+    """
+    if chunk_size < 1:
+        raise ValueError(f'the chunk size {chunk_size} must be positive')
+    if workers is not None and workers < 1:
+        raise ValueError(f'the number {workers} of workers must be positive')
+    # Check whether a query is specified
+    algorithm.check_non_empty_query()
+    evidence = algorithm._get_batch_evidence(evidence_variables)
+    if isinstance(algorithm, GBE):
+        algorithm._set_elimination_order(evidence, cost, False)
+    # Query, evidence, and elimination order variables must be disjoint and cover the relevant variables
+    algorithm.check_variable_partition(evidence, algorithm._get_relevant_variables(evidence))
+    structure, log_tables = _get_structure(algorithm, evidence)
+    chunks = _get_position_chunks(algorithm, evidence_variables, evidence, iter(rows), chunk_size)
+    if workers == 1:
+        return _map_chunks_in_process(structure, log_tables, chunks)
+    return _map_chunks_in_processes(structure, log_tables, chunks, workers if workers is not None else os.cpu_count())
+
+
+def _map_chunks_in_process(structure, log_tables, chunks):
+    mapper = _EvidenceMapper(structure, log_tables)
+    for chunk in chunks:
+        yield from mapper.run(chunk)
+
+
+def _map_chunks_in_processes(structure, log_tables, chunks, workers):
+    # The log-tables are copied once into shared memory and released after the last chunk
+    memory = shared_memory.SharedMemory(create=True, size=max(log_tables.nbytes, 1))
+    try:
+        np.ndarray(log_tables.shape, dtype=log_tables.dtype, buffer=memory.buf)[:] = log_tables
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_initialize_worker,
+            initargs=(structure, memory.name, log_tables.size)
+        ) as executor:
+            in_flight = collections.deque()
+            try:
+                for chunk in chunks:
+                    in_flight.append(executor.submit(_run_worker_chunk, chunk))
+                    if len(in_flight) >= 2 * workers:
+                        yield from in_flight.popleft().result()
+                while in_flight:
+                    yield from in_flight.popleft().result()
+            finally:
+                # A consumer stopping early cancels the chunks not started yet
+                for future in in_flight:
+                    future.cancel()
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def _get_position_chunks(algorithm, evidence_variables, evidence, rows, chunk_size):
+    # The positions of the values are given as the columns of the sorted evidential variables
+    while True:
+        chunk_rows = list(itertools.islice(rows, chunk_size))
+        if not chunk_rows:
+            return
+        evidence_indices = algorithm._get_batch_evidence_indices(evidence_variables, chunk_rows)
+        yield np.stack([evidence_indices[var] for var in evidence], axis=1) if evidence \
+            else np.empty((len(chunk_rows), 0), dtype=np.intp)
+
+
+def _get_structure(algorithm, evidence):
+    """
+    Returns the structure of the connected components of the relevant factors given by
+    integers, so that it can be sent to other processes, and the concatenated log-tables
+    of their factors
+    """
+    variables = algorithm.variables
+    variable_indices = {var: index for index, var in enumerate(variables)}
+    factors = []
+    components = []
+    flat_log_tables = []
+    offset = 0
+    for component_variables, component_factors in algorithm._get_relevant_components(evidence):
+        factor_indices = []
+        for factor in component_factors:
+            log_table = np.ascontiguousarray(algorithm._log_tables[factor], dtype=float)
+            factors.append((tuple(variable_indices[var] for var in factor.variables), offset, log_table.shape))
+            factor_indices.append(len(factors) - 1)
+            flat_log_tables.append(log_table.ravel())
+            offset += log_table.size
+        components.append((
+            tuple(factor_indices),
+            tuple(variable_indices[var] for var in algorithm.query if var in component_variables),
+            tuple(variable_indices[var] for var in algorithm.elimination_order if var in component_variables)
+        ))
+    structure = (
+        tuple(algorithm._domain_sizes[var] for var in variables),
+        tuple(factors),
+        tuple(components),
+        tuple(variable_indices[var] for var in algorithm.query),
+        tuple(variable_indices[var] for var in evidence)
+    )
+    log_tables = np.concatenate(flat_log_tables) if flat_log_tables else np.zeros(0)
+    return structure, log_tables
+
+
+def _initialize_worker(structure, memory_name, size):
+    global _worker_mapper
+    memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_mapper = _EvidenceMapper(structure, np.ndarray((size, ), dtype=float, buffer=memory.buf))
+    # The shared memory must stay attached as long as the mapper uses it
+    _worker_mapper.memory = memory
+
+
+def _run_worker_chunk(positions):
+    return _worker_mapper.run(positions)
+
+
+class _EvidenceMapper:
+    """
+    Computes the distributions for chunks of evidential value positions with the
+    elimination plans compiled from a structure given by integers, see _get_structure,
+    where the log-tables are read-only views of a flat buffer
+    """
+    def __init__(self, structure, log_tables):
+        domain_sizes, factors, components, query, evidence = structure
+        variables = tuple(Variable(domain=range(size), name=str(index)) for index, size in enumerate(domain_sizes))
+        self._domain_sizes = {var: size for var, size in zip(variables, domain_sizes)}
+        self._query = tuple(variables[index] for index in query)
+        self._evidence = tuple(variables[index] for index in evidence)
+        self._log_tables = {}
+        log_factors = []
+        for number, (variable_indices, offset, shape) in enumerate(factors):
+            # The log-factor is only a placeholder for its log-table
+            log_factor = Factor(
+                variables=tuple(variables[index] for index in variable_indices),
+                name=f'log_f_{number}',
+                variable_linking=False
+            )
+            log_table = log_tables[offset:offset + int(np.prod(shape, dtype=np.int64))].reshape(shape)
+            log_table.flags.writeable = False
+            self._log_tables[log_factor] = log_table
+            log_factors.append(log_factor)
+        self._plans = tuple(
+            EliminationPlan(
+                log_factors=tuple(log_factors[index] for index in factor_indices),
+                query=tuple(variables[index] for index in component_query),
+                evidence=self._evidence,
+                elimination_order=tuple(variables[index] for index in elimination_order),
+                domain_sizes=self._domain_sizes
+            ) for factor_indices, component_query, elimination_order in components
+        )
+        self.memory = None
+
+    def run(self, positions):
+        evidence_indices = {var: positions[:, column] for column, var in enumerate(self._evidence)}
+        # The log-table of the query variables is the sum of the independent component log-tables
+        return EliminationPlan.normalize(EliminationPlan.combine_log_tables(
+            self._plans,
+            [plan.run(self._log_tables, evidence_indices) for plan in self._plans],
+            self._query,
+            self._domain_sizes,
+            positions.shape[0]
+        ))
@@ -1,3 +1,7 @@
+import collections
+import sys
+
+
 class Message:
     def __init__(self, from_node, to_node, values):
         self._from_node = from_node
@@ -18,6 +22,15 @@ class Message:
     def to_node(self):
         return self._to_node
 
+    @property
+    def nbytes(self):
+        """
+        Returns the approximate size of the message values in bytes
+        """
+        return sys.getsizeof(self._values) + sum(
+            sys.getsizeof(value) + sys.getsizeof(log_value) for value, log_value in self._values.items()
+        )
+
     @property
     def values(self):
         return self._values
@@ -43,4 +56,89 @@ class Messages:
         return self._messages[(from_node, to_node)]
 
     def get_from_nodes_to_node(self, from_nodes, to_node):
-        return list(self._messages[(from_node, to_node)] for from_node in from_nodes)
\ No newline at end of file
+        return list(self._messages[(from_node, to_node)] for from_node in from_nodes)
+
+
+class MessageCache:
+    """
+    Caches messages under hashable keys, e.g. (from_node, to_node, evidence_tuples), and
+    optionally bounds the number of cached messages and their approximate size in bytes.
+    If a bound is exceeded, the least recently used messages are evicted.  The numbers of
+    cache hits, misses, and evictions are counted.
+    """
+    def __init__(self, max_messages=None, max_bytes=None):
+        if max_messages is not None and max_messages < 0:
+            raise ValueError(f'the maximum number {max_messages} of messages must be non-negative')
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError(f'the maximum size {max_bytes} in bytes must be non-negative')
+        self._max_messages = max_messages
+        self._max_bytes = max_bytes
+        self._messages = collections.OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __contains__(self, key):
+        return key in self._messages
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes
+
+    @property
+    def max_messages(self):
+        return self._max_messages
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def cache(self, key, message):
+        if key in self._messages:
+            self._nbytes -= self._messages.pop(key).nbytes
+        self._messages[key] = message
+        self._nbytes += message.nbytes
+        self._evict_if_necessary()
+
+    def clear(self):
+        self._messages.clear()
+        self._nbytes = 0
+
+    def get(self, key):
+        """
+        Returns the cached message or None if there is no message for the key
+        """
+        try:
+            message = self._messages[key]
+        except KeyError:
+            self._misses += 1
+            return None
+        self._hits += 1
+        # The message is now the most recently used one
+        self._messages.move_to_end(key)
+        return message
+
+    def _evict_if_necessary(self):
+        while self._messages and (
+            (self._max_messages is not None and len(self._messages) > self._max_messages)
+            or (self._max_bytes is not None and self._nbytes > self._max_bytes)
+        ):
+            _, message = self._messages.popitem(last=False)
+            self._nbytes -= message.nbytes
+            self._evictions += 1
@@ -1,8 +1,18 @@
 import copy
+import itertools
+import weakref
 
+import numpy as np
+
+from pyb4ml.inference.factored.relevance import get_normalized_variables, get_relevant_factors
 from pyb4ml.modeling.categorical.variable import Variable
 from pyb4ml.modeling.factor_graph.factor import Factor
 from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+from pyb4ml.modeling.factor_graph.table_factor import TableFactor
+
+# Read-only log-tables of the model factors over the complete variable domains,
+# computed once and shared by all the algorithms on the models
+_shared_log_tables = weakref.WeakKeyDictionary()
 
 
 class FactoredAlgorithm:
@@ -11,7 +21,18 @@ class FactoredAlgorithm:
     the classes of real factored algorithms, e.g. the Belief Propagation or Bucket
     Elimination algorithms.  The class contains and defines common attributes and 
     methods, respectively. 
+
+    The algorithm variables and factors (the inner model) correspond one-to-one to the
+    model variables and factors (the outer model), where the inner table factors share
+    the read-only tables of the outer ones.  An evidence is kept in the algorithm and
+    only the algorithms computing with the reduced variable domains, e.g. the Belief
+    Propagation algorithm, reduce the inner domains to the evidential values.  Otherwise,
+    the inner model is not changed after the initialization and is shared by the clones
+    of the algorithm, see FactoredAlgorithm.clone.
     """
+    # Whether an evidence reduces the domains of the inner variables
+    _reduces_domains = False
+
     def __init__(self, model: FactorGraph):
         # Inner model not specified
         self._inner_model = None
@@ -27,6 +48,33 @@ class FactoredAlgorithm:
         self._evidence_tuples = ()
         # Probability distribution P(query) or P(query|evidence) not specified
         self._distribution = None
+        # Variables over which each factor is normalized, computed if necessary
+        self._normalized_variables = {}
+
+    @staticmethod
+    def _get_distribution_function(variables, distribution):
+        """
+        Returns the distribution as a function of the variable values, where the
+        distribution is a dictionary of value tuples or an array with the axes of the
+        variables, the positions on the axes being the positions in their domains
+        """
+        # Positions of the values on the array axes
+        positions = tuple({value: index for index, value in enumerate(var.domain)} for var in variables) \
+            if isinstance(distribution, np.ndarray) else None
+
+        def distribution_function(*values):
+            if len(values) != len(variables):
+                raise ValueError(
+                    f'the number {len(values)} of given values does not match '
+                    f'the number {len(variables)} of variables'
+                )
+            for variable, value in zip(variables, values):
+                if value not in variable.domain:
+                    raise ValueError(f'value {value!r} not in domain {variable.domain} of {variable.name}')
+            if isinstance(distribution, np.ndarray):
+                return float(distribution[tuple(position[value] for position, value in zip(positions, values))])
+            return distribution[values]
+        return distribution_function
 
     @property
     def elimination_variables(self):
@@ -57,7 +105,8 @@ class FactoredAlgorithm:
 
     @property
     def non_evidential(self):
-        return tuple(var for var in self.variables if not var.is_evidential())
+        evidence = set(self._evidence)
+        return tuple(var for var in self.variables if var not in evidence)
 
     @property
     def pd(self):
@@ -76,17 +125,7 @@ class FactoredAlgorithm:
         probability distribution. 
         """
         if self._distribution is not None:
-            def distribution(*values):
-                if len(values) != len(self._query):
-                    raise ValueError(
-                        f'the number {len(values)} of given values does not match '
-                        f'the number {len(self._query)} of query variables'
-                    )
-                for variable, value in zip(self._query, values):
-                    if value not in variable.domain:
-                        raise ValueError(f'value {value!r} not in domain {variable.domain} of {variable.name}')
-                return self._distribution[values]
-            return distribution
+            return self._get_distribution_function(self._query, self._distribution)
         else:
             raise AttributeError('distribution not computed')
 
@@ -116,9 +155,20 @@ class FactoredAlgorithm:
                 raise ValueError(f'query variables {tuple(var.name for var in self._query)} and '
                                  f'evidential variables {tuple(var.name for var in self._evidence)} must be disjoint')
 
+    def clone(self):
+        """
+        Returns an algorithm of the same class for the same model without a query, an
+        evidence, and a distribution.  The clone shares the inner model, the log-tables,
+        and the caches with this algorithm and keeps only its mutable state separately,
+        so that cloning takes constant time in the model size.
+        """
+        algorithm = copy.copy(self)
+        algorithm._initialize_clone()
+        return algorithm
+
     def print_evidence(self):
         if self._evidence is not None:
-            print('Evidence: ' + ', '.join(f'{var.name} = {var.domain[0]!r}' for var in self._evidence))
+            print('Evidence: ' + ', '.join(f'{var.name} = {val!r}' for var, val in self._evidence_tuples))
         else:
             print('No evidence')
 
@@ -127,10 +177,10 @@ class FactoredAlgorithm:
         Prints the complete probability distribution of the query variables
         """
         if self._distribution is not None:
-            evidence_str = ' | ' + ', '.join(f'{var.name} = {var.domain[0]!r}' for var in self._evidence) \
+            evidence_str = ' | ' + ', '.join(f'{var.name} = {val!r}' for var, val in self._evidence_tuples) \
                 if self._evidence \
                 else ''
-            for values in Variable.evaluate_variables(self._query):
+            for values in itertools.product(*(var.domain for var in self._query)):
                 query_str = 'P(' + ', '.join(f'{var.name} = {val!r}' for var, val in zip(self._query, values))
                 value_str = str(self.pd(*values))
                 equal_str = ') = '
@@ -151,17 +201,15 @@ class FactoredAlgorithm:
         evidential values 'd0' and 'i1' to random variables Difficulty and Intelligence, 
         respectively.
 
-        In fact, the domain of a variable is reduced to one evidential value.
-        The variable is encapsulated in the algorithm (in the inner model) and the domain
-        of the corresponding model variable (in the outer model) is not changed.
+        The evidence is kept in the algorithm, and the domain of the corresponding model
+        variable (in the outer model) is not changed.  If the algorithm reduces the domains,
+        the domain of the variable encapsulated in the algorithm (in the inner model) is
+        reduced to one evidential value.
         """
         # Return the original domains of evidential variables and delete the evidence in factors
         self._delete_evidence()
         if evidence[0]:
             self._set_evidence(*evidence)
-        else:
-            self._evidence = ()
-        self._set_evidence_tuples()
     
     def set_query(self, *variables):
         """
@@ -176,18 +224,78 @@ class FactoredAlgorithm:
         else:
             self._query = ()
 
-    def _clear_evidence(self):
+    def _delete_evidence(self):
+        if self._reduces_domains:
+            for var in self._evidence:
+                var.set_domain(self._inner_to_outer_variables[var].domain)
+                for factor in var.factors:
+                    factor.delete_evidence(var)
         self._evidence = ()
-        for inner_factor in self._inner_model.factors:
-            inner_factor.clear_evidence()
+        self._evidence_tuples = ()
 
-    def _delete_evidence(self):
-        for var in self._evidence:
-            var.set_domain(self._inner_to_outer_variables[var].domain)
-            for factor in var.factors:
-                factor.delete_evidence(var)
-        del self._evidence
+    def _get_normalized_variables(self, factor):
+        """
+        Returns the variables over which the factor sums to one for all the values of the
+        other variables, see relevance.get_normalized_variables
+        """
+        try:
+            return self._normalized_variables[factor]
+        except KeyError:
+            pass
+        # The outer factor is neither logarithmized nor reduced by the evidence
+        outer_factor = self._inner_to_outer_factors[factor]
+        if isinstance(outer_factor, TableFactor):
+            table = np.exp(outer_factor.table) if outer_factor.logarithmic else outer_factor.table
+        else:
+            table = TableFactor.from_factor(outer_factor).table
+        self._normalized_variables[factor] = get_normalized_variables(factor.variables, table)
+        return self._normalized_variables[factor]
+
+    def _get_relevant_factors(self, query, evidence):
+        """
+        Returns the model factors relevant to the query given the evidence, where the
+        barren variables are removed, see relevance.get_relevant_factors
+        """
+        return get_relevant_factors(self.factors, query, evidence, self._get_normalized_variables)
+
+    def _get_shared_log_table(self, factor):
+        """
+        Returns a read-only view of the log-table of the model factor corresponding to the
+        factor, where the log-table is computed by the first algorithm on the model.  The
+        model tables must not be changed afterwards.
+        """
+        outer_factor = self._inner_to_outer_factors[factor]
+        try:
+            log_table = _shared_log_tables[outer_factor]
+        except KeyError:
+            if isinstance(factor, TableFactor) and outer_factor.logarithmic:
+                # A read-only view of the logarithmic model table leaves the model table writable
+                log_table = outer_factor.table.view()
+            elif isinstance(factor, TableFactor):
+                with np.errstate(divide='ignore'):
+                    log_table = np.log(outer_factor.table)
+            else:
+                # The function of the factor is already logarithmic
+                log_table = TableFactor.from_factor(factor).table
+            log_table.setflags(write=False)
+            # Another thread may have computed the same log-table in the meantime
+            log_table = _shared_log_tables.setdefault(outer_factor, log_table)
+        return log_table.view()
+
+    def _initialize_clone(self):
+        # Nothing of a query or an evidence is shared with the cloned algorithm
+        self._query = ()
         self._evidence = ()
+        self._evidence_tuples = ()
+        self._distribution = None
+
+    def _logarithm_factors(self):
+        for factor in self.factors:
+            # Logarithm the factor, where the inner table factors share the model log-tables
+            if isinstance(factor, TableFactor):
+                factor.logarithm(self._get_shared_log_table(factor))
+            else:
+                factor.logarithm()
 
     def _print_start(self):
         if self._print_info:
@@ -203,33 +311,23 @@ class FactoredAlgorithm:
         evidence_variables = tuple(var_val[0] for var_val in evidence_tuples)
         if len(evidence_variables) != len(set(evidence_variables)):
             raise ValueError(f'evidence must not contain duplicates')
+        inner_evidence_tuples = []
         for outer_var, val in evidence_tuples:
             try:
                 inner_var = self._outer_to_inner_variables[outer_var]
             except KeyError:
-                # Also clear the evidence in the factors
-                self._clear_evidence()
                 raise ValueError(f'no model variable corresponds to evidential variable {outer_var.name}')
-            try:
-                inner_var.check_value(val)
-            except ValueError as exception:
-                # Also clear the evidence in the factors
-                self._clear_evidence()
-                raise exception
-            # Set the new domain containing only one value
-            inner_var.set_domain({val})
-            # Add the evidence into its factors
-            for inner_factor in inner_var.factors:
-                inner_factor.add_evidence(inner_var)
-        self._evidence = tuple(
-            sorted(
-                (self._outer_to_inner_variables[outer_var] for outer_var in evidence_variables),
-                key=lambda x: x.name
-            )
-        )
-
-    def _set_evidence_tuples(self):
-        self._evidence_tuples = tuple((var, var.domain[0]) for var in self._evidence)
+            inner_var.check_value(val)
+            inner_evidence_tuples.append((inner_var, val))
+        self._evidence_tuples = tuple(sorted(inner_evidence_tuples, key=lambda x: x[0].name))
+        self._evidence = tuple(var for var, _ in self._evidence_tuples)
+        if self._reduces_domains:
+            for inner_var, val in self._evidence_tuples:
+                # Set the new domain containing only one value
+                inner_var.set_domain({val})
+                # Add the evidence into its factors
+                for inner_factor in inner_var.factors:
+                    inner_factor.add_evidence(inner_var)
 
     def _set_query(self, *query_variables):
         # Check whether the query has duplicates
@@ -250,26 +348,49 @@ class FactoredAlgorithm:
 
     def _set_model(self, model: FactorGraph):
         self._outer_model = model
-        # Create algorithm variables (inner variables)
+        # Create algorithm variables (inner variables), where the names and domains are immutable
         self._inner_to_outer_variables = {}
         self._outer_to_inner_variables = {}
         for outer_variable in self._outer_model.variables:
-            inner_variable = Variable(
-                domain=outer_variable.domain,
-                name=copy.deepcopy(outer_variable.name)
-            )
+            inner_variable = Variable(domain=outer_variable.domain, name=outer_variable.name)
             self._inner_to_outer_variables[inner_variable] = outer_variable
             self._outer_to_inner_variables[outer_variable] = inner_variable
-        # Create algorithm factors (inner factors)
+        # The domain sizes do not depend on the evidence
+        self._domain_sizes = {
+            inner_variable: len(outer_variable.domain)
+            for inner_variable, outer_variable in self._inner_to_outer_variables.items()
+        }
+        # Create algorithm factors (inner factors) sharing the tables and functions of the model factors
         self._inner_to_outer_factors = {}
         self._outer_to_inner_factors = {}
         for outer_factor in self._outer_model.factors:
-            inner_factor = Factor(
-                variables=tuple(self._outer_to_inner_variables[outer_var] for outer_var in outer_factor.variables),
-                function=copy.deepcopy(outer_factor.function),
-                name=copy.deepcopy(outer_factor.name)
-            )
+            inner_variables = tuple(self._outer_to_inner_variables[outer_var] for outer_var in outer_factor.variables)
+            if isinstance(outer_factor, TableFactor):
+                # A read-only view prevents the algorithm from changing the model table
+                table = outer_factor.table.view()
+                table.setflags(write=False)
+                inner_factor = TableFactor(
+                    variables=inner_variables,
+                    table=table,
+                    name=outer_factor.name,
+                    domains=outer_factor.domains,
+                    logarithmic=outer_factor.logarithmic
+                )
+            else:
+                inner_factor = Factor(
+                    variables=inner_variables,
+                    function=outer_factor.function,
+                    name=outer_factor.name
+                )
             self._inner_to_outer_factors[inner_factor] = outer_factor
             self._outer_to_inner_factors[outer_factor] = inner_factor
         # Create an algorithm model (an inner model)
         self._inner_model = FactorGraph(factors=self._inner_to_outer_factors.keys())
+
+    def _tabulate_log_factors(self):
+        # The log-tables over the complete variable domains are computed only once per model
+        self._log_tables = {
+            log_factor: log_factor.table if isinstance(log_factor, TableFactor)
+            else self._get_shared_log_table(log_factor)
+            for log_factor in self.factors
+        }
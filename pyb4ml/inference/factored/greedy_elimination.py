@@ -1,30 +1,174 @@
+import numpy as np
+
 from pyb4ml.inference import BE, GO
+from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.inference.factored.order_cache import OrderCache
+from pyb4ml.inference.factored.semiring import LOG_SUM, MAX_SUM
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
 from pyb4ml.modeling import FactorGraph
 
 
 class GBE(GO, BE):
     """
     Greedy Bucket Elimination (GBE)
+
+    If a memory budget is given and the order found with the cost criterion exceeds it,
+    the orders found with the other cost criteria are tried before MemoryError is raised.
+
+    The found orders are cached under a structural hash of the model, the query, the
+    evidential variables, and the cost criterion.  An order cache with an LRU bound or
+    persisted in a file, see OrderCache, can be shared by several GBE instances, e.g.
+    in different processes, so that they do not rerun GO.
+
+    The marginal MAP is computed with a constrained elimination order, where the summed
+    variables are eliminated before the maximized ones, see GBE.run_marginal_map.
     """
-    def __init__(self, model: FactorGraph):
+    # Cost criteria tried if an order exceeds the memory budget
+    _fallback_costs = ('weighted-min-fill', 'min-fill', 'min-weight', 'min-degree')
+
+    def __init__(self, model: FactorGraph, order_cache=None):
         GO.__init__(self, model)
-        # Logarithm all the model factors
-        BE._logarithm_factors(self)
-        self._order_cache = {}
+        BE._initialize_elimination(self)
+        self._order_cache = order_cache if order_cache is not None else OrderCache()
+        self._model_hash = OrderCache.get_model_hash(self.variables, self.factors, self._domain_sizes)
+
+    @property
+    def order_cache(self):
+        return self._order_cache
 
     def clear_order_cache(self):
-        del self._order_cache
-        self._order_cache = {}
+        self._order_cache.clear()
+
+    def estimate_cost(self, batch_size=1):
+        return BE.estimate_cost(self, batch_size)
+
+    def run(self, cost='weighted-min-fill', print_info=False, memory_budget=None):
+        FactoredAlgorithm.check_non_empty_query(self)
+        self._set_elimination_order(self._evidence, cost, print_info, 1, memory_budget)
+        BE.run(self, print_info, memory_budget)
+
+    def run_batch(self, evidence_variables, evidence_values, cost='weighted-min-fill', print_info=False,
+                  memory_budget=None):
+        """
+        Computes the distributions for a batch of evidences over the same evidential
+        variables, see BE.run_batch, where the elimination order is found by GO
+        """
+        FactoredAlgorithm.check_non_empty_query(self)
+        self._set_elimination_order(
+            BE._get_batch_evidence(self, evidence_variables),
+            cost,
+            print_info,
+            len(evidence_values),
+            memory_budget
+        )
+        return BE.run_batch(self, evidence_variables, evidence_values, print_info, memory_budget)
+
+    def run_marginal_map(self, map_variables, cost='weighted-min-fill', print_info=False):
+        """
+        Computes the marginal maximum a posteriori (MAP) assignment of the MAP variables
+        given the evidence, i.e. the assignment of the largest marginal probability
+        P(M_1 = m_1, ..., M_k = m_k | E_1 = e_1, ..., E_l = e_l), where all the other
+        variables are summed out, and returns it as a tuple (assignment, probability).  For
+        example, algorithm.run_marginal_map((difficulty, intelligence))[0][intelligence]
+        returns the value of random variable Intelligence in the MAP assignment.
+
+        GO finds an elimination order with the summed variables first and the MAP
+        variables last, so that the maximum never precedes a sum.  The summed buckets are
+        eliminated by the log-sum-exp, the MAP buckets by the maximum with back-pointers,
+        and the assignment is decoded from them without materializing the joint
+        distribution of the MAP variables.  The query is ignored and not changed.
+        """
+        if not map_variables:
+            raise ValueError('MAP variables must not be empty')
+        if len(map_variables) != len(set(map_variables)):
+            raise ValueError('MAP variables must not contain duplicates')
+        inner_map_variables = []
+        for outer_var in map_variables:
+            try:
+                inner_var = self._outer_to_inner_variables[outer_var]
+            except KeyError:
+                raise ValueError(f'no model variable corresponds to MAP variable {outer_var.name}')
+            if inner_var in self._evidence:
+                raise ValueError(f'MAP variable {outer_var.name} must not be evidential')
+            inner_map_variables.append(inner_var)
+        query = self._query
+        # All the variables are eliminated, so that the query is empty during the run
+        self._query = ()
+        try:
+            # The constrained orders are not cached, since the order cache keys have no MAP variables
+            GBE._name = GO._name
+            GO._run(self, cost, print_info, self._evidence, last_variables=inner_map_variables)
+            GBE._name = BE._name
+            evidence_indices = self._get_evidence_indices()
+            # The log-partition function given the evidence normalizes the probability
+            log_partition = float(log_sum_exp(
+                self._run_plan(self._evidence, evidence_indices, print_info, 1, None).ravel(), axis=0
+            ))
+            back_pointers = {}
+            log_value = float(self._run_plan(
+                self._evidence, evidence_indices, False, 1, None, LOG_SUM, back_pointers,
+                {var: MAX_SUM for var in inner_map_variables}
+            ).ravel()[0])
+            positions = self._get_plan(self._evidence).decode(back_pointers, {}, 1)
+        finally:
+            GBE._name = BE._name
+            self._query = query
+        FactoredAlgorithm._print_stop(self)
+        assignment = {
+            self._inner_to_outer_variables[var]: self._inner_to_outer_variables[var].domain[int(positions[var][0])]
+            for var in inner_map_variables
+        }
+        return assignment, float(np.exp(log_value - log_partition))
+
+    def run_mpe(self, cost='weighted-min-fill', k=1, print_info=False):
+        """
+        Computes the k most probable explanations, see BE.run_mpe, where the elimination
+        order is found by GO
+        """
+        self._set_elimination_order(self._evidence, cost, print_info)
+        return BE.run_mpe(self, k, print_info)
+
+    def run_semiring(self, semiring, cost='weighted-min-fill', print_info=False):
+        """
+        Eliminates the variables in a semiring, see BE.run_semiring, where the elimination
+        order is found by GO
+        """
+        self._set_elimination_order(self._evidence, cost, print_info)
+        return BE.run_semiring(self, semiring, print_info)
+
+    def _initialize_clone(self):
+        # The order cache is shared with the clones
+        GO._initialize_clone(self)
+        BE._initialize_clone(self)
+
+    def _set_elimination_order(self, evidence, cost, print_info, batch_size=1, memory_budget=None):
+        costs = (cost, ) + tuple(fallback_cost for fallback_cost in GBE._fallback_costs if fallback_cost != cost) \
+            if memory_budget is not None else (cost, )
+        min_peak_memory = None
+        min_order = None
+        for order_cost in costs:
+            self._set_cost_elimination_order(evidence, order_cost, print_info)
+            if memory_budget is None:
+                return
+            peak_memory = self._estimate_peak_memory(evidence, batch_size)
+            if peak_memory <= memory_budget:
+                return
+            if min_peak_memory is None or peak_memory < min_peak_memory:
+                min_peak_memory = peak_memory
+                min_order = self._elimination_order
+        # No order fits into the memory budget, so BE raises MemoryError for the smallest one
+        self._elimination_order = min_order
 
-    def run(self, cost='weighted-min-fill', print_info=False):
-        if self._evidence in self._order_cache:
-            self._elimination_order = self._order_cache[self._evidence]
+    def _set_cost_elimination_order(self, evidence, cost, print_info):
+        key = (self._model_hash, tuple(var.name for var in self._query), tuple(var.name for var in evidence), cost)
+        order_names = self._order_cache.get(key)
+        if order_names is not None:
+            self._elimination_order = [self._inner_model.get_variable(name) for name in order_names]
         else:
             GBE._name = GO._name
-            GO.run(self, cost, print_info)
-            self._order_cache[self._evidence] = self._elimination_order
+            GO._run(self, cost, print_info, evidence)
+            self._order_cache.cache(key, (var.name for var in self._elimination_order))
         GBE._name = BE._name
-        BE.run(self, print_info)
 
 
 if __name__ == '__main__':
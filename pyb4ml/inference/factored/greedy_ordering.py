@@ -12,7 +12,36 @@ Sie den vom Autor auferlegten Bedingungen zu.
 
 © 2021 Alexander Vasiliev
 """
+import concurrent.futures
+import heapq
+import random
+
+from pyb4ml.inference.factored.elimination_plan import EliminationPlan
 from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.modeling.factor_graph.factor import Factor
+from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+
+
+def _get_unit_value(*values):
+    return 1
+
+
+def _run_random_ordering(structure, cost, seed):
+    """
+    Runs GO with random tie-breaking on a graph given by integers, so that it can be
+    run in another process.  Returns the order as variable indices and the predicted
+    total table size.
+    """
+    domain_sizes, edges, query = structure
+    variables = tuple(Variable(domain=set(range(size)), name=str(index)) for index, size in enumerate(domain_sizes))
+    factors = [Factor(variables=(var, ), function=_get_unit_value) for var in variables]
+    factors.extend(Factor(variables=(variables[i], variables[j]), function=_get_unit_value) for i, j in edges)
+    algorithm = GO(FactorGraph(factors=factors))
+    if query:
+        algorithm.set_query(*(variables[index] for index in query))
+    algorithm.run(cost=cost, seed=seed)
+    return tuple(int(var.name) for var in algorithm.order), algorithm.total_table_size
 
 
 class GO(FactoredAlgorithm):
@@ -20,7 +49,8 @@ class GO(FactoredAlgorithm):
     This implementation of the Greedy Ordering (GO) algorithm finds a near-optimal
     variable elimination order that can be used later, for example, in the BE
     algorithm.  The GO algorithm uses greedy search, here, with the cost criterion
-    of "min-fill" or "weighted-min-fill".  Eliminating variables leads to the
+    of "min-fill", "weighted-min-fill", "min-degree", "min-weight", or "min-width".
+    Eliminating variables leads to the
     appearance of new factors.  That can be graphically represented as edges already
     existing or needed to be added between all neighbors of an eliminated node in
     a (moralized in the case of directed edges) graph.  The best order implies
@@ -32,7 +62,18 @@ class GO(FactoredAlgorithm):
     If the weights of additional edges, i.e. the products of the cardinality 
     of edge variables, are taken into account, such a cost criterion is called 
     "weighted-min-fill".  Those two heuristic approaches often work surprisingly well
-    in practice.  See, for example, [KF09] for more details.
+    in practice.  See, for example, [KF09] for more details.  The cost criterion of
+    "min-degree" is the number of neighbors of a variable and that of "min-weight" is
+    the product of the cardinalities of its neighbors.  The "min-width" order [D03]
+    greedily removes a variable with the fewest neighbors without adding any edges.
+
+    The neighbors of the variables are kept in sets and the costs of the not ordered
+    variables in a heap.  After the elimination of a variable, only the costs of its
+    neighbors and of the common neighbors of the added edges are recomputed.  Ties are
+    broken in favor of the variable coming first in the model or, if a seed is given,
+    at random.  Several random orders can be computed in parallel processes, where the
+    order with the smallest predicted total table size, i.e. the sum of the table sizes
+    of all the buckets, is kept.
 
     Here, the query and evidence are optional.  The GO algorithm returns an elimination
     order as a tuple of variables, in which the first variable will be eliminated
@@ -46,109 +87,243 @@ class GO(FactoredAlgorithm):
 
     References:
 
+    [D03] Rina Dechter, "Constraint Processing", Morgan Kaufmann, 2003
+
     [KF09] Daphne Koller and Nir Friedman, "Probabilistic Graphical Models: Principles
     and Techniques", The MIT Press, 2009
     """
     _name = 'Greedy Ordering'
+    # Names of the cost methods of the cost criteria, which are bound at each run
+    # so that the clones of the algorithm use their own methods
+    _cost_method_names = {
+        'min-degree': '_get_degree_cost',
+        'min-fill': '_get_fill_cost',
+        'min-weight': '_get_weight_cost',
+        'min-width': '_get_degree_cost',
+        'weighted-min-fill': '_get_weighted_fill_cost'
+    }
 
     def __init__(self, model):
         FactoredAlgorithm.__init__(self, model)
         self._order_number = None
         self._elimination_order = []
-        self._not_ordered_variables = []
         self._cost_function = None
         self._cost = None
         self._print_info = None
-        self._cost_functions = {
-            'min-fill': self._get_fill_cost,
-            'weighted-min-fill': self._get_weighted_fill_cost
-        }
-
-    @staticmethod
-    def _link_neighbors(variable):
-        var_neighbors = variable.neighbors
-        for i in range(len(var_neighbors)):
-            var_neighbor = var_neighbors[i]
-            var_neighbor.neighbors.extend(var for var in var_neighbors if var is not var_neighbor)
-            var_neighbor.neighbors = list(set(var_neighbor.neighbors))
+        # Neighbors of the variables in the (moralized) graph
+        self._neighbors = {}
+        # Current costs of the not ordered variables, their heap, and the tie-breaking positions
+        self._costs = {}
+        self._cost_heap = []
+        self._positions = {}
+        # Whether edges are added between the neighbors of an eliminated variable
+        self._fill = True
+        # Sum of the table sizes of all the buckets
+        self._total_table_size = None
 
     @property
     def order(self):
         return tuple(self._inner_to_outer_variables[var] for var in self._elimination_order)
 
+    @property
+    def total_table_size(self):
+        """
+        Returns the predicted sum of the table sizes of all the buckets when the variables
+        are eliminated in the order
+        """
+        return self._total_table_size
+
+    def estimate_cost(self, batch_size=1):
+        """
+        Returns the estimated induced width, largest bucket table size, number of
+        multiply-adds, and peak memory in bytes of the BE algorithm with the found order
+        as a CostEstimate, see BE.estimate_cost
+        """
+        plan = EliminationPlan(
+            log_factors=self.factors,
+            query=self._query,
+            evidence=self._evidence,
+            elimination_order=self._elimination_order,
+            domain_sizes=self._domain_sizes
+        )
+        return plan.estimate_cost(batch_size)
+
     def print_order(self):
         self.print_query()
         self.print_evidence()
         print('Elimination order: ' + ', '.join(variable.name for variable in self._elimination_order))
 
-    def run(self, cost='weighted-min-fill', print_info=False):
+    def run(self, cost='weighted-min-fill', print_info=False, seed=None):
+        """
+        Finds an elimination order.  If a seed is given, the ties are broken at random.
+        """
+        self._run(cost, print_info, self._evidence, seed)
+
+    def run_for(self, evidence_variables, cost='weighted-min-fill', print_info=False, seed=None):
+        """
+        Finds an elimination order for the given evidential variables instead of the set
+        evidence, where their values are not needed, e.g. for a batch of evidences
+        """
+        evidence = []
+        for outer_var in evidence_variables:
+            try:
+                evidence.append(self._outer_to_inner_variables[outer_var])
+            except KeyError:
+                raise ValueError(f'no model variable corresponds to evidential variable {outer_var.name}')
+        self._run(cost, print_info, tuple(evidence), seed)
+
+    def run_restarts(self, restarts, cost='weighted-min-fill', seed=None, max_workers=None):
+        """
+        Finds the elimination orders with the ties broken at random in a process pool
+        and keeps the order with the smallest predicted total table size.  The order
+        with the ties broken deterministically is also a candidate.  If max_workers is 1,
+        the random orders are found in the current process.
+        """
+        self._run(cost, False, self._evidence)
+        random_generator = random.Random(seed)
+        seeds = [random_generator.randrange(2 ** 32) for _ in range(restarts)]
+        structure = self._get_structure()
+        if max_workers == 1:
+            results = [_run_random_ordering(structure, cost, restart_seed) for restart_seed in seeds]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_run_random_ordering, [structure] * restarts, [cost] * restarts, seeds))
+        variables = tuple(var for var in self.variables if var in self._neighbors)
+        for order, total_table_size in results:
+            if total_table_size < self._total_table_size:
+                self._elimination_order = [variables[index] for index in order]
+                self._total_table_size = total_table_size
+
+    def _run(self, cost, print_info, evidence, seed=None, last_variables=()):
         self._print_info = print_info
         self._order_number = 0
         self._cost = cost
-        self._cost_function = self._cost_functions[self._cost]
+        try:
+            self._cost_function = getattr(self, GO._cost_method_names[self._cost])
+        except KeyError:
+            raise ValueError(f'cost {cost!r} not in {tuple(GO._cost_method_names)}')
+        self._fill = cost != 'min-width'
         self._elimination_order = []
-        self._not_ordered_variables = list(variable for variable in self.elimination_variables)
-        self._set_neighbors()
+        not_ordered_variables = tuple(
+            variable for variable in self.variables
+            if variable not in self._query and variable not in evidence and variable not in last_variables
+        )
+        self._set_neighbors(evidence)
         self._print_start()
-        while len(self._not_ordered_variables) > 0:
-            self._print_candidates()
-            elm_var = self._eliminate_min_cost_variable()
-            self._elimination_order.append(elm_var)
-            GO._link_neighbors(elm_var)
+        self._print_candidates()
+        # The costs are kept in a heap, where ties are broken by the variable positions
+        self._positions = {variable: position for position, variable in enumerate(self.variables)}
+        if seed is not None:
+            ranks = list(range(len(self._positions)))
+            random.Random(seed).shuffle(ranks)
+            self._positions = {variable: ranks[position] for variable, position in self._positions.items()}
+        self._costs = {}
+        self._cost_heap = []
+        # The last variables are only ordered after all the other ones
+        for stage_variables in (not_ordered_variables, tuple(last_variables)):
+            self._update_costs(stage_variables)
+            while self._cost_heap:
+                cost_val, _, elm_var = heapq.heappop(self._cost_heap)
+                # Skip the outdated costs
+                if self._costs.get(elm_var) != cost_val:
+                    continue
+                del self._costs[elm_var]
+                self._eliminate_variable(elm_var)
+                self._elimination_order.append(elm_var)
+                if self._costs:
+                    self._print_candidates()
+        self._set_total_table_size(evidence)
         self._print_stop()
 
-    def _eliminate_min_cost_variable(self):
-        min_variable = self._not_ordered_variables[0]
-        min_cost_val = self._cost_function(min_variable)
-        self._print_total_cost(min_cost_val, min_variable)
-        min_index = -1
-        for index, variable in enumerate(self._not_ordered_variables[1:len(self._not_ordered_variables)]):
-            cost_val = self._cost_function(variable)
-            self._print_total_cost(cost_val, variable)
-            if cost_val < min_cost_val:
-                min_cost_val = cost_val
-                min_variable = variable
-                min_index = index
-        self._print_before_elimination(min_variable)
-        del self._not_ordered_variables[min_index + 1]
-        for neighbor in min_variable.neighbors:
-            neighbor.neighbors.remove(min_variable)
-        self._print_after_elimination(min_variable)
-        return min_variable
+    def _eliminate_variable(self, variable):
+        self._print_before_elimination(variable)
+        var_neighbors = self._neighbors.pop(variable)
+        for neighbor in var_neighbors:
+            self._neighbors[neighbor].discard(variable)
+        # Add the fill edges between the neighbors
+        updated_variables = set(var_neighbors)
+        sorted_neighbors = sorted(var_neighbors, key=lambda var: self._positions[var])
+        for i1 in range(len(sorted_neighbors) - 1 if self._fill else 0):
+            neighbor1 = sorted_neighbors[i1]
+            for i2 in range(i1 + 1, len(sorted_neighbors)):
+                neighbor2 = sorted_neighbors[i2]
+                if neighbor2 not in self._neighbors[neighbor1]:
+                    self._neighbors[neighbor1].add(neighbor2)
+                    self._neighbors[neighbor2].add(neighbor1)
+                    # The fill costs of the common neighbors of the fill edge change
+                    updated_variables.update(self._neighbors[neighbor1] & self._neighbors[neighbor2])
+        self._print_after_elimination(variable, sorted_neighbors)
+        self._update_costs(var for var in updated_variables if var in self._costs)
+
+    def _get_degree_cost(self, variable):
+        return len(self._neighbors[variable])
 
     def _get_fill_cost(self, variable):
         cost_sum = 0
-        var_neighbors = variable.neighbors
+        var_neighbors = sorted(self._neighbors[variable], key=lambda var: self._positions[var])
         length = len(var_neighbors)
         for i1 in range(length - 1):
+            neighbor1_neighbors = self._neighbors[var_neighbors[i1]]
             for i2 in range(i1 + 1, length):
-                neighbor1 = var_neighbors[i1]
                 neighbor2 = var_neighbors[i2]
-                if neighbor1 not in neighbor2.neighbors:
+                if neighbor2 not in neighbor1_neighbors:
                     cost_sum += 1
-                    self._print_fill_cost(neighbor1, neighbor2, 1)
+                    self._print_fill_cost(var_neighbors[i1], neighbor2, 1)
         return cost_sum
 
     def _get_weighted_fill_cost(self, variable):
         cost_sum = 0
-        var_neighbors = variable.neighbors
+        var_neighbors = sorted(self._neighbors[variable], key=lambda var: self._positions[var])
         length = len(var_neighbors)
         for i1 in range(length - 1):
+            neighbor1 = var_neighbors[i1]
+            neighbor1_neighbors = self._neighbors[neighbor1]
             for i2 in range(i1 + 1, length):
-                neighbor1 = var_neighbors[i1]
                 neighbor2 = var_neighbors[i2]
-                if neighbor1 not in neighbor2.neighbors:
-                    cost = len(neighbor1.domain) * len(neighbor2.domain)
+                if neighbor2 not in neighbor1_neighbors:
+                    cost = self._domain_sizes[neighbor1] * self._domain_sizes[neighbor2]
                     cost_sum += cost
                     self._print_fill_cost(neighbor1, neighbor2, cost)
         return cost_sum
 
-    def _print_after_elimination(self, variable):
+    def _get_structure(self):
+        """
+        Returns the domain sizes, edges, and query of the graph with the variables
+        replaced by their indices
+        """
+        variables = tuple(var for var in self.variables if var in self._neighbors)
+        indices = {var: index for index, var in enumerate(variables)}
+        domain_sizes = tuple(self._domain_sizes[var] for var in variables)
+        edges = tuple(
+            (indices[var], indices[neighbor])
+            for var in variables for neighbor in self._neighbors[var] if indices[var] < indices[neighbor]
+        )
+        query = tuple(indices[var] for var in self._query)
+        return domain_sizes, edges, query
+
+    def _get_weight_cost(self, variable):
+        cost_product = 1
+        for neighbor in self._neighbors[variable]:
+            cost_product *= self._domain_sizes[neighbor]
+        return cost_product
+
+    def _initialize_clone(self):
+        FactoredAlgorithm._initialize_clone(self)
+        # The ordering state is rebuilt by each run
+        self._elimination_order = []
+        self._cost_function = None
+        self._neighbors = {}
+        self._costs = {}
+        self._cost_heap = []
+        self._positions = {}
+        self._total_table_size = None
+
+    def _print_after_elimination(self, variable, var_neighbors):
         if self._print_info:
             print('\nAfter the elimination of the variable:')
-            for neighbor in variable.neighbors:
+            for neighbor in var_neighbors:
                 print('-- ' + variable.name + "'s neighbor: " + neighbor.name)
-                for var in neighbor.neighbors:
+                for var in self._neighbors[neighbor]:
                     print('---- ' + neighbor.name + "'s neighbor: " + var.name)
 
     def _print_before_elimination(self, variable):
@@ -156,9 +331,9 @@ class GO(FactoredAlgorithm):
             print(str(self._order_number) + ': ' + variable.name)
             self._order_number += 1
             print('\nBefore the elimination of the variable:')
-            for neighbor in variable.neighbors:
+            for neighbor in self._neighbors[variable]:
                 print('-- ' + variable.name + "'s neighbor: " + neighbor.name)
-                for var in neighbor.neighbors:
+                for var in self._neighbors[neighbor]:
                     print('---- ' + neighbor.name + "'s neighbor: " + var.name)
 
     def _print_candidates(self):
@@ -173,12 +348,37 @@ class GO(FactoredAlgorithm):
         if self._print_info:
             print(f'total_cost({variable.name}) = {cost}\n')
 
-    def _set_neighbors(self):
-        for variable in self.non_evidential:
-            variable.neighbors = list(
-                set(var
-                    for factor in variable.factors
-                    for var in factor.variables
-                    if var is not variable and not var.is_evidential()
-                    )
+    def _set_neighbors(self, evidence):
+        self._neighbors = {
+            variable: set(
+                var
+                for factor in variable.factors
+                for var in factor.variables
+                if var is not variable and var not in evidence
             )
+            for variable in self.variables if variable not in evidence
+        }
+
+    def _set_total_table_size(self, evidence):
+        # Eliminate the variables in the order with all the edges to be added
+        self._set_neighbors(evidence)
+        self._total_table_size = 0
+        for variable in self._elimination_order:
+            var_neighbors = self._neighbors[variable]
+            table_size = self._domain_sizes[variable]
+            for neighbor in var_neighbors:
+                table_size *= self._domain_sizes[neighbor]
+                self._neighbors[neighbor].discard(variable)
+                self._neighbors[neighbor].update(var for var in var_neighbors if var is not neighbor)
+            self._total_table_size += table_size
+        self._set_neighbors(evidence)
+
+    def _update_costs(self, variables):
+        for variable in variables:
+            cost_val = self._cost_function(variable)
+            self._print_total_cost(cost_val, variable)
+            # The heap already contains the unchanged cost
+            if self._costs.get(variable) == cost_val:
+                continue
+            self._costs[variable] = cost_val
+            heapq.heappush(self._cost_heap, (cost_val, self._positions[variable], variable))
@@ -0,0 +1,337 @@
+"""
+The module contains the class of the Junction Tree algorithm.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import numpy as np
+
+from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.inference.factored.greedy_ordering import GO
+from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
+
+
+class JT(FactoredAlgorithm):
+    """
+    This implementation of the Junction Tree (JT) algorithm works on factor graphs, also
+    loopy ones, for random variables with categorical probability distributions.  The
+    variables are eliminated in an order found by the Greedy Ordering (GO) algorithm, and
+    the variable with its neighbors at the time of its elimination builds a clique.  The
+    cliques that are subsets of neighboring cliques are merged, and each clique is linked
+    to the clique of the variable eliminated next among its other variables, so that the
+    cliques form a tree with the running intersection property.  Each factor is assigned
+    to a clique containing its variables.  The clique tree is calibrated by propagating
+    the messages between the cliques with one collect pass to the root cliques and one
+    distribute pass back.  Then the belief of each clique is proportional to the joint
+    distribution of its variables, and any query whose variables are in one clique is
+    answered from a calibrated belief without new message passing.  See, for example,
+    [KF09] for more details.
+
+    The clique tree does not depend on the evidence.  An evidence is entered as a
+    logarithmic indicator of the evidential value in a clique containing the evidential
+    variable.  If the evidence changes, only the messages sent from the subtrees containing
+    the cliques with changed evidence are recomputed.  The implementation uses the
+    logarithms of the factors and messages for computational stability.
+
+    Computes a marginal (joint if necessary) probability distribution P(Q_1, ..., Q_s)
+    or a conditional (joint if necessary) probability distribution
+    P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k), where the query variables Q_1, ..., Q_s
+    belong to one clique.
+
+    Restrictions:  Only works with random variables with categorical value domains.
+    The factors must be strictly positive because of the use of logarithms.  The query
+    variables must belong to one clique.
+
+    Recommended:  Use the algorithm for computing the distributions of many variables
+    of a loopy factor graph given the same evidence.
+
+    References:
+
+    [KF09] Daphne Koller and Nir Friedman, "Probabilistic Graphical Models: Principles
+    and Techniques", The MIT Press, 2009
+    """
+    _name = 'Junction Tree'
+
+    def __init__(self, model: FactorGraph, cost='weighted-min-fill'):
+        FactoredAlgorithm.__init__(self, model)
+        self._print_info = False
+        # Logarithm all the model factors and tabulate them
+        self._logarithm_factors()
+        self._tabulate_log_factors()
+        # Variables of the cliques sorted by name
+        self._cliques = []
+        # Neighboring cliques in the clique tree
+        self._clique_neighbors = []
+        # Parent cliques in the clique tree and the cliques in the collect order
+        self._clique_parents = []
+        self._collect_order = []
+        # Cliques containing the variables
+        self._variable_cliques = {}
+        # Logarithmic clique potentials without and with the evidence
+        self._base_potentials = []
+        self._potentials = []
+        # Logarithmic messages between the cliques
+        self._messages = {}
+        # Evidence of the calibrated clique tree
+        self._calibrated_evidence = None
+        # Number of the messages computed in the last calibration
+        self._computed_messages_number = 0
+        self._set_clique_tree(cost)
+        self._set_base_potentials()
+
+    @property
+    def cliques(self):
+        return tuple(
+            tuple(self._inner_to_outer_variables[var] for var in clique) for clique in self._cliques
+        )
+
+    @property
+    def computed_messages_number(self):
+        return self._computed_messages_number
+
+    def calibrate(self, print_info=False):
+        """
+        Calibrates the clique tree given the evidence.  Only the messages depending on
+        the changed evidence are recomputed.
+        """
+        self._print_info = print_info
+        evidence = dict(self._evidence_tuples)
+        if self._calibrated_evidence is None:
+            changed_cliques = set(range(len(self._cliques)))
+        else:
+            changed_variables = set(
+                var for var in set(evidence).union(self._calibrated_evidence)
+                if evidence.get(var) != self._calibrated_evidence.get(var)
+            )
+            changed_cliques = set(self._variable_cliques[var] for var in changed_variables)
+        self._set_potentials(evidence, changed_cliques)
+        self._computed_messages_number = 0
+        changed_messages = set()
+        # Collect pass
+        for clique in self._collect_order:
+            parent = self._clique_parents[clique]
+            if parent is not None:
+                self._compute_message_if_necessary(clique, parent, changed_cliques, changed_messages)
+        # Distribute pass
+        for clique in reversed(self._collect_order):
+            parent = self._clique_parents[clique]
+            if parent is not None:
+                self._compute_message_if_necessary(parent, clique, changed_cliques, changed_messages)
+        self._calibrated_evidence = evidence
+
+    def print_cliques(self):
+        for clique, neighbors in zip(self._cliques, self._clique_neighbors):
+            print('Clique: ' + ', '.join(var.name for var in clique))
+            for neighbor in neighbors:
+                print('-- neighbor: ' + ', '.join(var.name for var in self._cliques[neighbor]))
+
+    def run(self, print_info=False):
+        # Check whether a query is specified
+        FactoredAlgorithm.check_non_empty_query(self)
+        # Check whether the query and evidence variables are disjoint
+        FactoredAlgorithm.check_query_and_evidence_intersection(self)
+        # Clear the distribution
+        self._distribution = None
+        self._print_info = print_info
+        # Print info if necessary
+        FactoredAlgorithm._print_start(self)
+        # Find the smallest clique containing the query
+        query_clique = self._get_query_clique()
+        # Calibrate the clique tree if necessary
+        if self._calibrated_evidence != dict(self._evidence_tuples):
+            self.calibrate(print_info)
+        self._compute_distribution(query_clique)
+        # Print info if necessary
+        FactoredAlgorithm._print_stop(self)
+
+    def _compute_distribution(self, query_clique):
+        # The belief is proportional to the joint distribution of the clique variables
+        belief = self._get_belief(query_clique)
+        clique_variables = self._cliques[query_clique]
+        # The query and clique variables are sorted by name
+        log_table = log_sum_exp(
+            belief,
+            axis=tuple(axis for axis, var in enumerate(clique_variables) if var not in self._query)
+        ) if len(self._query) < len(clique_variables) else belief
+        # The distribution is an array with the axes of the query variables
+        values = np.exp(log_table - np.max(log_table))
+        values /= np.sum(values)
+        self._distribution = values
+
+    def _compute_message_if_necessary(self, from_clique, to_clique, changed_cliques, changed_messages):
+        # The message must be recomputed if its sending subtree has changed
+        if (from_clique, to_clique) in self._messages \
+                and from_clique not in changed_cliques \
+                and not any(
+                    (neighbor, from_clique) in changed_messages
+                    for neighbor in self._clique_neighbors[from_clique] if neighbor != to_clique
+                ):
+            return
+        log_table = self._get_belief(from_clique, without_clique=to_clique)
+        from_variables = self._cliques[from_clique]
+        to_variables = self._cliques[to_clique]
+        summed_axes = tuple(axis for axis, var in enumerate(from_variables) if var not in to_variables)
+        # The separator variables are in the name order of both cliques
+        self._messages[(from_clique, to_clique)] = log_sum_exp(log_table, axis=summed_axes) \
+            if summed_axes else log_table
+        changed_messages.add((from_clique, to_clique))
+        self._computed_messages_number += 1
+        self._print_message(from_clique, to_clique)
+
+    def _get_aligned_table(self, log_table, variables, clique):
+        # The variables are a subset of the clique variables, both sorted by name
+        return log_table.reshape(
+            tuple(self._domain_sizes[var] if var in variables else 1 for var in self._cliques[clique])
+        )
+
+    def _get_belief(self, clique, without_clique=None):
+        belief = self._potentials[clique]
+        for neighbor in self._clique_neighbors[clique]:
+            if neighbor != without_clique:
+                belief = belief + self._get_aligned_table(
+                    self._messages[(neighbor, clique)],
+                    self._get_separator(neighbor, clique),
+                    clique
+                )
+        return belief
+
+    def _get_query_clique(self):
+        query_set = set(self._query)
+        query_cliques = [clique for clique, variables in enumerate(self._cliques) if query_set.issubset(variables)]
+        if not query_cliques:
+            raise ValueError(f'query variables {tuple(var.name for var in self._query)} do not belong to one clique')
+        return min(query_cliques, key=lambda clique: self._potentials[clique].size)
+
+    def _get_separator(self, clique1, clique2):
+        return tuple(var for var in self._cliques[clique1] if var in self._cliques[clique2])
+
+    def _initialize_clone(self):
+        FactoredAlgorithm._initialize_clone(self)
+        # The clique tree and the base potentials are shared with the clones, but not the calibration
+        self._potentials = list(self._base_potentials)
+        self._messages = {}
+        self._calibrated_evidence = None
+        self._computed_messages_number = 0
+
+    def _print_message(self, from_clique, to_clique):
+        if self._print_info:
+            print('Message: ' + ', '.join(var.name for var in self._cliques[from_clique])
+                  + ' -> ' + ', '.join(var.name for var in self._cliques[to_clique]))
+
+    def _set_base_potentials(self):
+        self._base_potentials = [
+            np.zeros(tuple(self._domain_sizes[var] for var in clique)) for clique in self._cliques
+        ]
+        # Cliques containing each variable
+        clique_sets = [frozenset(variables) for variables in self._cliques]
+        containing_cliques = {}
+        for clique, variables in enumerate(self._cliques):
+            for var in variables:
+                containing_cliques.setdefault(var, []).append(clique)
+        for factor in self.factors:
+            # Assign the factor to the smallest clique containing its variables,
+            # where only the cliques containing its rarest variable are candidates
+            rarest_var = min(factor.variables, key=lambda var: len(containing_cliques[var]))
+            clique = min(
+                (c for c in containing_cliques[rarest_var] if clique_sets[c].issuperset(factor.variables)),
+                key=lambda c: len(self._cliques[c])
+            )
+            clique_variables = self._cliques[clique]
+            axes = tuple(factor.variables.index(var) for var in clique_variables if var in factor.variables)
+            self._base_potentials[clique] = self._base_potentials[clique] + np.transpose(
+                self._log_tables[factor], axes
+            ).reshape(tuple(self._domain_sizes[var] if var in factor.variables else 1 for var in clique_variables))
+        self._potentials = list(self._base_potentials)
+
+    def _set_clique_tree(self, cost):
+        # Find an elimination order of all the variables
+        algorithm = GO(self._outer_model)
+        algorithm.run(cost=cost)
+        order = tuple(self._outer_to_inner_variables[var] for var in algorithm.order)
+        # Eliminate the variables in the moralized graph
+        neighbors = {
+            var: set(v for factor in var.factors for v in factor.variables if v is not var) for var in order
+        }
+        positions = {var: position for position, var in enumerate(order)}
+        cliques = {}
+        parents = {}
+        for var in order:
+            cliques[var] = frozenset(neighbors[var]) | {var}
+            # The parent clique belongs to the next eliminated variable of the clique
+            parents[var] = min(neighbors[var], key=lambda v: positions[v]) if neighbors[var] else None
+            for neighbor in neighbors[var]:
+                neighbors[neighbor].update(neighbors[var] - {neighbor})
+                neighbors[neighbor].discard(var)
+        # Merge the cliques that are subsets of their parent or child cliques
+        children = {var: [] for var in order}
+        for var in order:
+            if parents[var] is not None:
+                children[parents[var]].append(var)
+        kept = set(order)
+        for var in order:
+            parent = parents[var]
+            if parent is not None and cliques[var] <= cliques[parent]:
+                merged_into = parent
+            else:
+                merged_into = next((child for child in children[var] if cliques[var] <= cliques[child]), None)
+                if merged_into is None:
+                    continue
+                # The child replaces the clique
+                parents[merged_into] = parent
+                if parent is not None:
+                    children[parent].append(merged_into)
+            kept.discard(var)
+            if parent is not None:
+                children[parent].remove(var)
+            for child in children[var]:
+                if child is not merged_into:
+                    parents[child] = merged_into
+                    children[merged_into].append(child)
+            children[var] = []
+        # The depths of the cliques in the tree are found in one traversal from the roots
+        depths = {var: 0 for var in kept if parents[var] is None}
+        stack = list(depths)
+        while stack:
+            var = stack.pop()
+            for child in children[var]:
+                depths[child] = depths[var] + 1
+                stack.append(child)
+        # Children are eliminated before their parents, and the cliques of the same depth in the elimination order
+        kept_order = sorted(kept, key=lambda v: (-depths[v], positions[v]))
+        indices = {var: index for index, var in enumerate(kept_order)}
+        self._cliques = [tuple(sorted(cliques[var], key=lambda x: x.name)) for var in kept_order]
+        self._clique_parents = [indices[parents[var]] if parents[var] is not None else None for var in kept_order]
+        self._clique_neighbors = [[] for _ in kept_order]
+        for clique, parent in enumerate(self._clique_parents):
+            if parent is not None:
+                self._clique_neighbors[clique].append(parent)
+                self._clique_neighbors[parent].append(clique)
+        self._collect_order = list(range(len(kept_order)))
+        # Assign each variable to the smallest clique containing it
+        for clique, variables in enumerate(self._cliques):
+            for var in variables:
+                if var not in self._variable_cliques \
+                        or len(variables) < len(self._cliques[self._variable_cliques[var]]):
+                    self._variable_cliques[var] = clique
+
+    def _set_potentials(self, evidence, changed_cliques):
+        for clique in changed_cliques:
+            potential = self._base_potentials[clique]
+            for axis, var in enumerate(self._cliques[clique]):
+                if var in evidence and self._variable_cliques[var] == clique:
+                    # Logarithmic indicator of the evidential value
+                    indicator = np.full(self._domain_sizes[var], -np.inf)
+                    indicator[self._inner_to_outer_variables[var].domain.index(evidence[var])] = 0
+                    potential = potential + indicator.reshape(
+                        tuple(self._domain_sizes[var] if a == axis else 1 for a in range(potential.ndim))
+                    )
+            self._potentials[clique] = potential
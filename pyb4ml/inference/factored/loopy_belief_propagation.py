@@ -0,0 +1,374 @@
+"""
+The module contains the class of the Loopy Belief Propagation algorithm.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import heapq
+import itertools
+import time
+
+import numpy as np
+
+from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
+
+
+class LBP(FactoredAlgorithm):
+    """
+    This implementation of the Loopy Belief Propagation (LBP) algorithm works on factor
+    graphs with loops for random variables with categorical probability distributions.
+    Unlike the Belief Propagation (BP) algorithm, the factor-to-variable and
+    variable-to-factor messages are not propagated from the leaves, but are iteratively
+    updated from initial messages until they converge, so that the marginal
+    distributions are approximate on loopy graphs and exact on trees.  See, for example,
+    [KF09] for more details.
+
+    The messages are updated in one of two schedules.  In the flooding schedule, all
+    the messages are updated in each iteration from the messages of the previous one.
+    In the residual schedule [EMK06], the message changing most is updated first, which
+    usually converges faster and more often.  The updates can be damped, i.e. a new
+    message is mixed with the old one, to suppress oscillations.  The propagation stops
+    when the largest message change is below the tolerance, after the maximum number of
+    iterations, or after the time limit in seconds, whichever comes first, see
+    LBP.converged.  The approximate distributions are available in any case.
+
+    The messages are kept over the complete variable domains, where an evidence is
+    entered as an indicator in the logarithm, i.e. zero for the evidential value and
+    minus infinity for the other ones.  Thus, the messages of a run can warm-start the
+    next run with another evidence, which usually needs much fewer iterations if the
+    evidence changes only slightly, see LBP.reset_messages.  Instead of the messages,
+    the implementation uses the logarithms of messages for computational stability.
+
+    Computes a marginal probability distribution P(Q) or a conditional probability
+    distribution P(Q | E_1 = e_1, ..., E_k = e_k), where Q is a query, i.e. a random
+    variable of interest, and E_1 = e_1, ..., E_k = e_k form an evidence, i.e. observed
+    values e_1, ..., e_k of random variables E_1, ..., E_k, respectively.
+
+    Restrictions:  Only works with random variables with categorical value domains.
+    The distributions are approximate on loopy graphs.  The factors must be strictly
+    positive because of the use of logarithms.
+
+    Recommended:  Use the algorithm for large loopy graphs, where the Bucket Elimination
+    (BE) algorithm is intractable, and bound the runtime with the time limit.
+
+    References:
+
+    [EMK06] Gal Elidan, Ian McGraw, and Daphne Koller, "Residual Belief Propagation:
+    Informed Scheduling for Asynchronous Message Passing", UAI, 2006
+
+    [KF09] Daphne Koller and Nir Friedman, "Probabilistic Graphical Models: Principles
+    and Techniques", The MIT Press, 2009
+    """
+    _name = 'Loopy Belief Propagation'
+    _schedules = ('flooding', 'residual')
+
+    def __init__(self, model: FactorGraph, schedule='flooding', damping=0.0, max_iterations=100,
+                 tolerance=1e-8, time_limit=None):
+        FactoredAlgorithm.__init__(self, model)
+        if schedule not in LBP._schedules:
+            raise ValueError(f'unknown schedule {schedule!r}, the schedules are {LBP._schedules}')
+        if not 0 <= damping < 1:
+            raise ValueError(f'the damping {damping} must be in [0, 1)')
+        if max_iterations < 1:
+            raise ValueError(f'the maximum number {max_iterations} of iterations must be positive')
+        if tolerance < 0:
+            raise ValueError(f'the tolerance {tolerance} must be non-negative')
+        if time_limit is not None and time_limit <= 0:
+            raise ValueError(f'the time limit {time_limit} must be positive')
+        self._schedule = schedule
+        self._damping = damping
+        self._max_iterations = max_iterations
+        self._tolerance = tolerance
+        self._time_limit = time_limit
+        # Whether to print the iterations
+        self._print_info = False
+        # Logarithm all the model factors and tabulate them
+        self._logarithm_factors()
+        self._tabulate_log_factors()
+        # Log-messages over the complete domains kept over the runs for warm starts
+        self._factor_to_variable_messages = None
+        self._variable_to_factor_messages = None
+        # Log-indicators of the evidential values
+        self._evidence_log_indicators = {}
+        # Statistics of the last run
+        self._iterations = 0
+        self._max_residual = None
+        self._converged = False
+        # Distributions of all the variables
+        self._variable_distributions = {}
+
+    @property
+    def converged(self):
+        """
+        Returns whether the largest message change in the last run was below the tolerance
+        """
+        return self._converged
+
+    @property
+    def damping(self):
+        return self._damping
+
+    @property
+    def iterations(self):
+        """
+        Returns the number of iterations in the last run, where an iteration of the
+        residual schedule is as many message updates as there are messages
+        """
+        return self._iterations
+
+    @property
+    def max_iterations(self):
+        return self._max_iterations
+
+    @property
+    def max_residual(self):
+        return self._max_residual
+
+    @property
+    def schedule(self):
+        return self._schedule
+
+    @property
+    def time_limit(self):
+        return self._time_limit
+
+    @property
+    def tolerance(self):
+        return self._tolerance
+
+    def reset_messages(self):
+        """
+        Resets the messages, so that the next run starts from the uniform messages
+        instead of the messages of the previous run
+        """
+        self._factor_to_variable_messages = None
+        self._variable_to_factor_messages = None
+
+    def run(self, print_info=False):
+        # Check whether a query is specified
+        FactoredAlgorithm.check_non_empty_query(self)
+        # Check whether the query has only one variable
+        FactoredAlgorithm.check_one_variable_query(self)
+        # Check whether the query and evidence variables are disjoint
+        FactoredAlgorithm.check_query_and_evidence_intersection(self)
+        self.run_all(print_info)
+        self._distribution = self._variable_distributions[self._query[0]]
+
+    def run_all(self, print_info=False):
+        """
+        Propagates the messages and computes the approximate marginal or conditional
+        probability distributions of all the variables, which are then returned by
+        variable_pd()
+        """
+        # Whether to print the iterations
+        self._print_info = print_info
+        # Clear the distributions
+        self._distribution = None
+        self._variable_distributions = {}
+        # Print info if necessary
+        FactoredAlgorithm._print_start(self)
+        self._set_evidence_log_indicators()
+        if self._factor_to_variable_messages is None:
+            self._initialize_messages()
+        if self._schedule == 'flooding':
+            self._propagate_flooding()
+        else:
+            self._propagate_residual()
+        self._compute_variable_distributions()
+        # Print info if necessary
+        FactoredAlgorithm._print_stop(self)
+
+    def variable_pd(self, variable):
+        """
+        Returns the approximate marginal or conditional probability distribution of a
+        model variable computed by run_all() as a function of its value
+        """
+        try:
+            inner_variable = self._outer_to_inner_variables[variable]
+        except KeyError:
+            raise ValueError(f'no model variable corresponds to variable {variable.name}')
+        try:
+            return self._get_distribution_function((inner_variable, ), self._variable_distributions[inner_variable])
+        except KeyError:
+            raise AttributeError('distribution not computed')
+
+    @staticmethod
+    def _normalize_log_message(log_message):
+        return log_message - log_sum_exp(log_message, axis=0)
+
+    @staticmethod
+    def _get_residual(log_message, new_log_message):
+        # The messages are compared as probabilities, since their logarithms can be minus infinity
+        return float(np.max(np.abs(np.exp(new_log_message) - np.exp(log_message))))
+
+    def _compute_factor_to_variable_message(self, factor, variable):
+        log_table = self._log_tables[factor]
+        variable_axis = None
+        for axis, var in enumerate(factor.variables):
+            if var is variable:
+                variable_axis = axis
+                continue
+            shape = [1] * log_table.ndim
+            shape[axis] = -1
+            log_table = log_table + self._variable_to_factor_messages[(var, factor)].reshape(shape)
+        # Sum out the other variables of the factor
+        other_axes = tuple(axis for axis in range(log_table.ndim) if axis != variable_axis)
+        log_message = log_sum_exp(log_table, axis=other_axes) if other_axes else log_table
+        log_message = LBP._normalize_log_message(log_message)
+        if self._damping > 0:
+            # Mix the new message with the old one
+            with np.errstate(divide='ignore'):
+                log_message = np.log(
+                    (1 - self._damping) * np.exp(log_message)
+                    + self._damping * np.exp(self._factor_to_variable_messages[(factor, variable)])
+                )
+        return log_message
+
+    def _compute_variable_distributions(self):
+        for variable in self.variables:
+            if variable in self._evidence_log_indicators:
+                # The distribution of an evidential variable is one at the evidential value
+                self._variable_distributions[variable] = np.exp(self._evidence_log_indicators[variable])
+                continue
+            log_belief = sum(
+                (self._factor_to_variable_messages[(factor, variable)] for factor in variable.factors),
+                np.zeros(self._domain_sizes[variable])
+            )
+            self._variable_distributions[variable] = np.exp(LBP._normalize_log_message(log_belief))
+
+    def _compute_variable_to_factor_message(self, variable, factor):
+        log_message = self._evidence_log_indicators.get(variable, np.zeros(self._domain_sizes[variable]))
+        for other_factor in variable.factors:
+            if other_factor is not factor:
+                log_message = log_message + self._factor_to_variable_messages[(other_factor, variable)]
+        return LBP._normalize_log_message(log_message)
+
+    def _get_edges(self):
+        return tuple((factor, variable) for factor in self.factors for variable in factor.variables)
+
+    def _initialize_clone(self):
+        FactoredAlgorithm._initialize_clone(self)
+        # The clone starts without the messages of warm starts
+        self._factor_to_variable_messages = None
+        self._variable_to_factor_messages = None
+        self._evidence_log_indicators = {}
+        self._iterations = 0
+        self._max_residual = None
+        self._converged = False
+        self._variable_distributions = {}
+
+    def _initialize_messages(self):
+        self._factor_to_variable_messages = {}
+        self._variable_to_factor_messages = {}
+        for factor, variable in self._get_edges():
+            uniform_log_message = np.full(self._domain_sizes[variable], -np.log(self._domain_sizes[variable]))
+            self._factor_to_variable_messages[(factor, variable)] = uniform_log_message
+            self._variable_to_factor_messages[(variable, factor)] = uniform_log_message
+
+    def _is_time_over(self, start_time):
+        return self._time_limit is not None and time.monotonic() - start_time >= self._time_limit
+
+    def _print_iteration(self):
+        if self._print_info:
+            print(f'\niteration: {self._iterations}')
+            print(f'max residual: {self._max_residual}')
+
+    def _propagate_flooding(self):
+        start_time = time.monotonic()
+        edges = self._get_edges()
+        self._iterations = 0
+        self._converged = False
+        while self._iterations < self._max_iterations and not self._is_time_over(start_time):
+            self._iterations += 1
+            # All the messages of an iteration are computed from the messages of the previous one
+            self._variable_to_factor_messages = {
+                (variable, factor): self._compute_variable_to_factor_message(variable, factor)
+                for factor, variable in edges
+            }
+            new_messages = {
+                (factor, variable): self._compute_factor_to_variable_message(factor, variable)
+                for factor, variable in edges
+            }
+            self._max_residual = max(
+                (LBP._get_residual(self._factor_to_variable_messages[edge], new_messages[edge]) for edge in edges),
+                default=0.0
+            )
+            self._factor_to_variable_messages = new_messages
+            self._print_iteration()
+            if self._max_residual < self._tolerance:
+                self._converged = True
+                break
+        # The variable-to-factor messages are consistent with the last factor-to-variable messages
+        self._update_variable_to_factor_messages(edges)
+
+    def _propagate_residual(self):
+        start_time = time.monotonic()
+        edges = self._get_edges()
+        self._update_variable_to_factor_messages(edges)
+        # Candidate messages with their residuals in a heap of the largest residuals
+        candidates = {}
+        residuals = {}
+        heap = []
+        counter = itertools.count()
+
+        def update_candidate(candidate_edge):
+            candidates[candidate_edge] = self._compute_factor_to_variable_message(*candidate_edge)
+            residuals[candidate_edge] = LBP._get_residual(
+                self._factor_to_variable_messages[candidate_edge], candidates[candidate_edge]
+            )
+            heapq.heappush(heap, (-residuals[candidate_edge], next(counter), candidate_edge))
+
+        for edge in edges:
+            update_candidate(edge)
+        updates = 0
+        max_updates = self._max_iterations * len(edges)
+        self._converged = False
+        self._max_residual = max(residuals.values(), default=0.0)
+        while updates < max_updates and not self._is_time_over(start_time):
+            # Skip the outdated residuals
+            while heap and -heap[0][0] != residuals[heap[0][2]]:
+                heapq.heappop(heap)
+            self._max_residual = -heap[0][0] if heap else 0.0
+            if self._max_residual < self._tolerance:
+                self._converged = True
+                break
+            _, _, (factor, variable) = heapq.heappop(heap)
+            self._factor_to_variable_messages[(factor, variable)] = candidates[(factor, variable)]
+            updates += 1
+            update_candidate((factor, variable))
+            # The messages from the variable to its other factors change and so do their messages
+            for other_factor in variable.factors:
+                if other_factor is factor:
+                    continue
+                self._variable_to_factor_messages[(variable, other_factor)] = \
+                    self._compute_variable_to_factor_message(variable, other_factor)
+                for other_variable in other_factor.variables:
+                    if other_variable is not variable:
+                        update_candidate((other_factor, other_variable))
+            if updates % len(edges) == 0:
+                self._iterations = updates // len(edges)
+                self._print_iteration()
+        self._iterations = -(-updates // len(edges)) if edges else 0
+
+    def _set_evidence_log_indicators(self):
+        self._evidence_log_indicators = {}
+        for variable, value in self._evidence_tuples:
+            log_indicator = np.full(self._domain_sizes[variable], -np.inf)
+            log_indicator[self._inner_to_outer_variables[variable].domain.index(value)] = 0.0
+            self._evidence_log_indicators[variable] = log_indicator
+
+    def _update_variable_to_factor_messages(self, edges):
+        self._variable_to_factor_messages = {
+            (variable, factor): self._compute_variable_to_factor_message(variable, factor)
+            for factor, variable in edges
+        }
@@ -0,0 +1,77 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+class MemmapStorage:
+    """
+    Stores the large intermediate log-tables of an elimination out of core, i.e. in
+    memory-mapped temporary files, so that the tables of an elimination can together
+    exceed the RAM.  A log-table of at least min_table_bytes is memory-mapped, a smaller
+    one is kept in memory.  The bucket log-tables are computed and streamed in chunks
+    of about chunk_bytes, see Bucket.compute_output_log_table.
+
+    The storage is used as a context manager for one elimination run, which creates a
+    temporary directory in the given directory (by default, in the system one) and
+    removes it with all the files at the exit.
+    """
+    def __init__(self, directory=None, min_table_bytes=2 ** 26, chunk_bytes=2 ** 24):
+        if min_table_bytes < 0:
+            raise ValueError(f'the minimum table size {min_table_bytes} in bytes must be non-negative')
+        if chunk_bytes <= 0:
+            raise ValueError(f'the chunk size {chunk_bytes} in bytes must be positive')
+        self._directory = directory
+        self._min_table_bytes = min_table_bytes
+        self._chunk_bytes = chunk_bytes
+        self._temporary_directory = None
+        self._paths = {}
+        self._file_number = 0
+
+    def __enter__(self):
+        self._temporary_directory = tempfile.TemporaryDirectory(prefix='pyb4ml_', dir=self._directory)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._paths.clear()
+        self._temporary_directory.cleanup()
+        self._temporary_directory = None
+
+    @property
+    def chunk_bytes(self):
+        return self._chunk_bytes
+
+    @property
+    def directory(self):
+        return self._directory
+
+    @property
+    def min_table_bytes(self):
+        return self._min_table_bytes
+
+    def allocate(self, shape):
+        """
+        Returns an uninitialized log-table of the shape, memory-mapped if it is large
+        """
+        nbytes = int(np.prod(shape, dtype=np.int64)) * np.dtype(float).itemsize
+        if nbytes < self._min_table_bytes or nbytes == 0:
+            return np.empty(shape)
+        if self._temporary_directory is None:
+            raise AttributeError('storage not entered')
+        path = os.path.join(self._temporary_directory.name, f'log_table_{self._file_number}.dat')
+        self._file_number += 1
+        log_table = np.memmap(path, dtype=float, mode='w+', shape=shape)
+        self._paths[id(log_table)] = path
+        return log_table
+
+    def release(self, log_table):
+        """
+        Removes the file of a memory-mapped log-table not needed anymore
+        """
+        path = self._paths.pop(id(log_table), None)
+        if path is not None:
+            try:
+                os.remove(path)
+            except OSError:
+                # A mapped file cannot be removed on some platforms, then it is removed at the exit
+                pass
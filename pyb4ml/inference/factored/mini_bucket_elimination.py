@@ -0,0 +1,168 @@
+"""
+The module contains the class of the Mini-Bucket Elimination algorithm.
+
+Attention:  The author is not responsible for any damage that can be caused by the use
+of this code.  You use this code at your own risk.  Any claim against the author is
+legally void.  By using this code, you agree to the terms imposed by the author.
+
+Achtung:  Der Autor haftet nicht für Schäden, die durch die Verwendung dieses Codes
+entstehen können.  Sie verwenden dieses Code auf eigene Gefahr.  Jegliche Ansprüche
+gegen den Autor sind rechtlich nichtig.  Durch die Verwendung dieses Codes stimmen
+Sie den vom Autor auferlegten Bedingungen zu.
+
+© 2023 Alexander Vasiliev
+"""
+import numpy as np
+
+from pyb4ml.inference.factored.bucket_elimination import BE
+from pyb4ml.inference.factored.factored_algorithm import FactoredAlgorithm
+from pyb4ml.inference.factored.mini_bucket_plan import MiniBucketPlan
+from pyb4ml.inference.factored.semiring import MAX_SUM, MIN_SUM
+from pyb4ml.modeling import FactorGraph
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
+
+
+class MBE(BE):
+    """
+    This implementation of the Mini-Bucket Elimination (MBE) algorithm approximates
+    Bucket Elimination (BE) if the buckets of an elimination order are too large.  The
+    log-factors of each bucket are partitioned into mini-buckets of at most i_bound
+    non-evidential variables, and the bucket variable is eliminated from each
+    mini-bucket separately.  The first mini-bucket is summed out, while the others are
+    maximized out for upper bounds and minimized out for lower bounds, see
+    MiniBucketPlan.  The i-bound trades accuracy for time and memory: the larger it is,
+    the tighter the bounds are, and if it is at least the largest bucket size, the
+    bounds are exact.  See, for example, [DR03] for more details.
+
+    Computes lower and upper bounds on the probability of the evidence P(E_1 = e_1, ...,
+    E_k = e_k) and on the probability distribution P(Q_1, ..., Q_s | E_1 = e_1, ...,
+    E_k = e_k), see MBE.pe_bounds and MBE.pd_bounds.  If the model factors are not
+    normalized as in a Bayesian network, the probability of the evidence is not
+    normalized either.  MBE.pd returns the normalized upper bounds as an approximate
+    distribution.
+
+    Restrictions:  Only works with random variables with categorical value domains.
+    The factors must be strictly positive because of the use of logarithms.  The query and
+    elimination variables must be disjoint.
+
+    Recommended:  Use the algorithm if the estimated cost of BE, see BE.estimate_cost,
+    exceeds the time or memory available, and tune the i-bound with MBE.estimate_cost.
+
+    References:
+
+    [DR03] Rina Dechter and Irina Rish, "Mini-Buckets: A General Scheme for Bounded
+    Inference", Journal of the ACM, 2003
+    """
+    _name = 'Mini-Bucket Elimination'
+
+    def __init__(self, model: FactorGraph, i_bound=2):
+        BE.__init__(self, model)
+        self._i_bound = None
+        self.set_i_bound(i_bound)
+        # Lower and upper bounds on the probability of the evidence
+        self._pe_bounds = None
+        # Lower and upper bounds on the probability distribution
+        self._distribution_bounds = None
+
+    @property
+    def i_bound(self):
+        return self._i_bound
+
+    @property
+    def pd_bounds(self):
+        """
+        Returns the lower and upper bounds on the probability distribution
+        P(Q_1, ..., Q_s | E_1 = e_1, ..., E_k = e_k) as a tuple of two functions of
+        q_1, ..., q_s, see FactoredAlgorithm.pd.  For example,
+        algorithm.pd_bounds[1]('d0', 'i1') returns the upper bound on the probability
+        of Difficulty = 'd0' and Intelligence = 'i1' given the evidence.
+        """
+        if self._distribution_bounds is not None:
+            return tuple(
+                self._get_distribution_function(self._query, distribution)
+                for distribution in self._distribution_bounds
+            )
+        else:
+            raise AttributeError('distribution bounds not computed')
+
+    @property
+    def pe_bounds(self):
+        """
+        Returns the lower and upper bounds on the probability of the evidence
+        P(E_1 = e_1, ..., E_k = e_k) as a tuple of two numbers
+        """
+        if self._pe_bounds is not None:
+            return self._pe_bounds
+        else:
+            raise AttributeError('evidence probability bounds not computed')
+
+    def estimate_cost(self, batch_size=1):
+        """
+        Returns the estimated cost of a run as a CostEstimate, see BE.estimate_cost,
+        where the mini-bucket plan over all the model factors is estimated
+        """
+        # Query, evidence, and elimination order variables must be disjoint and build a whole model
+        self.check_variable_partition()
+        return self._get_plan(self._evidence).estimate_cost(batch_size)
+
+    def run(self, print_info=False, memory_budget=None):
+        """
+        Computes the bounds.  The query can be empty, then only the bounds on the
+        probability of the evidence are computed.  If the estimated peak memory in bytes
+        of the intermediate log-tables exceeds memory_budget, then MemoryError is raised
+        before the elimination starts.
+        """
+        # Query, evidence, and elimination order variables must be disjoint and build a whole model
+        self.check_variable_partition()
+        self._pe_bounds = None
+        self._distribution_bounds = None
+        evidence_indices = self._get_evidence_indices()
+        # Maximizing and minimizing out the variables bound the non-normalized query log-table
+        upper_log_table = np.array(
+            self._run_plan(self._evidence, evidence_indices, print_info, 1, memory_budget, MAX_SUM)[0]
+        )
+        lower_log_table = np.array(
+            self._run_plan(self._evidence, evidence_indices, False, 1, memory_budget, MIN_SUM)[0]
+        )
+        # Summing the bounds over the query values bounds the probability of the evidence
+        log_pe_upper = float(log_sum_exp(upper_log_table.ravel(), axis=0))
+        log_pe_lower = float(log_sum_exp(lower_log_table.ravel(), axis=0))
+        self._pe_bounds = (float(np.exp(log_pe_lower)), float(np.exp(log_pe_upper)))
+        if self._query:
+            # The lower bound of the numerator is divided by the upper bound of the denominator and vice versa
+            self._distribution_bounds = (
+                np.exp(lower_log_table - log_pe_upper),
+                np.minimum(np.exp(upper_log_table - log_pe_lower), 1.0)
+            )
+            self._compute_distribution(upper_log_table)
+        # Print info if necessary
+        FactoredAlgorithm._print_stop(self)
+
+    def set_i_bound(self, i_bound):
+        """
+        Sets the largest number of non-evidential variables in a mini-bucket
+        """
+        if i_bound < 1:
+            raise ValueError(f'the i-bound {i_bound} must be positive')
+        self._i_bound = i_bound
+
+    def _initialize_clone(self):
+        BE._initialize_clone(self)
+        self._pe_bounds = None
+        self._distribution_bounds = None
+
+    def _get_plan(self, evidence):
+        key = (self._query, evidence, tuple(self._elimination_order), self._i_bound)
+        try:
+            return self._plan_cache[key]
+        except KeyError:
+            plan = MiniBucketPlan(
+                log_factors=self.factors,
+                query=self._query,
+                evidence=evidence,
+                elimination_order=self._elimination_order,
+                domain_sizes=self._domain_sizes,
+                i_bound=self._i_bound
+            )
+            self._plan_cache[key] = plan
+            return plan
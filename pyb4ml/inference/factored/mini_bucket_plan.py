@@ -0,0 +1,84 @@
+from pyb4ml.inference.factored.bucket import Bucket
+from pyb4ml.inference.factored.elimination_plan import EliminationPlan
+from pyb4ml.inference.factored.semiring import LOG_SUM
+from pyb4ml.modeling.factor_graph.factor import Factor
+
+
+class MiniBucketPlan(EliminationPlan):
+    """
+    Contains the symbolic part of a Mini-Bucket Elimination run, where the log-factors
+    of each bucket are partitioned into mini-buckets, so that no mini-bucket has more
+    than i_bound non-evidential variables including the eliminated one.  The variable is
+    eliminated from each mini-bucket separately, which bounds the bucket table sizes by
+    the i-bound instead of by the induced width of the elimination order.
+
+    The first mini-bucket of a variable is summed out as in Bucket Elimination, while
+    the other mini-buckets of that variable are eliminated in the semiring of the run.
+    Since the sum of a product is at most the product of the sum of one factor and the
+    maxima of the others, the maximum gives an upper bound and, similarly, the minimum
+    gives a lower bound on the non-normalized query log-table.
+    """
+    def __init__(self, log_factors, query, evidence, elimination_order, domain_sizes, i_bound):
+        self._i_bound = i_bound
+        # Mini-buckets eliminated in the semiring of the run rather than summed out
+        self._bounded_buckets = set()
+        EliminationPlan.__init__(self, log_factors, query, evidence, elimination_order, domain_sizes)
+
+    @property
+    def i_bound(self):
+        return self._i_bound
+
+    def _compile(self):
+        self._set_scopes()
+        remaining = list(self._log_factors)
+        for var in self._elimination_order + self._query:
+            var_log_factors = [log_factor for log_factor in remaining if var in self._scopes[log_factor]]
+            remaining = [log_factor for log_factor in remaining if var not in self._scopes[log_factor]]
+            if var in self._query:
+                bucket = Bucket(var)
+                for log_factor in var_log_factors:
+                    bucket.add_log_factor(log_factor)
+                self._query_buckets.append(bucket)
+                self._query_log_factors.extend(var_log_factors)
+                continue
+            for index, partition in enumerate(self._get_partitions(var_log_factors)):
+                bucket = Bucket(var)
+                for log_factor in partition:
+                    bucket.add_log_factor(log_factor)
+                bucket.set_evidential_and_free_variables(self._evidence)
+                bucket.set_alignments(self._scopes, self._domain_sizes)
+                # The output log-factor is only a placeholder for its log-table
+                log_factor = Factor(
+                    variables=bucket.free_variables,
+                    name=f'log_f_{var.name}_{index}',
+                    variable_linking=False
+                )
+                self._scopes[log_factor] = bucket.free_variables
+                bucket.set_output_log_factor(log_factor)
+                self._buckets.append(bucket)
+                if index > 0:
+                    self._bounded_buckets.add(bucket)
+                # If the mini-bucket has no free variables, then the output log-factor is a constant
+                if bucket.has_free_variables():
+                    remaining.append(log_factor)
+                else:
+                    self._constant_log_factors.append(log_factor)
+        # The log-factors depending only on evidential variables are constants
+        self._constant_log_factors.extend(remaining)
+
+    def _get_bucket_semiring(self, bucket, semiring, variable_semirings):
+        return semiring if bucket in self._bounded_buckets else LOG_SUM
+
+    def _get_partitions(self, log_factors):
+        # Put the log-factors with the largest scopes first into the first mini-bucket they fit in
+        partitions = []
+        for log_factor in sorted(log_factors, key=lambda x: len(self._scopes[x]), reverse=True):
+            scope = set(self._scopes[log_factor])
+            for partition_scope, partition in partitions:
+                if len(partition_scope | scope) <= self._i_bound:
+                    partition_scope.update(scope)
+                    partition.append(log_factor)
+                    break
+            else:
+                partitions.append((scope, [log_factor]))
+        return [partition for _, partition in partitions]
@@ -0,0 +1,190 @@
+import collections
+import hashlib
+import json
+import os
+import tempfile
+
+
+class OrderCache:
+    """
+    Caches elimination orders as tuples of variable names under keys of
+    (model_hash, query_names, evidence_names, cost), where model_hash is a structural
+    hash of the model, see OrderCache.get_model_hash.  The number of cached orders can be
+    bounded, where the least recently used orders are evicted.  The numbers of cache
+    hits, misses, and evictions are counted.
+
+    If a path is given, the cached orders are loaded from that JSON file if it exists
+    and saved into it after every save_every newly cached orders and on OrderCache.flush.
+    The orders not saved yet are lost if the cache is not flushed, which only costs
+    their recomputation.  On saving, the file is read again and merged with the cached
+    orders, so that processes sharing the file keep the orders of each other, and it is
+    replaced atomically, so that they never read a partially written file.
+    """
+    _version = 1
+
+    def __init__(self, max_orders=None, path=None, save_every=16):
+        if max_orders is not None and max_orders < 0:
+            raise ValueError(f'the maximum number {max_orders} of orders must be non-negative')
+        if save_every < 1:
+            raise ValueError(f'the number {save_every} of orders cached between the savings must be positive')
+        self._max_orders = max_orders
+        self._path = path
+        self._save_every = save_every
+        self._orders = collections.OrderedDict()
+        # Number of the orders cached since the last saving
+        self._unsaved_number = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        if self._path is not None and os.path.exists(self._path):
+            self.load()
+
+    def __contains__(self, key):
+        return OrderCache._get_json_key(key) in self._orders
+
+    def __len__(self):
+        return len(self._orders)
+
+    @staticmethod
+    def get_model_hash(variables, factors, domain_sizes):
+        """
+        Returns a hash of the model structure, i.e. of the variable names with their
+        domain sizes and of the variable names of each factor, which does not depend
+        on the factor values and on the order of the variables and factors
+        """
+        structure = {
+            'variables': sorted([var.name, domain_sizes[var]] for var in variables),
+            'factors': sorted(sorted(var.name for var in factor.variables) for factor in factors)
+        }
+        return hashlib.sha256(json.dumps(structure).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _get_json_key(key):
+        model_hash, query_names, evidence_names, cost = key
+        return json.dumps([model_hash, list(query_names), list(evidence_names), cost])
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def max_orders(self):
+        return self._max_orders
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def save_every(self):
+        return self._save_every
+
+    @property
+    def unsaved_number(self):
+        return self._unsaved_number
+
+    def cache(self, key, order_names):
+        json_key = OrderCache._get_json_key(key)
+        self._orders.pop(json_key, None)
+        self._orders[json_key] = tuple(order_names)
+        self._evict_if_necessary()
+        self._unsaved_number += 1
+        if self._path is not None and self._unsaved_number >= self._save_every:
+            self.save()
+
+    def clear(self):
+        """
+        Removes the cached orders from memory, where the file is not changed, so that
+        the processes sharing it keep their orders
+        """
+        self._orders.clear()
+        self._unsaved_number = 0
+
+    def clear_file(self):
+        """
+        Removes the cached orders and also empties the file, i.e. for all the processes
+        sharing it
+        """
+        if self._path is None:
+            raise AttributeError('no file path given')
+        self.clear()
+        self._write()
+
+    def flush(self):
+        """
+        Saves the orders cached since the last saving if a path is given
+        """
+        if self._path is not None and self._unsaved_number > 0:
+            self.save()
+
+    def get(self, key):
+        """
+        Returns the cached order of variable names or None if there is no order for the key
+        """
+        json_key = OrderCache._get_json_key(key)
+        try:
+            order_names = self._orders[json_key]
+        except KeyError:
+            self._misses += 1
+            return None
+        self._hits += 1
+        # The order is now the most recently used one
+        self._orders.move_to_end(json_key)
+        return order_names
+
+    def load(self):
+        """
+        Loads the orders from the file, where the orders cached in this process are kept
+        as the most recently used ones
+        """
+        with open(self._path, 'r', encoding='utf-8') as file:
+            content = json.load(file)
+        if content.get('version') != OrderCache._version:
+            raise ValueError(f'order cache file {self._path} has an unsupported version {content.get("version")}')
+        orders = collections.OrderedDict(
+            (json_key, tuple(order_names)) for json_key, order_names in content['orders']
+        )
+        for json_key, order_names in self._orders.items():
+            orders.pop(json_key, None)
+            orders[json_key] = order_names
+        self._orders = orders
+        self._evict_if_necessary()
+
+    def save(self):
+        """
+        Merges the orders of the file, e.g. saved by other processes in the meantime, into
+        the cached orders, writes them into a temporary file, and atomically replaces the
+        file with it
+        """
+        if os.path.exists(self._path):
+            self.load()
+        self._write()
+        self._unsaved_number = 0
+
+    def _evict_if_necessary(self):
+        while self._max_orders is not None and len(self._orders) > self._max_orders:
+            self._orders.popitem(last=False)
+            self._evictions += 1
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        content = {
+            'version': OrderCache._version,
+            'orders': [[json_key, list(order_names)] for json_key, order_names in self._orders.items()]
+        }
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'w', encoding='utf-8') as file:
+                json.dump(content, file)
+            os.replace(temporary_path, self._path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
@@ -0,0 +1,67 @@
+import numpy as np
+
+from pyb4ml.modeling.factor_graph.factor_graph import FactorGraph
+
+
+def get_normalized_variables(variables, table):
+    """
+    Returns the variables over which a factor table sums to one for all the values of the
+    other variables, e.g. the child variable of a conditional probability table, where
+    the table axes correspond to the variables
+    """
+    return frozenset(
+        var for axis, var in enumerate(variables)
+        if np.allclose(np.sum(table, axis=axis), 1.0, rtol=1e-9, atol=1e-12)
+    )
+
+
+def get_relevant_factors(factors, query, evidence, get_factor_normalized_variables):
+    """
+    Returns the factors relevant to the query given the evidence in their order, where the
+    barren variables are removed iteratively.  A barren variable is neither a query nor
+    an evidential variable and belongs to only one factor normalized over it, e.g. a
+    variable without children in a Bayesian network.  Summing it out gives one, so that
+    its factor can be removed, which can make other variables barren.  The function
+    get_factor_normalized_variables returns the variables over which a factor is
+    normalized.
+    """
+    protected_variables = set(query) | set(evidence)
+    relevant_factors = set(factors)
+    variable_factors = {}
+    for factor in factors:
+        for var in factor.variables:
+            variable_factors.setdefault(var, set()).add(factor)
+    candidates = [var for var in variable_factors if var not in protected_variables]
+    while candidates:
+        variable = candidates.pop()
+        if len(variable_factors[variable]) != 1:
+            continue
+        factor, = variable_factors[variable]
+        if variable not in get_factor_normalized_variables(factor):
+            continue
+        # Remove the factor of the barren variable
+        relevant_factors.discard(factor)
+        for var in factor.variables:
+            variable_factors[var].discard(factor)
+            if var not in protected_variables and len(variable_factors[var]) == 1:
+                candidates.append(var)
+    return tuple(factor for factor in factors if factor in relevant_factors)
+
+
+def get_relevant_components(factors, query, evidence, get_factor_normalized_variables):
+    """
+    Returns the connected components of the relevant factors cut by the evidence as
+    tuples of (variables, factors), where the variables are a frozenset.  The components
+    without query variables only contribute constants to the query distribution and are
+    omitted.  A query variable left without factors forms a component of its own.
+    """
+    components = [
+        (frozenset(variables), component_factors)
+        for variables, component_factors in FactorGraph.get_components(
+            get_relevant_factors(factors, query, evidence, get_factor_normalized_variables), evidence
+        )
+        if any(var in query for var in variables)
+    ]
+    covered_variables = set(var for variables, _ in components for var in variables)
+    components.extend((frozenset((var, )), ()) for var in query if var not in covered_variables)
+    return tuple(components)
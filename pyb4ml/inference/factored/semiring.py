@@ -0,0 +1,68 @@
+import numpy as np
+
+from pyb4ml.modeling.factor_graph.table_factor import log_sum_exp
+
+
+def _get_indicator(log_table):
+    # Zero where the factor is positive and minus infinity elsewhere
+    return np.where(np.isfinite(log_table), 0.0, -np.inf)
+
+
+def _get_rounded_exp(log_table):
+    return np.rint(np.exp(log_table))
+
+
+class Semiring:
+    """
+    Defines how the bucket log-tables are eliminated, where the product of factors is
+    always the sum of their log-tables.  The elimination of a variable is, e.g., the
+    log-sum-exp for the sum-product or the maximum for the max-product over that
+    variable.  If the elimination selects a value, as the maximum does, its argument
+    function returns the positions of the selected values, which are kept as
+    back-pointers for decoding.
+
+    The model log-tables can be converted before the elimination, e.g. to indicators
+    for counting the assignments of positive probability, and the results can be
+    finalized, e.g. from logarithms to numbers.
+    """
+    def __init__(self, name, eliminate, arg_eliminate=None, convert=None, finalize=None):
+        self._name = name
+        self._eliminate = eliminate
+        self._arg_eliminate = arg_eliminate
+        self._convert = convert
+        self._finalize = finalize
+
+    def __repr__(self):
+        return f'Semiring({self._name!r})'
+
+    @property
+    def has_arguments(self):
+        return self._arg_eliminate is not None
+
+    @property
+    def name(self):
+        return self._name
+
+    def arg_eliminate(self, log_table, axis):
+        if self._arg_eliminate is None:
+            raise AttributeError(f'semiring {self._name} does not select values')
+        return self._arg_eliminate(log_table, axis=axis)
+
+    def convert(self, log_table):
+        return self._convert(log_table) if self._convert is not None else log_table
+
+    def eliminate(self, log_table, axis):
+        return self._eliminate(log_table, axis=axis)
+
+    def finalize(self, log_table):
+        return self._finalize(log_table) if self._finalize is not None else log_table
+
+
+# Sum-product in logarithms, which computes (non-normalized) marginals
+LOG_SUM = Semiring('log-sum', log_sum_exp)
+# Max-product in logarithms, which computes the most probable explanation (MPE)
+MAX_SUM = Semiring('max-sum', np.max, np.argmax)
+# Min-product in logarithms, which computes the least probable explanation
+MIN_SUM = Semiring('min-sum', np.min, np.argmin)
+# Counting of the assignments of positive probability
+COUNTING = Semiring('counting', log_sum_exp, convert=_get_indicator, finalize=_get_rounded_exp)
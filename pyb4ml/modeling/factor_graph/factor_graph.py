@@ -13,6 +13,16 @@ class FactorGraph:
         )
         self._factor_dict = None
         self._variable_dict = None
+        self._components = None
+
+    @property
+    def components(self):
+        """
+        Returns the connected components as tuples of their variables
+        """
+        if self._components is None:
+            self._set_components()
+        return self._components
 
     @property
     def factors(self):
@@ -34,6 +44,43 @@ class FactorGraph:
     def variable_leaves(self):
         return tuple(variable for variable in self._variables if variable.is_leaf())
 
+    @staticmethod
+    def get_components(factors, excluded_variables=()):
+        """
+        Returns the connected components of the factors as tuples of (variables, factors),
+        where the excluded variables, e.g. evidential ones, do not connect the factors and
+        belong to no component.  The factors with only excluded variables belong to no
+        component either.  The variables of a component are sorted by name and so are the
+        components by their first variables.
+        """
+        excluded_variables = frozenset(excluded_variables)
+        # Union-find over the variables connected by the factors
+        parents = {}
+
+        def find(variable):
+            while parents[variable] is not variable:
+                parents[variable] = parents[parents[variable]]
+                variable = parents[variable]
+            return variable
+
+        for factor in factors:
+            factor_variables = [var for var in factor.variables if var not in excluded_variables]
+            for variable in factor_variables:
+                parents.setdefault(variable, variable)
+            for variable in factor_variables[1:]:
+                root = find(factor_variables[0])
+                other_root = find(variable)
+                if other_root is not root:
+                    parents[other_root] = root
+        components = {}
+        for variable in sorted(parents, key=lambda x: x.name):
+            components.setdefault(find(variable), ([], []))[0].append(variable)
+        for factor in factors:
+            factor_variables = [var for var in factor.variables if var not in excluded_variables]
+            if factor_variables:
+                components[find(factor_variables[0])][1].append(factor)
+        return tuple((tuple(variables), tuple(factors)) for variables, factors in components.values())
+
     def get_factor(self, name):
         if self._factor_dict is None:
             self._set_factor_dict()
@@ -50,6 +97,18 @@ class FactorGraph:
         except KeyError:
             raise AttributeError(f'variable {name} not found')
 
+    def is_tree(self):
+        """
+        Returns whether the factor graph has no cycles, i.e. each connected component
+        is a tree.  In a forest, the number of edges is the number of nodes minus the
+        number of connected components.
+        """
+        edges_number = sum(len(factor.variables) for factor in self._factors)
+        return edges_number == len(self._variables) + len(self._factors) - len(self.components)
+
+    def _set_components(self):
+        self._components = tuple(variables for variables, _ in FactorGraph.get_components(self._factors))
+
     def _set_factor_dict(self):
         self._factor_dict = {factor.name: factor for factor in self._factors}
 
@@ -0,0 +1,227 @@
+import itertools
+
+import numpy as np
+
+from pyb4ml.modeling.factor_graph.factor import Factor
+
+
+def log_sum_exp(array, axis):
+    """
+    Computes log(sum(exp(array))) over the given axis in a numerically stable way
+    """
+    max_array = np.max(array, axis=axis, keepdims=True)
+    # Avoid (-inf) - (-inf) if all the summed values are -inf
+    max_array = np.where(np.isfinite(max_array), max_array, 0)
+    summed = np.sum(np.exp(array - max_array), axis=axis)
+    with np.errstate(divide='ignore'):
+        return np.log(summed) + np.squeeze(max_array, axis=axis)
+
+
+class TableFactor(Factor):
+    """
+    A factor whose values are stored in a dense NumPy array.  The array has one axis
+    per factor variable, in the order of the factor variables, and the position on an
+    axis is the position of a value in the domain of that variable.  The domains are
+    fixed at construction, so that a later reduction of a variable domain to an
+    evidential value does not change the table.
+
+    The table factor is a drop-in replacement for Factor: it can be called with
+    (variable, value) tuples, can take evidence, and can be logarithmed.  In addition,
+    it supports the vectorized product, sum-out, max-out, and evidence reduction,
+    which return new table factors unlinked to their variables.
+    """
+    def __init__(self, variables, table, name=None, evidence=None, variable_linking=True, domains=None,
+                 logarithmic=False):
+        variables = tuple(variables)
+        self._domains = tuple(domains) if domains is not None else tuple(var.domain for var in variables)
+        self._positions = tuple({value: index for index, value in enumerate(domain)} for domain in self._domains)
+        self._table = np.asarray(table, dtype=float)
+        if self._table.shape != tuple(len(domain) for domain in self._domains):
+            raise ValueError(f'table shape {self._table.shape} does not match the domain cardinalities '
+                             f'{tuple(len(domain) for domain in self._domains)} of the factor variables '
+                             f'{tuple(var.name for var in variables)}')
+        self._logarithmic = logarithmic
+        Factor.__init__(self, variables, None, name, evidence, variable_linking)
+
+    def __call__(self, *variables_with_values):
+        var_val_dict = {}
+        var_val_dict.update(self._evidence_var_val_dict)
+        var_val_dict.update(dict(variables_with_values))
+        return float(self._table[self._get_index(var_val_dict[var] for var in self._variables)])
+
+    @classmethod
+    def from_factor(cls, factor, name=None, variable_linking=False):
+        """
+        Tabulates the function of a factor over the current domains of its variables
+        """
+        domains = tuple(var.domain for var in factor.variables)
+        shape = tuple(len(domain) for domain in domains)
+        table = np.fromiter(
+            (factor.function(*values) for values in itertools.product(*domains)),
+            dtype=float,
+            count=int(np.prod(shape, dtype=np.int64))
+        ).reshape(shape)
+        return cls(
+            variables=factor.variables,
+            table=table,
+            name=name if name is not None else factor.name,
+            variable_linking=variable_linking,
+            domains=domains
+        )
+
+    @property
+    def domains(self):
+        return self._domains
+
+    @property
+    def function(self):
+        def function(*values):
+            return float(self._table[self._get_index(values)])
+        return function
+
+    @property
+    def logarithmic(self):
+        return self._logarithmic
+
+    @property
+    def table(self):
+        return self._table
+
+    def get_aligned_table(self, variables):
+        """
+        Returns the table transposed to the order of the given variables and broadcastable
+        over them, i.e. with axes of length one for the variables not in the factor
+        """
+        if not set(self._variables).issubset(variables):
+            raise ValueError(f'factor variables {tuple(var.name for var in self._variables)} are not contained '
+                             f'in the variables {tuple(var.name for var in variables)}')
+        axes = tuple(self._variables.index(var) for var in variables if var in self._variables)
+        shape = tuple(len(self._domains[self._variables.index(var)]) if var in self._variables else 1
+                      for var in variables)
+        return np.transpose(self._table, axes).reshape(shape)
+
+    def logarithm(self, log_table=None):
+        """
+        Replaces the table by its logarithm.  A given log-table, e.g. computed once and
+        shared read-only, is used instead of computing the logarithm.
+        """
+        if log_table is None:
+            with np.errstate(divide='ignore'):
+                log_table = np.log(self._table)
+        elif log_table.shape != self._table.shape:
+            raise ValueError(f'log-table shape {log_table.shape} does not match the table shape {self._table.shape}')
+        self._table = log_table
+        self._name = 'log_' + self._name
+        self._logarithmic = True
+
+    def max_out(self, variable, name=None):
+        """
+        Returns the factor with the variable eliminated by maximization
+        """
+        axis = self._get_axis(variable)
+        return self._create(
+            variables=self._variables[:axis] + self._variables[axis + 1:],
+            domains=self._domains[:axis] + self._domains[axis + 1:],
+            table=np.max(self._table, axis=axis),
+            name=name if name is not None else 'max_' + variable.name + '_' + self._name
+        )
+
+    def product(self, other, name=None):
+        """
+        Returns the product of two table factors over the union of their variables.  The
+        product of logarithmic factors is the sum of their tables.
+        """
+        if not isinstance(other, TableFactor):
+            raise ValueError(f'object {other} is not an instance of class TableFactor')
+        if self._logarithmic != other.logarithmic:
+            raise ValueError(f'factors {self._name} and {other.name} must be both logarithmic or not')
+        variables = self._variables + tuple(var for var in other.variables if var not in self._variables)
+        domains = self._domains + tuple(
+            domain for var, domain in zip(other.variables, other.domains) if var not in self._variables
+        )
+        for var, domain in zip(other.variables, other.domains):
+            if var in self._variables and self._domains[self._variables.index(var)] != domain:
+                raise ValueError(f'variable {var.name} has different domains in factors {self._name} '
+                                 f'and {other.name}')
+        aligned_self = self._table.reshape(self._table.shape + (1, ) * (len(variables) - len(self._variables)))
+        aligned_other = other.get_aligned_table(variables)
+        table = aligned_self + aligned_other if self._logarithmic else aligned_self * aligned_other
+        return self._create(
+            variables=variables,
+            domains=domains,
+            table=table,
+            name=name if name is not None else self._name + '*' + other.name
+        )
+
+    def reduce(self, *variables_with_values, name=None):
+        """
+        Returns the factor reduced to the given evidential values.  For example,
+        factor.reduce((grade, 'g1')) returns the factor without variable Grade, whose
+        table is the slice of the table at Grade = 'g1'.
+        """
+        var_val_dict = dict(self.filter_values(*variables_with_values))
+        index = []
+        for var, positions in zip(self._variables, self._positions):
+            if var in var_val_dict:
+                try:
+                    index.append(positions[var_val_dict[var]])
+                except KeyError:
+                    raise ValueError(f'variable {var.name} cannot have the value of {var_val_dict[var]}')
+            else:
+                index.append(slice(None))
+        variables, domains = zip(*(
+            (var, domain) for var, domain in zip(self._variables, self._domains) if var not in var_val_dict
+        )) if len(var_val_dict) < len(self._variables) else ((), ())
+        return self._create(
+            variables=variables,
+            domains=domains,
+            table=self._table[tuple(index)],
+            name=name if name is not None else self._name
+        )
+
+    def sum_out(self, variable, name=None):
+        """
+        Returns the factor with the variable eliminated by summation.  For a logarithmic
+        factor, the summation is performed over the exponents of the table.
+        """
+        axis = self._get_axis(variable)
+        table = log_sum_exp(self._table, axis) if self._logarithmic else np.sum(self._table, axis=axis)
+        return self._create(
+            variables=self._variables[:axis] + self._variables[axis + 1:],
+            domains=self._domains[:axis] + self._domains[axis + 1:],
+            table=table,
+            name=name if name is not None else 'sum_' + variable.name + '_' + self._name
+        )
+
+    def _create(self, variables, domains, table, name):
+        return TableFactor(
+            variables=variables,
+            table=table,
+            name=name,
+            variable_linking=False,
+            domains=domains,
+            logarithmic=self._logarithmic
+        )
+
+    def _get_axis(self, variable):
+        try:
+            return self._variables.index(variable)
+        except ValueError:
+            raise ValueError(f'variable {variable.name} does not belong to '
+                             f'the factor variables {tuple(var.name for var in self._variables)}')
+
+    def _get_index(self, values):
+        try:
+            return tuple(positions[value] for positions, value in zip(self._positions, values))
+        except KeyError as exception:
+            raise ValueError(f'value {exception.args[0]!r} not in the domains of factor {self._name}')
+
+
+if __name__ == '__main__':
+    from pyb4ml.modeling.categorical.variable import Variable
+    x = Variable(domain={False, True}, name='X')
+    y = Variable(domain={False, True}, name='Y')
+    f1 = TableFactor(variables=(x, y), table=[[0.1, 0.5], [0.5, 0.5]], name='f1')
+    f2 = TableFactor(variables=(y, ), table=[0.3, 0.7], name='f2')
+    print(f1((x, True), (y, False)))
+    print(f1.product(f2).sum_out(y).table)
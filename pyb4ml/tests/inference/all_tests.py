@@ -7,8 +7,28 @@ package_dir = str(pathlib.Path(__file__).resolve().parents[3])
 if package_dir not in sys.path:
     sys.path.insert(0, package_dir)
 
+import pyb4ml.tests.inference.async_inference_extended_student_test
+import pyb4ml.tests.inference.be_barren_extended_student_test
+import pyb4ml.tests.inference.be_batch_student_test
+import pyb4ml.tests.inference.be_block_extended_student_test
+import pyb4ml.tests.inference.be_components_student_test
+import pyb4ml.tests.inference.be_cost_student_test
 import pyb4ml.tests.inference.be_misconception_test
+import pyb4ml.tests.inference.be_mpe_student_test
+import pyb4ml.tests.inference.be_out_of_core_extended_student_test
 import pyb4ml.tests.inference.be_student_test
+import pyb4ml.tests.inference.bp_all_student_test
+import pyb4ml.tests.inference.bp_message_cache_student_test
 import pyb4ml.tests.inference.bp_student_test
+import pyb4ml.tests.inference.clone_extended_student_test
+import pyb4ml.tests.inference.compiled_model_extended_student_test
+import pyb4ml.tests.inference.dispatcher_test
 import pyb4ml.tests.inference.gbe_extended_student_test
+import pyb4ml.tests.inference.gbe_marginal_map_extended_student_test
+import pyb4ml.tests.inference.gbe_order_cache_extended_student_test
 import pyb4ml.tests.inference.go_extended_student_test
+import pyb4ml.tests.inference.go_heuristics_extended_student_test
+import pyb4ml.tests.inference.jt_extended_student_test
+import pyb4ml.tests.inference.lbp_misconception_test
+import pyb4ml.tests.inference.map_evidence_extended_student_test
+import pyb4ml.tests.inference.mbe_extended_student_test
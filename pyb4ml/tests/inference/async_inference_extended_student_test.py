@@ -0,0 +1,109 @@
+import asyncio
+import concurrent.futures
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyb4ml.inference import AsyncInference, CompiledModel
+from pyb4ml.models import ExtendedStudent
+
+# Test the asynchronous inferences with micro-batching on the Extended Student model.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+compiled_model = CompiledModel(model)
+
+# Requests of two queries with the evidential variables in any order
+requests = []
+for d, i in itertools.product(difficulty.domain, intelligence.domain):
+    requests.append(((letter, ), ((difficulty, d), (intelligence, i))))
+    requests.append(((letter, ), ((intelligence, i), (difficulty, d))))
+for h in happy.domain:
+    requests.append(((grade, job), ((happy, h), )))
+requests *= 5
+
+
+async def infer_all(front_end, timeout=None):
+    return await asyncio.gather(
+        *(front_end.infer(query, evidence, timeout) for query, evidence in requests),
+        return_exceptions=True
+    )
+
+
+async def check_coalescing():
+    async with AsyncInference(compiled_model, window=0.05) as front_end:
+        states = await infer_all(front_end)
+        # The concurrent requests are coalesced into one batch per query and evidential variables
+        assert sum(front_end.batch_sizes.values()) == 2
+        assert sum(size * number for size, number in front_end.batch_sizes.items()) == len(requests)
+        assert front_end.pending_number == 0
+    for state, (query, evidence) in zip(states, requests):
+        assert state.evidence == evidence
+        expected = compiled_model.infer(query, evidence)
+        assert state.query == expected.query
+        assert np.allclose(state.distribution, expected.distribution, rtol=eps, atol=0)
+
+
+async def check_backpressure():
+    async with AsyncInference(compiled_model, window=0.01, max_batch_size=4, max_pending=3) as front_end:
+        states = await infer_all(front_end)
+        # A batch never has more requests than are allowed to be pending
+        assert max(front_end.batch_sizes) <= 3
+        assert sum(size * number for size, number in front_end.batch_sizes.items()) == len(requests)
+    assert all(abs(float(np.sum(state.distribution)) - 1) < 1e-9 for state in states)
+
+
+async def check_deadlines():
+    async with AsyncInference(compiled_model, window=1.0) as front_end:
+        # The window is longer than the deadlines, so that the requests time out
+        results = await infer_all(front_end, timeout=0.01)
+        assert all(isinstance(result, TimeoutError) for result in results)
+        assert front_end.pending_number == 0
+        # The timed out requests are removed from their batches
+        await front_end.close()
+        assert not front_end.batch_sizes
+
+
+async def check_errors():
+    async with AsyncInference(compiled_model) as front_end:
+        try:
+            await front_end.infer((letter, ), ((difficulty, 'x'), ))
+            assert False
+        except ValueError:
+            pass
+        try:
+            await front_end.infer((letter, ), ((letter, 'l0'), ))
+            assert False
+        except ValueError:
+            pass
+        state = await front_end.infer((letter, ))
+        assert abs(state.pd('l0') + state.pd('l1') - 1) < 1e-9
+
+
+asyncio.run(check_coalescing())
+asyncio.run(check_backpressure())
+asyncio.run(check_deadlines())
+asyncio.run(check_errors())
+
+# The compiled model cannot be sent to the processes of a process pool
+with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+    try:
+        AsyncInference(compiled_model, executor=executor)
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,97 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, BP
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent, Student
+
+# Test the pruning of the barren variables and the evidence-cut components
+# on the Student and Extended Student models.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+
+# All the descendants of Intelligence are barren, so that only its prior is left
+# and the empty elimination order is accepted
+algorithm = BE(model)
+algorithm.set_query(intelligence)
+algorithm.set_elimination(())
+algorithm.run()
+assert 0.7 / (1 + eps) <= algorithm.pd('i0') <= 0.7 * (1 + eps)
+assert 0.3 / (1 + eps) <= algorithm.pd('i1') <= 0.3 * (1 + eps)
+# The elimination of the non-query variables gives the same distribution
+full = BE(model)
+full.set_query(intelligence)
+full.set_elimination((coherence, difficulty, grade, sat, letter, job, happy))
+full.run()
+for val in intelligence.domain:
+    assert full.pd(val) / (1 + eps) <= algorithm.pd(val) <= full.pd(val) * (1 + eps)
+
+# Given Letter, Job and Happy are barren, but the ancestors of Letter are relevant
+full = BE(model)
+full.set_query(grade)
+full.set_evidence((letter, 'l0'))
+full.set_elimination((coherence, difficulty, intelligence, sat, job, happy))
+full.run()
+algorithm = BE(model)
+algorithm.set_query(grade)
+algorithm.set_evidence((letter, 'l0'))
+algorithm.set_elimination((coherence, difficulty, intelligence))
+algorithm.run()
+for val in grade.domain:
+    assert full.pd(val) / (1 + eps) <= algorithm.pd(val) <= full.pd(val) * (1 + eps)
+# The batch run also accepts the order without the barren variables
+distributions = algorithm.run_batch((letter, ), [('l0', ), ('l1', )])
+for position, val in enumerate(grade.domain):
+    assert full.pd(val) / (1 + eps) <= distributions[0, position] <= full.pd(val) * (1 + eps)
+# The relevant variables must be eliminated
+algorithm.set_elimination((coherence, difficulty))
+try:
+    algorithm.run()
+    assert False
+except ValueError:
+    pass
+# The whole model is still needed for the most probable explanation
+try:
+    algorithm.run_mpe()
+    assert False
+except ValueError:
+    pass
+
+# GBE orders all the variables but only eliminates the relevant ones
+algorithm = GBE(model)
+algorithm.set_query(grade)
+algorithm.set_evidence((letter, 'l0'))
+algorithm.run()
+for val in grade.domain:
+    assert full.pd(val) / (1 + eps) <= algorithm.pd(val) <= full.pd(val) * (1 + eps)
+
+# BP propagates no messages from the barren SAT and Letter
+model = Student()
+grade = model.get_variable('Grade')
+be = BE(model)
+be.set_query(grade)
+be.set_elimination(tuple(var for var in model.variables if var is not grade))
+be.run()
+algorithm = BP(model)
+algorithm.set_query(grade)
+algorithm.run()
+for val in grade.domain:
+    assert be.pd(val) / (1 + eps) <= algorithm.pd(val) <= be.pd(val) * (1 + eps)
+# The messages f_d -> Difficulty -> f_dig -> Grade and f_i -> Intelligence -> f_dig
+assert len(algorithm.message_cache) == 5
@@ -0,0 +1,90 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent, Student
+
+# Test the batched-evidence mode of the Bucket Elimination algorithm
+# on the Student and Extended Student models.
+# Only the correctness of algorithms is tested!
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+
+algorithm = BE(model)
+
+eps = 1e-12
+
+algorithm.set_query(difficulty)
+algorithm.set_elimination([intelligence, grade])
+pd_batch = algorithm.run_batch((letter, sat), [('l0', 's0'), ('l0', 's1'), ('l1', 's0'), ('l1', 's1'), ('l0', 's0')])
+print(pd_batch)
+assert pd_batch.shape == (5, 2)
+# Assertion values were obtained using BPA
+assert 0.4742196406430358 / (1 + eps) <= pd_batch[0, 0] <= 0.4742196406430358 * (1 + eps)
+assert 0.5257803593569642 / (1 + eps) <= pd_batch[0, 1] <= 0.5257803593569642 * (1 + eps)
+assert 0.3972483414607588 / (1 + eps) <= pd_batch[1, 0] <= 0.3972483414607588 * (1 + eps)
+assert 0.6027516585392411 / (1 + eps) <= pd_batch[1, 1] <= 0.6027516585392411 * (1 + eps)
+assert 0.7737141941302315 / (1 + eps) <= pd_batch[2, 0] <= 0.7737141941302315 * (1 + eps)
+assert 0.22628580586976843 / (1 + eps) <= pd_batch[2, 1] <= 0.22628580586976843 * (1 + eps)
+assert 0.6790559493929356 / (1 + eps) <= pd_batch[3, 0] <= 0.6790559493929356 * (1 + eps)
+assert 0.32094405060706443 / (1 + eps) <= pd_batch[3, 1] <= 0.32094405060706443 * (1 + eps)
+assert 0.4742196406430358 / (1 + eps) <= pd_batch[4, 0] <= 0.4742196406430358 * (1 + eps)
+
+# The evidence set before is not changed by a batch
+algorithm.set_query(grade)
+algorithm.set_evidence((difficulty, 'd1'), (letter, 'l1'), (sat, 's1'))
+algorithm.set_elimination([intelligence])
+pd_batch = algorithm.run_batch((sat, letter, difficulty), [('s0', 'l0', 'd0'), ('s1', 'l1', 'd1')])
+assert pd_batch.shape == (2, 3)
+# Assertion values were obtained using BPA
+assert 0.07627202787313875 / (1 + eps) <= pd_batch[0, 0] <= 0.07627202787313875 * (1 + eps)
+assert 0.32590872028474893 / (1 + eps) <= pd_batch[0, 1] <= 0.32590872028474893 * (1 + eps)
+assert 0.5978192518421124 / (1 + eps) <= pd_batch[0, 2] <= 0.5978192518421124 * (1 + eps)
+assert 0.690236220472441 / (1 + eps) <= pd_batch[1, 0] <= 0.690236220472441 * (1 + eps)
+algorithm.run()
+pd = algorithm.pd
+assert 0.690236220472441 / (1 + eps) <= pd('g0') <= 0.690236220472441 * (1 + eps)
+assert 0.30519685039370076 / (1 + eps) <= pd('g1') <= 0.30519685039370076 * (1 + eps)
+assert 0.004566929133858268 / (1 + eps) <= pd('g2') <= 0.004566929133858268 * (1 + eps)
+
+# Test joint distributions in a batch
+algorithm.set_query(difficulty, intelligence)
+algorithm.set_evidence(None)
+algorithm.set_elimination([sat, grade])
+pd_batch = algorithm.run_batch((letter, ), [('l0', ), ('l1', )])
+assert pd_batch.shape == (2, 2, 2)
+for values, pd_values in zip((('l0', ), ('l1', )), pd_batch):
+    algorithm.set_evidence((letter, values[0]))
+    algorithm.run()
+    pd = algorithm.pd
+    for i, d in enumerate(difficulty.domain):
+        for j, i_value in enumerate(intelligence.domain):
+            assert pd(d, i_value) / (1 + eps) <= pd_values[i, j] <= pd(d, i_value) * (1 + eps)
+
+# Test the Greedy Bucket Elimination algorithm with a batch
+model = ExtendedStudent()
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+algorithm = GBE(model)
+algorithm.set_query(job)
+pd_batch = algorithm.run_batch((grade, letter), [('g0', 'l0'), ('g2', 'l1')])
+for values, pd_values in zip((('g0', 'l0'), ('g2', 'l1')), pd_batch):
+    algorithm.set_evidence((grade, values[0]), (letter, values[1]))
+    algorithm.run()
+    pd = algorithm.pd
+    assert pd('j0') / (1 + eps) <= pd_values[0] <= pd('j0') * (1 + eps)
+    assert pd('j1') / (1 + eps) <= pd_values[1] <= pd('j1') * (1 + eps)
+# P(j0 | g0, l0) = 0.20019525 / (0.20019525 + 0.14115475) = 0.5864809
+assert 0.5864809 / (1 + 1e-6) <= pd_batch[0, 0] <= 0.5864809 * (1 + 1e-6)
@@ -0,0 +1,60 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent
+
+# Test the block-wise computation of the bucket log-tables against the computation at once
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+grade = model.get_variable('Grade')
+happy = model.get_variable('Happy')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+
+algorithm = GBE(model)
+algorithm.set_block_size(None)
+block_algorithm = GBE(model)
+
+for block_size in (1, 5, 16):
+    block_algorithm.set_block_size(block_size)
+    for query, evidence in (
+            ((job, ), (None, )),
+            ((job, happy), ((grade, 'g1'), )),
+            ((coherence, difficulty, job), ((letter, 'l0'), ))
+    ):
+        algorithm.set_query(*query)
+        algorithm.set_evidence(*evidence)
+        algorithm.run()
+        block_algorithm.set_query(*query)
+        block_algorithm.set_evidence(*evidence)
+        block_algorithm.run()
+        for values in itertools.product(*(var.domain for var in sorted(query, key=lambda x: x.name))):
+            probability = algorithm.pd(*values)
+            assert probability / (1 + eps) <= block_algorithm.pd(*values) <= probability * (1 + eps)
+    # A batch of evidences is split into blocks too
+    algorithm.set_query(job)
+    algorithm.set_evidence(None)
+    block_algorithm.set_query(job)
+    block_algorithm.set_evidence(None)
+    evidence_values = [('g0', 'l0'), ('g1', 'l1'), ('g2', 'l0')]
+    pd_batch = algorithm.run_batch((grade, letter), evidence_values)
+    block_pd_batch = block_algorithm.run_batch((grade, letter), evidence_values)
+    assert ((pd_batch / (1 + eps) <= block_pd_batch) & (block_pd_batch <= pd_batch * (1 + eps))).all()
+
+try:
+    block_algorithm.set_block_size(0)
+except ValueError:
+    pass
+else:
+    assert False
@@ -0,0 +1,89 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, BP, CompiledModel
+from pyb4ml.modeling import FactorGraph, TableFactor
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.models import Student
+
+# Test the elimination of the connected components cut by the evidence
+# on the Student model.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+
+# The joint distribution of all the non-evidential variables in one component
+joint = BE(model)
+joint.set_query(difficulty, grade, letter, sat)
+joint.set_evidence((intelligence, 'i1'))
+joint.set_elimination(())
+joint.run()
+
+# Intelligence cuts the graph into the components {Difficulty, Grade, Letter} and {SAT}
+for max_workers in (None, 1, 2):
+    algorithm = BE(model)
+    algorithm.set_max_workers(max_workers)
+    algorithm.set_query(letter, sat)
+    algorithm.set_evidence((intelligence, 'i1'))
+    algorithm.set_elimination((difficulty, grade))
+    algorithm.run()
+    assert len(algorithm._get_component_plans(algorithm._evidence)) == 2
+    for l, s in itertools.product(letter.domain, sat.domain):
+        expected = sum(joint.pd(d, g, l, s) for d in difficulty.domain for g in grade.domain)
+        assert expected / (1 + eps) <= algorithm.pd(l, s) <= expected * (1 + eps)
+    pd = algorithm.pd
+    distributions = algorithm.run_batch((intelligence, ), [('i0', ), ('i1', )])
+    for position, (l, s) in enumerate(itertools.product(letter.domain, sat.domain)):
+        assert abs(distributions[1].ravel()[position] - pd(l, s)) < eps
+    # The component {SAT} has no query variables and is skipped
+    algorithm.set_query(letter)
+    algorithm.set_elimination((difficulty, grade, sat))
+    algorithm.run()
+    assert len(algorithm._get_component_plans(algorithm._evidence)) == 1
+    expected = sum(joint.pd(d, g, 'l1', s) for d in difficulty.domain for g in grade.domain for s in sat.domain)
+    assert expected / (1 + eps) <= algorithm.pd('l1') <= expected * (1 + eps)
+
+# The evidence on SAT is cut off from Difficulty, so that the batch axis comes from the batch size
+prior = BE(model)
+prior.set_query(difficulty)
+prior.set_elimination((intelligence, grade, sat, letter))
+prior.run()
+algorithm = BE(model)
+algorithm.set_query(difficulty)
+algorithm.set_elimination(())
+evidence_values = [('s0', ), ('s1', ), ('s0', )]
+for distributions in (
+    algorithm.run_batch((sat, ), evidence_values),
+    CompiledModel(model).infer_batch((difficulty, ), (sat, ), evidence_values)
+):
+    assert distributions.shape == (3, 2)
+    for row, position in itertools.product(range(3), range(2)):
+        assert abs(distributions[row, position] - prior.pd(difficulty.domain[position])) < eps
+
+# BP only propagates the messages in the component of the query
+a = Variable(domain={'a0', 'a1'}, name='A')
+b = Variable(domain={'b0', 'b1'}, name='B')
+c = Variable(domain={'c0', 'c1'}, name='C')
+f_a = TableFactor(variables=(a, ), table=[0.2, 0.8], name='f_a')
+f_ab = TableFactor(variables=(a, b), table=[[0.9, 0.1], [0.4, 0.6]], name='f_ab')
+f_c = TableFactor(variables=(c, ), table=[0.5, 0.5], name='f_c')
+model = FactorGraph(factors=(f_a, f_ab, f_c))
+algorithm = BP(model)
+algorithm.set_query(b)
+algorithm.run()
+# P(b0) = 0.2 * 0.9 + 0.8 * 0.4 = 0.5
+assert 0.5 / (1 + eps) <= algorithm.pd('b0') <= 0.5 * (1 + eps)
+assert len(algorithm._message_cache) == 3
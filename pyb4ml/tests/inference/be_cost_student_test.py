@@ -0,0 +1,98 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, GO
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent, Student
+
+# Test the cost estimates of elimination orders and the memory budget
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+
+algorithm = BE(model)
+algorithm.set_query(letter)
+algorithm.set_elimination([difficulty, intelligence, sat, grade])
+cost = algorithm.estimate_cost()
+# The barren SAT is pruned as in a run.  Bucket tables: (D, G, I), (G, I), (L, G) of 12, 6, 6 cells
+# with 2, 2, 2 input log-factors, respectively, and the query table of 2 cells
+assert cost.induced_width == 2
+assert cost.max_table_size == 12
+assert cost.multiply_adds == 12 * 2 + 6 * 2 + 6 * 2 + 2
+# The order does not need to contain the pruned variables
+algorithm.set_elimination([difficulty, intelligence, grade])
+assert algorithm.estimate_cost() == cost
+# A worse order
+algorithm.set_elimination([grade, difficulty, intelligence, sat])
+worse_cost = algorithm.estimate_cost()
+assert worse_cost.induced_width == 3
+assert worse_cost.max_table_size == 24
+assert worse_cost.peak_memory > cost.peak_memory
+
+# The estimated peak memory grows with a batch of evidences
+algorithm.set_evidence((sat, 's1'))
+algorithm.set_elimination([difficulty, intelligence, grade])
+assert algorithm.estimate_cost(batch_size=4).peak_memory > algorithm.estimate_cost().peak_memory
+peak_memory = algorithm.estimate_cost().peak_memory
+try:
+    algorithm.run(memory_budget=peak_memory - 1)
+except MemoryError:
+    pass
+else:
+    assert False
+algorithm.run(memory_budget=peak_memory)
+try:
+    algorithm.run_batch((sat, ), [('s0', ), ('s1', )], memory_budget=peak_memory)
+except MemoryError:
+    pass
+else:
+    assert False
+
+# GO estimates the cost of its order, where nothing is pruned
+go = GO(model)
+go.set_query(difficulty)
+go.set_evidence((letter, 'l0'), (sat, 's0'))
+go.run()
+algorithm.set_query(difficulty)
+algorithm.set_evidence((letter, 'l0'), (sat, 's0'))
+algorithm.set_elimination(go.order)
+assert go.estimate_cost() == algorithm.estimate_cost()
+
+# GBE tries other cost criteria before raising MemoryError
+model = ExtendedStudent()
+job = model.get_variable('Job')
+algorithm = GBE(model)
+algorithm.set_query(job)
+algorithm.run()
+peak_memory = algorithm.estimate_cost().peak_memory
+algorithm.run(memory_budget=peak_memory)
+try:
+    algorithm.run(memory_budget=peak_memory // 2)
+except MemoryError:
+    pass
+else:
+    assert False
+
+# The cost is estimated for the order accepted by a run
+grade = model.get_variable('Grade')
+algorithm = BE(model)
+algorithm.set_query(grade)
+algorithm.set_evidence((model.get_variable('Letter'), 'l0'))
+algorithm.set_elimination(tuple(model.get_variable(name) for name in ('Coherence', 'Difficulty', 'Intelligence')))
+peak_memory = algorithm.estimate_cost().peak_memory
+algorithm.run(memory_budget=peak_memory)
+try:
+    algorithm.run(memory_budget=peak_memory - 1)
+except MemoryError:
+    pass
+else:
+    assert False
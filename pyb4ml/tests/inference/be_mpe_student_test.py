@@ -0,0 +1,82 @@
+import math
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.inference.factored.semiring import COUNTING, MAX_SUM, MIN_SUM
+from pyb4ml.models import ExtendedStudent, Student
+
+# Test the most probable explanations and the semiring elimination
+# on the Student and Extended Student models.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+variables = (difficulty, intelligence, grade, sat, letter)
+
+algorithm = BE(model)
+algorithm.set_query(None)
+algorithm.set_elimination(variables)
+# Assertion values were obtained by enumerating the joint distribution
+top_explanations = (
+    (('d1', 'i0', 'g2', 's0', 'l0'), 0.184338),
+    (('d0', 'i0', 'g2', 's0', 'l0'), 0.118503),
+    (('d0', 'i1', 'g0', 's1', 'l1'), 0.11664),
+    (('d0', 'i0', 'g0', 's0', 'l1'), 0.10773),
+    (('d0', 'i0', 'g1', 's0', 'l1'), 0.09576)
+)
+for k in (1, 3, 5):
+    explanations = algorithm.run_mpe(k=k)
+    assert len(explanations) == k
+    for (assignment, probability), (values, expected_probability) in zip(explanations, top_explanations):
+        assert tuple(assignment[var] for var in variables) == values
+        assert expected_probability / (1 + eps) <= probability <= expected_probability * (1 + eps)
+
+# The query variables are decoded from the query buckets
+algorithm.set_query(grade, letter)
+algorithm.set_elimination((sat, intelligence, difficulty))
+explanations = algorithm.run_mpe(k=2)
+for (assignment, probability), (values, expected_probability) in zip(explanations, top_explanations):
+    assert tuple(assignment[var] for var in variables) == values
+    assert expected_probability / (1 + eps) <= probability <= expected_probability * (1 + eps)
+
+# The evidential values are in the explanations
+algorithm.set_query(grade)
+algorithm.set_evidence((letter, 'l1'))
+algorithm.set_elimination((difficulty, intelligence, sat))
+assignment, probability = algorithm.run_mpe()[0]
+assert tuple(assignment[var] for var in variables) == ('d0', 'i1', 'g0', 's1', 'l1')
+# P(d0, i1, g0, s1 | l1) = 0.11664 / P(l1) = 0.11664 / 0.502336
+assert 0.11664 / 0.502336 / (1 + 1e-6) <= probability <= 0.11664 / 0.502336 * (1 + 1e-6)
+
+# There are 2 * 2 * 2 * 2 = 16 assignments of positive probability for each grade
+algorithm.set_evidence(None)
+algorithm.set_elimination((difficulty, intelligence, sat, letter))
+assert (algorithm.run_semiring(COUNTING) == 16).all()
+max_log_values = algorithm.run_semiring(MAX_SUM)
+min_log_values = algorithm.run_semiring(MIN_SUM)
+assert (min_log_values < max_log_values).all()
+# The maximum over the grades is the MPE
+assert math.log(0.184338) / (1 - eps) <= max_log_values.max() <= math.log(0.184338) * (1 - eps)
+
+# The top explanations agree for the max-product and the k-best max-product
+model = ExtendedStudent()
+algorithm = GBE(model)
+algorithm.set_evidence((model.get_variable('Job'), 'j1'))
+explanations = algorithm.run_mpe(k=4)
+assignment, probability = algorithm.run_mpe()[0]
+assert assignment == explanations[0][0]
+assert probability / (1 + eps) <= explanations[0][1] <= probability * (1 + eps)
+assert all(explanations[i][1] >= explanations[i + 1][1] for i in range(3))
@@ -0,0 +1,57 @@
+import itertools
+import os
+import pathlib
+import sys
+import tempfile
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.inference.factored.memmap_storage import MemmapStorage
+from pyb4ml.models import ExtendedStudent
+
+# Test the out-of-core mode of the Bucket Elimination algorithm against the in-memory one,
+# where all the intermediate log-tables are memory-mapped and streamed in the smallest chunks
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+grade = model.get_variable('Grade')
+happy = model.get_variable('Happy')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+
+in_core_algorithm = GBE(model)
+out_of_core_algorithm = GBE(model)
+
+with tempfile.TemporaryDirectory() as directory:
+    out_of_core_algorithm.set_out_of_core(MemmapStorage(directory=directory, min_table_bytes=0, chunk_bytes=8))
+    for query, evidence in (
+            ((job, ), (None, )),
+            ((job, happy), ((grade, 'g1'), )),
+            ((coherence, ), ((letter, 'l0'), (happy, 'h2')))
+    ):
+        in_core_algorithm.set_query(*query)
+        in_core_algorithm.set_evidence(*evidence)
+        in_core_algorithm.run()
+        out_of_core_algorithm.set_query(*query)
+        out_of_core_algorithm.set_evidence(*evidence)
+        out_of_core_algorithm.run()
+        for values in itertools.product(*(var.domain for var in sorted(query, key=lambda x: x.name))):
+            probability = in_core_algorithm.pd(*values)
+            assert probability / (1 + eps) <= out_of_core_algorithm.pd(*values) <= probability * (1 + eps)
+    # A batch of evidences
+    in_core_algorithm.set_query(job)
+    in_core_algorithm.set_evidence(None)
+    out_of_core_algorithm.set_query(job)
+    out_of_core_algorithm.set_evidence(None)
+    evidence_values = [('g0', 'l0'), ('g1', 'l1'), ('g2', 'l0')]
+    pd_batch = in_core_algorithm.run_batch((grade, letter), evidence_values)
+    out_of_core_pd_batch = out_of_core_algorithm.run_batch((grade, letter), evidence_values)
+    assert ((pd_batch / (1 + eps) <= out_of_core_pd_batch) & (out_of_core_pd_batch <= pd_batch * (1 + eps))).all()
+    # The memory-mapped files are removed after each run
+    assert os.listdir(directory) == []
@@ -0,0 +1,73 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, BP
+from pyb4ml.models import Misconception, Student
+
+# Test the all-marginals mode of the Belief Propagation algorithm on the Student model.
+# Only the correctness of algorithms is tested!
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+f_dig = model.get_factor('f_dig')
+f_gl = model.get_factor('f_gl')
+
+eps = 1e-10
+
+# Test marginal distributions
+algorithm = BP(model)
+algorithm.run_all()
+assert 0.6 / (1 + eps) <= algorithm.variable_pd(difficulty)('d0') <= 0.6 * (1 + eps)
+assert 0.3 / (1 + eps) <= algorithm.variable_pd(intelligence)('i1') <= 0.3 * (1 + eps)
+assert 0.362 / (1 + eps) <= algorithm.variable_pd(grade)('g0') <= 0.362 * (1 + eps)
+assert 0.2884 / (1 + eps) <= algorithm.variable_pd(grade)('g1') <= 0.2884 * (1 + eps)
+assert 0.3496 / (1 + eps) <= algorithm.variable_pd(grade)('g2') <= 0.3496 * (1 + eps)
+assert 0.725 / (1 + eps) <= algorithm.variable_pd(sat)('s0') <= 0.725 * (1 + eps)
+assert 0.497664 / (1 + eps) <= algorithm.variable_pd(letter)('l0') <= 0.497664 * (1 + eps)
+# P(d0, i1, g0) = P(g0 | d0, i1) * P(d0) * P(i1) = 0.9 * 0.6 * 0.3 = 0.162
+assert 0.162 / (1 + eps) <= algorithm.factor_pd(f_dig)('d0', 'i1', 'g0') <= 0.162 * (1 + eps)
+# P(g2, l0) = P(l0 | g2) * P(g2) = 0.99 * 0.3496 = 0.346104
+assert 0.346104 / (1 + eps) <= algorithm.factor_pd(f_gl)('g2', 'l0') <= 0.346104 * (1 + eps)
+
+# Test conditional distributions against single-query runs
+be_algorithm = BE(model)
+algorithm.set_evidence((letter, 'l0'), (sat, 's1'))
+algorithm.run_all()
+for query in model.variables:
+    if query in (letter, sat):
+        continue
+    algorithm.set_query(query)
+    algorithm.run()
+    pd = algorithm.pd
+    for value in query.domain:
+        assert pd(value) / (1 + eps) <= algorithm.variable_pd(query)(value) <= pd(value) * (1 + eps)
+assert algorithm.variable_pd(letter)('l0') == 1
+# Compare the joint distribution of the factor variables with BE
+be_algorithm.set_query(difficulty, intelligence, grade)
+be_algorithm.set_evidence((letter, 'l0'), (sat, 's1'))
+be_algorithm.set_elimination([])
+be_algorithm.run()
+pd = be_algorithm.pd
+for d in difficulty.domain:
+    for i in intelligence.domain:
+        for g in grade.domain:
+            value = algorithm.factor_pd(f_dig)(d, i, g)
+            # The query variables are sorted by name
+            assert pd(d, g, i) / (1 + eps) <= value <= pd(d, g, i) * (1 + eps)
+
+# The algorithm rejects loopy graphs
+try:
+    BP(Misconception()).run_all()
+except ValueError as exception:
+    print(exception)
+else:
+    raise AssertionError('no exception raised for a loopy graph')
@@ -0,0 +1,85 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BP
+from pyb4ml.inference.factored.factor_tree_messages import MessageCache
+from pyb4ml.models import Student
+
+# Test the bounded message cache of the Belief Propagation algorithm on the Student model.
+# Only the correctness of algorithms is tested!
+model = Student()
+difficulty = model.get_variable('Difficulty')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+
+eps = 1e-10
+
+# Unbounded cache
+algorithm = BP(model)
+algorithm.set_query(difficulty)
+algorithm.run()
+assert algorithm.message_cache.hits == 0
+messages_number = len(algorithm.message_cache)
+algorithm.run()
+assert algorithm.message_cache.hits > 0
+assert len(algorithm.message_cache) == messages_number
+assert algorithm.message_cache.evictions == 0
+
+# Cache bounded by the number of messages
+message_cache = MessageCache(max_messages=3)
+algorithm = BP(model, message_cache)
+algorithm.set_query(difficulty)
+for sat_value, letter_value, pd_d0 in (
+        ('s0', 'l0', 0.4742196406430358),
+        ('s1', 'l0', 0.3972483414607588),
+        ('s0', 'l1', 0.7737141941302315),
+        ('s1', 'l1', 0.6790559493929356),
+        ('s0', 'l0', 0.4742196406430358)
+):
+    algorithm.set_evidence((letter, letter_value), (sat, sat_value))
+    algorithm.run()
+    pd = algorithm.pd
+    # Assertion values were obtained using BPA
+    assert pd_d0 / (1 + eps) <= pd('d0') <= pd_d0 * (1 + eps)
+    assert len(message_cache) <= 3
+assert message_cache.evictions > 0
+
+# Cache bounded by the size of messages in bytes
+message_cache = MessageCache(max_bytes=2000)
+algorithm = BP(model, message_cache)
+for grade_value in grade.domain:
+    algorithm.set_evidence((grade, grade_value))
+    algorithm.run_all()
+    assert message_cache.nbytes <= 2000
+print('hits:', message_cache.hits, 'misses:', message_cache.misses, 'evictions:', message_cache.evictions)
+assert message_cache.evictions > 0
+algorithm.clear_message_cache()
+assert len(message_cache) == 0 and message_cache.nbytes == 0
+
+# Messages from the subtrees without changed evidence are reused
+algorithm = BP(model)
+algorithm.set_query(difficulty)
+algorithm.set_evidence((letter, 'l0'), (sat, 's0'))
+algorithm.run()
+hits = algorithm.message_cache.hits
+algorithm.set_evidence((letter, 'l1'), (sat, 's0'))
+algorithm.run()
+pd = algorithm.pd
+# Assertion values were obtained using BPA
+assert 0.7737141941302315 / (1 + eps) <= pd('d0') <= 0.7737141941302315 * (1 + eps)
+# The messages from SAT over f_is to Intelligence do not depend on Letter
+assert algorithm.message_cache.hits > hits
+hits = algorithm.message_cache.hits
+algorithm.set_evidence((letter, 'l1'), (sat, 's1'))
+algorithm.run()
+pd = algorithm.pd
+assert 0.6790559493929356 / (1 + eps) <= pd('d0') <= 0.6790559493929356 * (1 + eps)
+# The messages from Letter over f_gl to Grade do not depend on SAT
+assert algorithm.message_cache.hits > hits
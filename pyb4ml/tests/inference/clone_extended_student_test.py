@@ -0,0 +1,152 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyb4ml.inference import BE, BP, JT, LBP, MBE
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.modeling import FactorGraph, TableFactor
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.models import ExtendedStudent, Student
+
+# Test the clones of the algorithms sharing the inner models
+# on the Student and Extended Student models.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+
+for algorithm_class in (GBE, JT):
+    algorithm = algorithm_class(model)
+    clone = algorithm.clone()
+    # The clone shares the inner model and the log-tables
+    assert clone._inner_model is algorithm._inner_model
+    assert clone._log_tables is algorithm._log_tables
+    # The query and evidence of one algorithm do not change the other
+    algorithm.set_query(job)
+    algorithm.set_evidence((letter, 'l0'))
+    clone.set_query(grade)
+    clone.set_evidence((happy, 'h1'))
+    algorithm.run()
+    clone.run()
+    expected_job = algorithm.pd
+    expected_grade = clone.pd
+    for algorithm, query, evidence, expected in (
+        (algorithm_class(model), job, (letter, 'l0'), expected_job),
+        (algorithm_class(model), grade, (happy, 'h1'), expected_grade)
+    ):
+        algorithm.set_query(query)
+        algorithm.set_evidence(evidence)
+        algorithm.run()
+        for val in query.domain:
+            assert expected(val) / (1 + eps) <= algorithm.pd(val) <= expected(val) * (1 + eps)
+    assert clone.query == (clone._outer_to_inner_variables[grade], )
+    assert clone.clone().query == ()
+
+# The evidence is not entered into the shared inner variables
+algorithm = BE(model)
+algorithm.set_query(job)
+algorithm.set_evidence((letter, 'l1'), (sat, 's0'))
+clone = algorithm.clone()
+clone.set_query(job)
+clone.set_evidence(None)
+assert all(len(var.domain) == len(algorithm._inner_to_outer_variables[var].domain) for var in algorithm.variables)
+assert algorithm.evidential == tuple(algorithm._outer_to_inner_variables[var] for var in (letter, sat))
+assert clone.evidential == ()
+elimination = (coherence, difficulty, intelligence, grade, happy)
+algorithm.set_elimination(elimination)
+clone.set_elimination(elimination + (letter, sat))
+algorithm.run()
+clone.run()
+assert algorithm.pd('j0') != clone.pd('j0')
+
+# The algorithms on one model share the log-tables computed once
+algorithm = BE(model)
+for other in (BE(model), GBE(model), JT(model), LBP(model)):
+    for outer_factor in model.factors:
+        log_table = algorithm._log_tables[algorithm._outer_to_inner_factors[outer_factor]]
+        other_log_table = other._log_tables[other._outer_to_inner_factors[outer_factor]]
+        assert np.shares_memory(log_table, other_log_table)
+        assert not other_log_table.flags.writeable
+
+# The clones of MBE, LBP, and BP
+algorithm = MBE(model, i_bound=2)
+clone = algorithm.clone()
+for mbe in (algorithm, clone):
+    mbe.set_query(intelligence)
+    mbe.set_elimination((coherence, difficulty, grade, sat, letter, job, happy))
+    mbe.run()
+assert clone.i_bound == 2
+assert clone.pe_bounds == algorithm.pe_bounds
+assert clone.pd('i0') == algorithm.pd('i0')
+model = Student()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+for algorithm_class in (BP, LBP):
+    algorithm = algorithm_class(model)
+    algorithm.set_query(intelligence)
+    algorithm.set_evidence((letter, 'l0'))
+    algorithm.run()
+    clone = algorithm.clone()
+    assert clone.query == () and clone.evidential == ()
+    clone.set_query(intelligence)
+    clone.set_evidence((letter, 'l0'))
+    clone.run()
+    for val in intelligence.domain:
+        assert algorithm.pd(val) / (1 + eps) <= clone.pd(val) <= algorithm.pd(val) * (1 + eps)
+    # A new evidence of the clone does not change the algorithm
+    clone.set_evidence((sat, 's1'))
+    assert all(var.domain == algorithm._inner_to_outer_variables[var].domain for var in algorithm.variables
+               if var not in algorithm.evidential)
+
+# The inner table factors share the model tables read-only
+a = Variable(domain={'a0', 'a1'}, name='A')
+b = Variable(domain={'b0', 'b1'}, name='B')
+f_a = TableFactor(variables=(a, ), table=[0.2, 0.8], name='f_a')
+f_ab = TableFactor(variables=(a, b), table=[[0.9, 0.1], [0.4, 0.6]], name='f_ab')
+algorithm = BP(FactorGraph(factors=(f_a, f_ab)))
+for outer_factor in (f_a, f_ab):
+    inner_factor = algorithm._outer_to_inner_factors[outer_factor]
+    assert np.shares_memory(inner_factor.table, outer_factor.table)
+    assert not inner_factor.table.flags.writeable
+    assert outer_factor.table.flags.writeable
+algorithm.set_query(b)
+algorithm.run()
+# P(b0) = 0.2 * 0.9 + 0.8 * 0.4 = 0.5
+assert 0.5 / (1 + eps) <= algorithm.pd('b0') <= 0.5 * (1 + eps)
+assert np.array_equal(f_ab.table, [[0.9, 0.1], [0.4, 0.6]])
+# The inner log-tables of the algorithms are views of one read-only log-table
+algorithms = (BE(FactorGraph(factors=(f_a, f_ab))), BE(FactorGraph(factors=(f_a, f_ab))))
+for outer_factor in (f_a, f_ab):
+    inner_factors = tuple(algorithm._outer_to_inner_factors[outer_factor] for algorithm in algorithms)
+    assert np.shares_memory(inner_factors[0].table, inner_factors[1].table)
+    assert np.shares_memory(algorithms[0]._log_tables[inner_factors[0]], inner_factors[1].table)
+    assert not inner_factors[0].table.flags.writeable
+    assert np.array_equal(inner_factors[0].table, np.log(outer_factor.table))
+
+# The logarithmic model tables are not logarithmized again
+log_f_a = TableFactor(variables=(a, ), table=np.log([0.2, 0.8]), name='log_f_a', logarithmic=True)
+algorithm = BE(FactorGraph(factors=(log_f_a, )))
+algorithm.set_query(a)
+algorithm.run()
+assert 0.2 / (1 + eps) <= algorithm.pd('a0') <= 0.2 * (1 + eps)
+assert 0.8 / (1 + eps) <= algorithm.pd('a1') <= 0.8 * (1 + eps)
+assert np.shares_memory(algorithm._log_tables[algorithm._outer_to_inner_factors[log_f_a]], log_f_a.table)
+assert log_f_a.table.flags.writeable
@@ -0,0 +1,91 @@
+import concurrent.futures
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyb4ml.inference import CompiledModel
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent
+
+# Test the concurrent inferences on one compiled Extended Student model.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+domains = {var: var.domain for var in model.variables}
+
+# Queries and evidences inferred concurrently
+cases = []
+for query, evidence_variables in (
+    ((job, ), (letter, )),
+    ((grade, ), (happy, )),
+    ((difficulty, intelligence), (job, )),
+    ((happy, ), ()),
+    ((letter, ), (difficulty, intelligence))
+):
+    for evidence_values in itertools.product(*(var.domain for var in evidence_variables)):
+        cases.append((query, tuple(zip(evidence_variables, evidence_values))))
+
+# The distributions computed one after another
+expected = []
+algorithm = GBE(model)
+for query, evidence in cases:
+    algorithm.set_query(*query)
+    algorithm.set_evidence(*(evidence if evidence else (None, )))
+    algorithm.run()
+    # The inner query domains can be reduced by the next evidences
+    expected.append({
+        values: algorithm.pd(*values)
+        for values in itertools.product(*(var.domain for var in sorted(query, key=lambda x: x.name)))
+    })
+
+compiled_model = CompiledModel(model)
+with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+    states = list(executor.map(lambda case: compiled_model.infer(*case), cases * 20))
+for index, state in enumerate(states):
+    query, evidence = cases[index % len(cases)]
+    assert state.evidence == evidence
+    for values in itertools.product(*(var.domain for var in state.query)):
+        expected_value = expected[index % len(cases)][values]
+        assert expected_value / (1 + eps) <= state.pd(*values) <= expected_value * (1 + eps)
+
+# The batches are also inferred concurrently
+evidence_values = [(d, i) for d, i in itertools.product(difficulty.domain, intelligence.domain)]
+with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+    batches = list(executor.map(
+        lambda _: compiled_model.infer_batch((letter, ), (difficulty, intelligence), evidence_values), range(8)
+    ))
+for distributions in batches:
+    for position, (d, i) in enumerate(evidence_values):
+        state = compiled_model.infer((letter, ), ((difficulty, d), (intelligence, i)))
+        assert np.allclose(distributions[position], state.distribution, rtol=eps, atol=0)
+
+# The model is not changed and the log-tables cannot be written
+assert all(var.domain == domain for var, domain in domains.items())
+assert not any(log_table.flags.writeable for log_table in compiled_model._log_tables.values())
+
+# The errors are raised per inference
+try:
+    compiled_model.infer((job, ), ((job, 'j0'), ))
+    assert False
+except ValueError:
+    pass
+try:
+    compiled_model.infer((job, ), ((letter, 'x'), ))
+    assert False
+except ValueError:
+    pass
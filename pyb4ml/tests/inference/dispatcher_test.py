@@ -0,0 +1,119 @@
+import concurrent.futures
+import gc
+import pathlib
+import sys
+import weakref
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, BP, Dispatcher, forget, infer
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent, Misconception, Student
+
+# Test the structure analysis and the choice of the algorithms
+# on the Student, Extended Student, and Misconception models.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+dispatcher = Dispatcher()
+
+# The Student model is a tree
+model = Student()
+grade = model.get_variable('Grade')
+intelligence = model.get_variable('Intelligence')
+letter = model.get_variable('Letter')
+structure = dispatcher.analyze(model)
+assert structure.is_tree
+assert len(structure.components) == 1
+assert structure.induced_width == 2
+inference = dispatcher.infer(model, (grade, ), ((letter, 'l1'), ))
+assert inference.engine == 'BP' and inference.exact
+assert dispatcher.last_engine == 'BP'
+be = BE(model)
+be.set_query(grade)
+be.set_evidence((letter, 'l1'))
+be.set_elimination(tuple(var for var in model.variables if var is not grade and var is not letter))
+be.run()
+for val in grade.domain:
+    assert be.pd(val) / (1 + eps) <= inference.pd(val) <= be.pd(val) * (1 + eps)
+# A joint distribution is computed by GBE
+inference = dispatcher.infer(model, (grade, intelligence))
+assert inference.engine == 'GBE'
+# The algorithms are reused and the distributions are kept
+gbe = dispatcher.get_algorithm(model, GBE)
+joint_pd = inference.pd('g0', 'i0')
+inference = dispatcher.infer(model, (grade, ), ((letter, 'l0'), ))
+assert inference.engine == 'BP'
+assert dispatcher.get_algorithm(model, GBE) is gbe
+assert dispatcher.infer(model, (grade, intelligence), ((letter, 'l0'), )).pd('g0', 'i0') != joint_pd
+assert dispatcher.get_algorithm(model, GBE).pd('g0', 'i0') != joint_pd
+assert dispatcher.engine_counts['GBE'] == 2
+
+# The Extended Student and Misconception models are loopy
+model = ExtendedStudent()
+assert not dispatcher.analyze(model).is_tree
+happy = model.get_variable('Happy')
+inference = infer(model, (happy, ))
+assert inference.engine == 'GBE'
+
+model = Misconception()
+alice = model.get_variable('Alice')
+bob = model.get_variable('Bob')
+assert not model.is_tree()
+# GBE exceeds the memory budget, so that LBP approximates the distribution
+dispatcher = Dispatcher(memory_budget=1)
+inference = dispatcher.infer(model, (alice, ))
+assert inference.engine == 'LBP' and not inference.exact
+assert abs(inference.pd('a0') + inference.pd('a1') - 1) < 1e-9
+try:
+    dispatcher.infer(model, (alice, bob))
+    assert False
+except MemoryError:
+    pass
+dispatcher = Dispatcher(memory_budget=1, allow_approximate=False)
+try:
+    dispatcher.infer(model, (alice, ))
+    assert False
+except MemoryError:
+    pass
+
+# A large induced width chooses LBP up front
+model = Misconception()
+alice = model.get_variable('Alice')
+dispatcher = Dispatcher(max_induced_width=1)
+assert dispatcher.analyze(model).induced_width == 2
+inference = dispatcher.infer(model, (alice, ))
+assert inference.engine == 'LBP' and not inference.exact
+dispatcher = Dispatcher(max_induced_width=2)
+assert dispatcher.infer(model, (alice, )).engine == 'GBE'
+
+# The forgotten models are freed
+dispatcher = Dispatcher()
+model = Student()
+dispatcher.infer(model, (model.get_variable('Grade'), ))
+algorithm = dispatcher.get_algorithm(model, BP)
+dispatcher.forget(model)
+assert dispatcher.get_algorithm(model, BP) is not algorithm
+del algorithm
+model_reference = weakref.ref(model)
+dispatcher.forget(model)
+del model
+gc.collect()
+assert model_reference() is None
+
+# The inferences on the default dispatcher from several threads are serialized
+model = ExtendedStudent()
+job = model.get_variable('Job')
+letter = model.get_variable('Letter')
+expected = {val: infer(model, (job, ), ((letter, val), )).pd('j0') for val in letter.domain}
+with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+    inferences = list(executor.map(
+        lambda val: (val, infer(model, (job, ), ((letter, val), )).pd('j0')), list(letter.domain) * 50
+    ))
+for val, pd in inferences:
+    assert expected[val] / (1 + eps) <= pd <= expected[val] * (1 + eps)
+forget(model)
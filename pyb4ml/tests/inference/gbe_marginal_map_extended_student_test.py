@@ -0,0 +1,62 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent
+
+# Test the marginal MAP on the Extended Student model
+# by comparing it with the maximum of the joint distribution of the MAP variables.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+letter = model.get_variable('Letter')
+
+for map_variables, evidence in (
+        ((difficulty, intelligence), (None, )),
+        ((coherence, happy), (None, )),
+        ((intelligence, letter), ((job, 'j1'), )),
+        ((coherence, difficulty, happy), ((job, 'j0'), ))
+):
+    algorithm = GBE(model)
+    algorithm.set_evidence(*evidence)
+    assignment, probability = algorithm.run_marginal_map(map_variables)
+    be = BE(model)
+    be.set_query(*map_variables)
+    be.set_evidence(*evidence)
+    evidence_variables = tuple(pair[0] for pair in evidence if pair)
+    be.set_elimination(tuple(
+        var for var in model.variables if var not in map_variables and var not in evidence_variables
+    ))
+    be.run()
+    values = max(itertools.product(*(var.domain for var in map_variables)), key=lambda x: be.pd(*x))
+    assert tuple(assignment[var] for var in map_variables) == values
+    expected_probability = be.pd(*values)
+    assert expected_probability / (1 + eps) <= probability <= expected_probability * (1 + eps)
+
+# The query is kept
+algorithm = GBE(model)
+algorithm.set_query(letter)
+algorithm.run_marginal_map((intelligence, ))
+assert algorithm.query == (algorithm._outer_to_inner_variables[letter], )
+
+# The MAP variables must not be evidential
+algorithm.set_evidence((job, 'j1'))
+try:
+    algorithm.run_marginal_map((job, ))
+    assert False
+except ValueError:
+    pass
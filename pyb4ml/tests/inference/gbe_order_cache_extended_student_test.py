@@ -0,0 +1,88 @@
+import os
+import pathlib
+import sys
+import tempfile
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.inference.factored.order_cache import OrderCache
+from pyb4ml.models import ExtendedStudent
+
+eps = 1e-10
+
+model = ExtendedStudent()
+difficulty = model.get_variable('Difficulty')
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+
+# The orders are cached for the query, not only for the evidence
+algorithm = GBE(model)
+algorithm.set_evidence((grade, 'g0'))
+algorithm.set_query(job)
+algorithm.run()
+pd_job = algorithm.pd('j0')
+algorithm.set_query(difficulty)
+algorithm.run()
+assert difficulty not in algorithm.order
+assert algorithm.order_cache.misses == 2
+algorithm.set_query(job)
+algorithm.run()
+assert algorithm.order_cache.hits == 1
+assert pd_job / (1 + eps) <= algorithm.pd('j0') <= pd_job * (1 + eps)
+
+# The least recently used orders are evicted
+algorithm = GBE(model, order_cache=OrderCache(max_orders=1))
+algorithm.set_query(job)
+algorithm.run()
+algorithm.set_query(letter)
+algorithm.run()
+assert len(algorithm.order_cache) == 1
+assert algorithm.order_cache.evictions == 1
+
+# The orders are persisted and warm-start another model instance
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'orders.json')
+    algorithm = GBE(model, order_cache=OrderCache(path=path))
+    algorithm.set_query(job)
+    algorithm.set_evidence((grade, 'g1'), (letter, 'l0'))
+    algorithm.run()
+    order_names = tuple(var.name for var in algorithm.order)
+    # The orders are saved in batches
+    assert not os.path.exists(path)
+    assert algorithm.order_cache.unsaved_number == 1
+    algorithm.order_cache.flush()
+    assert os.path.exists(path)
+    assert algorithm.order_cache.unsaved_number == 0
+    other_model = ExtendedStudent()
+    other_algorithm = GBE(other_model, order_cache=OrderCache(path=path))
+    other_algorithm.set_query(other_model.get_variable('Job'))
+    other_algorithm.set_evidence((other_model.get_variable('Letter'), 'l1'), (other_model.get_variable('Grade'), 'g2'))
+    other_algorithm.run()
+    assert other_algorithm.order_cache.hits == 1
+    assert tuple(var.name for var in other_algorithm.order) == order_names
+    assert os.listdir(directory) == ['orders.json']
+
+# The caches sharing a file merge their orders on saving
+with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'orders.json')
+    caches = (OrderCache(path=path, save_every=1), OrderCache(path=path, save_every=1))
+    caches[0].cache(('hash', ('A', ), (), 'min-fill'), ('B', 'C'))
+    caches[1].cache(('hash', ('B', ), (), 'min-fill'), ('A', 'C'))
+    cache = OrderCache(path=path)
+    assert len(cache) == 2
+    assert cache.get(('hash', ('A', ), (), 'min-fill')) == ('B', 'C')
+    assert cache.get(('hash', ('B', ), (), 'min-fill')) == ('A', 'C')
+    # Clearing the cache keeps the orders in the file for the other processes
+    cache.clear()
+    assert len(cache) == 0
+    assert len(OrderCache(path=path)) == 2
+    # Only clearing the file explicitly removes them
+    cache.clear_file()
+    assert len(OrderCache(path=path)) == 0
+    assert os.listdir(directory) == ['orders.json']
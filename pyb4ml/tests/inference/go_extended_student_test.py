@@ -134,3 +134,13 @@ algorithm.set_evidence((grade, 'g0'))
 algorithm.run(cost='min-fill', print_info=True)
 algorithm.print_order()
 assert algorithm.order == (coherence, difficulty, happy, intelligence, letter, sat)
+
+# The order for evidential variables without their values
+algorithm.set_query(job)
+algorithm.set_evidence((letter, 'l0'), (sat, 's1'))
+algorithm.run(cost='weighted-min-fill')
+order = algorithm.order
+algorithm.set_evidence(None)
+algorithm.run_for((letter, sat), cost='weighted-min-fill')
+assert algorithm.order == order
+assert algorithm.evidential == ()
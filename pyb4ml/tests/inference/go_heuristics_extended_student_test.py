@@ -0,0 +1,55 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import GO
+from pyb4ml.models import ExtendedStudent
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+happy = model.get_variable('Happy')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+sat = model.get_variable('SAT')
+job = model.get_variable('Job')
+algorithm = GO(model)
+
+for cost in ('min-degree', 'min-weight', 'min-width'):
+    algorithm.run(cost=cost)
+    algorithm.print_order()
+    assert algorithm.order == (coherence, difficulty, happy, intelligence, grade, job, letter, sat)
+    # Total table size =
+    # |C| * |D| + |D| * |G| * |I| + |G| * |H| * |J| + |G| * |I| * |S| +
+    # |G| * |J| * |L| * |S| + |J| * |L| * |S| + |L| * |S| + |S| =
+    # 6 + 12 + 18 + 12 + 24 + 8 + 4 + 2 = 86
+    assert algorithm.total_table_size == 86
+
+# Random tie-breaking is reproducible
+algorithm.run(cost='min-fill', seed=0)
+order = algorithm.order
+assert set(order) == set(model.variables)
+algorithm.run(cost='min-fill', seed=0)
+assert algorithm.order == order
+
+# Randomized restarts are never worse than the deterministic order
+algorithm.set_query(job)
+algorithm.run(cost='weighted-min-fill')
+total_table_size = algorithm.total_table_size
+algorithm.run_restarts(5, cost='weighted-min-fill', seed=0, max_workers=1)
+algorithm.print_order()
+assert set(algorithm.order) == set(model.variables) - {job}
+assert algorithm.total_table_size <= total_table_size
+
+try:
+    algorithm.run(cost='max-fill')
+except ValueError:
+    pass
+else:
+    assert False
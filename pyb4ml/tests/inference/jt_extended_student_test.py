@@ -0,0 +1,106 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import JT
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent, Misconception
+
+# Test the Junction Tree algorithm against the Greedy Bucket Elimination algorithm
+# on the loopy Extended Student and Misconception models.
+# Only the correctness of algorithms is tested!
+eps = 1e-10
+
+
+def get_gbe_pd(model, query, evidence):
+    algorithm = GBE(model)
+    algorithm.set_query(*query)
+    algorithm.set_evidence(*evidence)
+    algorithm.run()
+    return algorithm.pd
+
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+happy = model.get_variable('Happy')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+letter = model.get_variable('Letter')
+sat = model.get_variable('SAT')
+job = model.get_variable('Job')
+jt = JT(model)
+jt.print_cliques()
+
+# Each clique contains the variables of at least one factor
+for factor in model.factors:
+    assert any(set(factor.variables).issubset(clique) for clique in jt.cliques)
+
+for evidence in (
+        (None, ),
+        ((grade, 'g0'), (letter, 'l0')),
+        ((grade, 'g0'), (letter, 'l1')),
+        ((grade, 'g2'), (letter, 'l1'), (coherence, 'c1')),
+        (None, )
+):
+    jt.set_evidence(*evidence)
+    evidential = set(var for var, _ in evidence) if evidence[0] else set()
+    for var in model.variables:
+        if var in evidential:
+            continue
+        jt.set_query(var)
+        jt.run()
+        pd = get_gbe_pd(model, (var, ), evidence)
+        for value in var.domain:
+            assert pd(value) / (1 + eps) <= jt.pd(value) <= pd(value) * (1 + eps)
+
+# A joint distribution of a clique
+clique = next(clique for clique in jt.cliques if len(clique) > 1)
+jt.set_evidence(None)
+jt.set_query(*clique[:2])
+jt.run()
+pd = get_gbe_pd(model, clique[:2], (None, ))
+for values in itertools.product(*(var.domain for var in sorted(clique[:2], key=lambda x: x.name))):
+    assert pd(*values) / (1 + eps) <= jt.pd(*values) <= pd(*values) * (1 + eps)
+
+# The calibration is only repeated for the changed evidence
+jt.set_evidence((letter, 'l0'))
+jt.calibrate()
+all_messages_number = 2 * (len(jt.cliques) - 1)
+assert jt.computed_messages_number <= all_messages_number
+# No message is recomputed for the same evidence
+jt.calibrate()
+assert jt.computed_messages_number == 0
+jt.set_evidence((letter, 'l1'))
+jt.calibrate()
+assert 0 < jt.computed_messages_number < all_messages_number
+
+# The query variables must belong to one clique
+jt.set_evidence(None)
+jt.set_query(coherence, job)
+try:
+    jt.run()
+except ValueError:
+    pass
+else:
+    assert False
+
+model = Misconception()
+alice = model.get_variable('Alice')
+bob = model.get_variable('Bob')
+charles = model.get_variable('Charles')
+debbie = model.get_variable('Debbie')
+jt = JT(model)
+jt.set_evidence((alice, 'a1'))
+for var in (bob, charles, debbie):
+    jt.set_query(var)
+    jt.run()
+    pd = get_gbe_pd(model, (var, ), ((alice, 'a1'), ))
+    for value in var.domain:
+        assert pd(value) / (1 + eps) <= jt.pd(value) <= pd(value) * (1 + eps)
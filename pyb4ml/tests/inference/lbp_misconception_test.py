@@ -0,0 +1,75 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, LBP
+from pyb4ml.models import Misconception
+
+# Test the Loopy Belief Propagation algorithm on the Misconception model,
+# whose factor graph is a loop that is broken by an evidence
+# Only the correctness of algorithms is tested!
+model = Misconception()
+alice = model.get_variable('Alice')
+bob = model.get_variable('Bob')
+charles = model.get_variable('Charles')
+debbie = model.get_variable('Debbie')
+
+eps = 1e-6
+
+be = BE(model)
+be.set_evidence((charles, 'c0'))
+for schedule in ('flooding', 'residual'):
+    for damping in (0.0, 0.5):
+        algorithm = LBP(model, schedule=schedule, damping=damping, max_iterations=1000, tolerance=1e-12)
+        # The messages of the loop converge
+        algorithm.run_all()
+        assert algorithm.converged
+        approximate_pd = algorithm.variable_pd(alice)('a0')
+        # The evidence breaks the loop, so that the distributions are exact
+        algorithm.set_evidence((charles, 'c0'))
+        algorithm.run_all()
+        assert algorithm.converged
+        for var in (alice, bob, debbie):
+            be.set_query(var)
+            be.set_elimination(tuple(other_var for other_var in (alice, bob, debbie) if other_var is not var))
+            be.run()
+            for val in var.domain:
+                assert be.pd(val) / (1 + eps) <= algorithm.variable_pd(var)(val) <= be.pd(val) * (1 + eps)
+        # The evidential variable has all its values
+        assert algorithm.variable_pd(charles)('c0') == 1.0
+        assert algorithm.variable_pd(charles)('c1') == 0.0
+        # The warm start from the converged messages needs at most one iteration
+        algorithm.set_query(alice)
+        algorithm.run()
+        assert algorithm.iterations <= 1
+        # Both schedules reach the same fixed point
+        algorithm.reset_messages()
+        algorithm.set_evidence(None)
+        algorithm.run()
+        assert approximate_pd / (1 + eps) <= algorithm.pd('a0') <= approximate_pd * (1 + eps)
+
+# The propagation stops after the maximum number of iterations
+algorithm = LBP(model, max_iterations=3)
+algorithm.set_query(alice)
+algorithm.run()
+assert not algorithm.converged
+assert algorithm.iterations == 3
+assert 0 < algorithm.pd('a0') < 1
+
+# The propagation stops after the time limit
+algorithm = LBP(model, schedule='residual', max_iterations=10 ** 9, tolerance=0, time_limit=0.01)
+algorithm.set_query(alice)
+algorithm.run()
+assert not algorithm.converged
+assert abs(algorithm.pd('a0') + algorithm.pd('a1') - 1) < eps
+
+try:
+    LBP(model, schedule='random')
+    assert False
+except ValueError:
+    pass
@@ -0,0 +1,67 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import numpy as np
+
+from pyb4ml.inference import BE, map_evidence
+from pyb4ml.inference.factored.greedy_elimination import GBE
+from pyb4ml.models import ExtendedStudent
+
+# Test the fan-out of many evidences over processes sharing the log-tables
+# on the Extended Student model.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+coherence = model.get_variable('Coherence')
+difficulty = model.get_variable('Difficulty')
+intelligence = model.get_variable('Intelligence')
+grade = model.get_variable('Grade')
+sat = model.get_variable('SAT')
+letter = model.get_variable('Letter')
+job = model.get_variable('Job')
+happy = model.get_variable('Happy')
+
+rows = list(itertools.product(letter.domain, sat.domain, happy.domain)) * 7
+algorithm = GBE(model)
+algorithm.set_query(grade, job)
+expected = algorithm.run_batch((letter, sat, happy), rows)
+for workers, chunk_size in ((1, 5), (2, 5), (3, 1000)):
+    # The rows are streamed from an iterator and yielded in their order
+    distributions = list(map_evidence(algorithm, (letter, sat, happy), iter(rows), workers, chunk_size))
+    assert len(distributions) == len(rows)
+    for distribution, expected_distribution in zip(distributions, expected):
+        assert np.allclose(distribution, expected_distribution, rtol=eps, atol=0)
+
+# BE uses its set elimination order, and the barren variables are pruned
+algorithm = BE(model)
+algorithm.set_query(intelligence)
+algorithm.set_elimination((coherence, difficulty, grade))
+rows = [(l, ) for l in letter.domain]
+expected = algorithm.run_batch((letter, ), rows)
+distributions = list(map_evidence(algorithm, (letter, ), rows, workers=2))
+assert np.allclose(np.array(distributions), expected, rtol=eps, atol=0)
+
+# A consumer can stop early
+distributions = map_evidence(algorithm, (letter, ), iter(rows * 100), workers=2, chunk_size=3)
+assert next(distributions).shape == (len(intelligence.domain), )
+distributions.close()
+
+# The errors are raised before the rows are consumed
+try:
+    map_evidence(algorithm, (letter, ), rows, workers=0)
+    assert False
+except ValueError:
+    pass
+try:
+    map_evidence(algorithm, (intelligence, ), rows)
+    assert False
+except ValueError:
+    pass
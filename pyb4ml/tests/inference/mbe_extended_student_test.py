@@ -0,0 +1,70 @@
+import itertools
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, GO, MBE
+from pyb4ml.models import ExtendedStudent
+
+# Test the bounds of the Mini-Bucket Elimination algorithm on the Extended Student model
+# by comparing them with the distributions computed by the Bucket Elimination algorithm.
+# Only the correctness of algorithms is tested!
+eps = 1e-12
+
+model = ExtendedStudent()
+grade = model.get_variable('Grade')
+happy = model.get_variable('Happy')
+job = model.get_variable('Job')
+letter = model.get_variable('Letter')
+
+for query, evidence in (
+        ((happy, ), (None, )),
+        ((happy, ), ((job, 'j1'), )),
+        ((grade, ), ((job, 'j0'), (letter, 'l1'))),
+        ((grade, happy), ((job, 'j1'), ))
+):
+    go = GO(model)
+    go.set_query(*query)
+    go.set_evidence(*evidence)
+    go.run()
+    be = BE(model)
+    be.set_query(*query)
+    be.set_evidence(*evidence)
+    be.set_elimination(go.order)
+    be.run()
+    # The probability of the evidence is the sum of the non-normalized distribution
+    pe = MBE(model, i_bound=len(model.variables))
+    pe.set_query(None)
+    pe.set_evidence(*evidence)
+    pe.set_elimination(go.order + query)
+    pe.run()
+    lower_pe, upper_pe = pe.pe_bounds
+    assert lower_pe / (1 + eps) <= upper_pe <= lower_pe * (1 + eps)
+    for i_bound in (1, 2, 3, 4):
+        algorithm = MBE(model, i_bound=i_bound)
+        algorithm.set_query(*query)
+        algorithm.set_evidence(*evidence)
+        algorithm.set_elimination(go.order)
+        algorithm.run()
+        lower, upper = algorithm.pe_bounds
+        assert lower <= lower_pe * (1 + eps) and upper_pe <= upper * (1 + eps)
+        lower_pd, upper_pd = algorithm.pd_bounds
+        for values in itertools.product(*(var.domain for var in query)):
+            assert lower_pd(*values) <= be.pd(*values) * (1 + eps)
+            assert be.pd(*values) <= upper_pd(*values) * (1 + eps)
+        if i_bound > be.estimate_cost().induced_width:
+            # The i-bound is at least the largest bucket size, so that the bounds are exact
+            assert lower / (1 + eps) <= lower_pe <= lower * (1 + eps)
+            assert upper / (1 + eps) <= upper_pe <= upper * (1 + eps)
+
+# The i-bound must be positive
+try:
+    MBE(model, i_bound=0)
+    assert False
+except ValueError:
+    pass
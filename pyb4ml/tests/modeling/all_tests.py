@@ -0,0 +1,11 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+import pyb4ml.tests.modeling.factor_graph_test
+import pyb4ml.tests.modeling.table_factor_test
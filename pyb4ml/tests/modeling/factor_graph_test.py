@@ -0,0 +1,34 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.modeling import FactorGraph, TableFactor
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.models import ExtendedStudent, Misconception, Student
+
+# Test the cycles and connected components of factor graphs
+assert Student().is_tree()
+assert not ExtendedStudent().is_tree()
+assert not Misconception().is_tree()
+
+a = Variable(domain={'a0', 'a1'}, name='A')
+b = Variable(domain={'b0', 'b1'}, name='B')
+c = Variable(domain={'c0', 'c1'}, name='C')
+d = Variable(domain={'d0', 'd1'}, name='D')
+f_ab = TableFactor(variables=(a, b), table=[[1, 2], [3, 4]], name='f_ab')
+f_c = TableFactor(variables=(c, ), table=[1, 2], name='f_c')
+f_cd = TableFactor(variables=(c, d), table=[[1, 2], [3, 4]], name='f_cd')
+model = FactorGraph(factors=(f_ab, f_c, f_cd))
+assert model.components == ((a, b), (c, d))
+assert model.is_tree()
+
+# Two factors over the same variables build a cycle
+f_dc = TableFactor(variables=(d, c), table=[[1, 2], [3, 4]], name='f_dc')
+model = FactorGraph(factors=(f_ab, f_c, f_cd, f_dc))
+assert model.components == ((a, b), (c, d))
+assert not model.is_tree()
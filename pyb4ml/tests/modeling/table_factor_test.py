@@ -0,0 +1,98 @@
+import pathlib
+import sys
+
+# Get the package directory
+package_dir = str(pathlib.Path(__file__).resolve().parents[3])
+# Add the package directory into sys.path if necessary
+if package_dir not in sys.path:
+    sys.path.insert(0, package_dir)
+
+from pyb4ml.inference import BE, BP
+from pyb4ml.modeling import FactorGraph, TableFactor
+from pyb4ml.modeling.categorical.variable import Variable
+from pyb4ml.models import Student
+
+eps = 1e-12
+
+# Create the Student model with table factors
+difficulty = Variable(domain={'d0', 'd1'}, name='Difficulty')
+intelligence = Variable(domain={'i0', 'i1'}, name='Intelligence')
+grade = Variable(domain={'g0', 'g1', 'g2'}, name='Grade')
+sat = Variable(domain={'s0', 's1'}, name='SAT')
+letter = Variable(domain={'l0', 'l1'}, name='Letter')
+f_d = TableFactor(variables=(difficulty, ), table=[0.6, 0.4], name='f_d')
+f_i = TableFactor(variables=(intelligence, ), table=[0.7, 0.3], name='f_i')
+f_dig = TableFactor(
+    variables=(difficulty, intelligence, grade),
+    table=[[[0.30, 0.40, 0.30], [0.90, 0.08, 0.02]], [[0.05, 0.25, 0.70], [0.50, 0.30, 0.20]]],
+    name='f_dig'
+)
+f_is = TableFactor(variables=(intelligence, sat), table=[[0.95, 0.05], [0.20, 0.80]], name='f_is')
+f_gl = TableFactor(variables=(grade, letter), table=[[0.10, 0.90], [0.40, 0.60], [0.99, 0.01]], name='f_gl')
+model = FactorGraph(factors={f_d, f_i, f_dig, f_is, f_gl})
+
+# Test the lookup
+assert f_dig((difficulty, 'd1'), (grade, 'g2'), (intelligence, 'i0')) == 0.70
+assert f_dig.function('d0', 'i1', 'g1') == 0.08
+
+# Test the product and sum-out: P(g) = \sum_{d,i} P(g|d,i) * P(d) * P(i)
+f_g = f_dig.product(f_d).product(f_i).sum_out(difficulty).sum_out(intelligence)
+assert f_g.variables == (grade, )
+assert 0.362 / (1 + eps) <= f_g((grade, 'g0')) <= 0.362 * (1 + eps)
+assert 0.2884 / (1 + eps) <= f_g((grade, 'g1')) <= 0.2884 * (1 + eps)
+assert 0.3496 / (1 + eps) <= f_g((grade, 'g2')) <= 0.3496 * (1 + eps)
+
+# Test the same in the logarithmic space
+log_f_d = TableFactor(variables=(difficulty, ), table=[0.6, 0.4], name='f_d', variable_linking=False)
+log_f_dig = TableFactor(variables=f_dig.variables, table=f_dig.table, name='f_dig', variable_linking=False)
+log_f_d.logarithm()
+log_f_dig.logarithm()
+log_f_gi = log_f_dig.product(log_f_d).sum_out(difficulty)
+f_gi = f_dig.product(f_d).sum_out(difficulty)
+for i in intelligence.domain:
+    for g in grade.domain:
+        value = f_gi((intelligence, i), (grade, g))
+        log_value = log_f_gi((intelligence, i), (grade, g))
+        assert value / (1 + eps) <= 2.718281828459045 ** log_value <= value * (1 + eps)
+# A given log-table is used without computing the logarithm
+log_table = log_f_d.table
+shared_log_f_d = TableFactor(variables=(difficulty, ), table=[0.6, 0.4], name='f_d', variable_linking=False)
+shared_log_f_d.logarithm(log_table)
+assert shared_log_f_d.table is log_table
+assert shared_log_f_d.logarithmic
+
+# Test the max-out
+f_max = f_dig.max_out(grade)
+assert f_max((difficulty, 'd0'), (intelligence, 'i0')) == 0.40
+assert f_max((difficulty, 'd1'), (intelligence, 'i1')) == 0.50
+
+# Test the evidence reduction
+f_reduced = f_dig.reduce((intelligence, 'i1'), (grade, 'g0'))
+assert f_reduced.variables == (difficulty, )
+assert f_reduced((difficulty, 'd0')) == 0.90
+assert f_reduced((difficulty, 'd1')) == 0.50
+
+# Test the tabulation of a factor function
+f_tabulated = TableFactor.from_factor(Student().get_factor('f_dig'))
+assert f_tabulated.table.shape == (2, 2, 3)
+assert f_tabulated.function('d1', 'i1', 'g0') == 0.50
+
+# Test the drop-in replacement in the algorithms
+be_algorithm = BE(model)
+bp_algorithm = BP(model)
+bp_algorithm.set_query(difficulty)
+bp_algorithm.set_evidence((letter, 'l0'))
+bp_algorithm.run()
+bp_algorithm.print_pd()
+pd = bp_algorithm.pd
+# Assertion values were obtained using BPA
+assert 0.4622878086419753 / (1 + eps) <= pd('d0') <= 0.4622878086419753 * (1 + eps)
+assert 0.5377121913580247 / (1 + eps) <= pd('d1') <= 0.5377121913580247 * (1 + eps)
+be_algorithm.set_query(difficulty)
+be_algorithm.set_evidence((letter, 'l0'))
+be_algorithm.set_elimination([sat, intelligence, grade])
+be_algorithm.run()
+be_algorithm.print_pd()
+pd = be_algorithm.pd
+assert 0.4622878086419753 / (1 + eps) <= pd('d0') <= 0.4622878086419753 * (1 + eps)
+assert 0.5377121913580247 / (1 + eps) <= pd('d1') <= 0.5377121913580247 * (1 + eps)